@@ -0,0 +1,198 @@
+import { Canvas2D } from './canvas2d';
+import { EXPAND_LINE_GLSL, bindResolution, createLineQuads } from './lineset';
+import { PICKING_FRAGMENT_GLSL, PICKING_VERTEX_GLSL } from './picking';
+import * as BABYLON from '@babylonjs/core';
+
+// 1辺の長さが1の立方体の辺を、箱ごとの変換行列で変形して描画するシェーダー
+BABYLON.Effect.ShadersStore.boxesVertexShader = `
+precision highp float;
+attribute vec3 position;
+attribute vec3 other;
+attribute float side;
+attribute vec4 boxColor;
+#include<instancesDeclaration>
+uniform mat4 viewProjection;
+uniform vec2 resolution;
+uniform float width;
+varying vec4 vColor;
+${EXPAND_LINE_GLSL}
+${PICKING_VERTEX_GLSL}
+void main(void) {
+#include<instancesVertex>
+  // 非表示の箱は画面外に移動する
+  if (boxColor.a == 0.0) {
+    gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+    return;
+  }
+  mat4 m = viewProjection * finalWorld;
+  gl_Position = expandLine(m * vec4(position, 1.0), m * vec4(other, 1.0), side, width, resolution);
+  vColor = vec4(boxColor.rgb, 1.0);
+#ifdef PICKING
+  setPickIndex(gl_InstanceID);
+#endif
+}
+`;
+
+BABYLON.Effect.ShadersStore.boxesFragmentShader = `
+precision highp float;
+varying vec4 vColor;
+${PICKING_FRAGMENT_GLSL}
+void main(void) {
+#ifdef PICKING
+  gl_FragColor = pickColor();
+#else
+  gl_FragColor = vColor;
+#endif
+}
+`;
+
+const UNIT_CUBE_CORNERS = [
+  -0.5, -0.5, -0.5, 0.5, -0.5, -0.5, 0.5, 0.5, -0.5, -0.5, 0.5, -0.5,
+  -0.5, -0.5, 0.5, 0.5, -0.5, 0.5, 0.5, 0.5, 0.5, -0.5, 0.5, 0.5
+];
+const UNIT_CUBE_EDGES = [
+  0, 1, 1, 2, 2, 3, 3, 0,
+  4, 5, 5, 6, 6, 7, 7, 4,
+  0, 4, 1, 5, 2, 6, 3, 7
+];
+
+// 大量の直方体の枠を1回の描画命令で描画する
+export class Boxes {
+  mesh: BABYLON.Mesh
+  // 箱ごとの r,g,b,可視(1)/不可視(0)
+  colors: Float32Array
+  // 箱ごとの上面の中心。ラベルの表示位置に使う
+  tops: Float32Array
+  labels: string[]
+  UUID: string
+  // 枠の線の太さ(ピクセル)
+  width: number
+
+  constructor (
+    uuid: string,
+    scene: BABYLON.Scene,
+    centers: Float32Array,
+    sizes: Float32Array,
+    rotations: Float32Array,
+    rgb: Uint8Array,
+    labels: string[],
+    width: number
+  ) {
+    this.UUID = uuid.toUpperCase();
+    const numBoxes = Math.floor(centers.length / 3);
+    this.labels = labels;
+
+    const matrices = new Float32Array(numBoxes * 16);
+    this.tops = new Float32Array(numBoxes * 3);
+    this.colors = new Float32Array(numBoxes * 4);
+    const scaling = new BABYLON.Vector3();
+    const rotation = new BABYLON.Quaternion();
+    const translation = new BABYLON.Vector3();
+    const matrix = new BABYLON.Matrix();
+    const top = new BABYLON.Vector3();
+    for (let i = 0; i < numBoxes; i++) {
+      BABYLON.Vector3.FromArrayToRef(sizes, i * 3, scaling);
+      rotation.set(rotations[i * 4], rotations[i * 4 + 1], rotations[i * 4 + 2], rotations[i * 4 + 3]);
+      BABYLON.Vector3.FromArrayToRef(centers, i * 3, translation);
+      BABYLON.Matrix.ComposeToRef(scaling, rotation, translation, matrix);
+      matrix.copyToArray(matrices, i * 16);
+      BABYLON.Vector3.TransformCoordinatesFromFloatsToRef(0, 0, 0.5, matrix, top);
+      top.toArray(this.tops, i * 3);
+
+      const hasColor = i * 3 + 2 < rgb.length;
+      this.colors[i * 4 + 0] = hasColor ? rgb[i * 3 + 0] / 255 : 1;
+      this.colors[i * 4 + 1] = hasColor ? rgb[i * 3 + 1] / 255 : 1;
+      this.colors[i * 4 + 2] = hasColor ? rgb[i * 3 + 2] / 255 : 1;
+      this.colors[i * 4 + 3] = 1;
+    }
+
+    const quads = createLineQuads(UNIT_CUBE_CORNERS, UNIT_CUBE_EDGES);
+    this.mesh = new BABYLON.Mesh(uuid, scene);
+    this.mesh.setVerticesData(BABYLON.VertexBuffer.PositionKind, quads.positions, false, 3);
+    this.mesh.setVerticesData('other', quads.others, false, 3);
+    this.mesh.setVerticesData('side', quads.sides, false, 1);
+    this.mesh.setIndices(quads.indices);
+    this.mesh.thinInstanceSetBuffer('matrix', matrices, 16, true);
+    this.mesh.thinInstanceSetBuffer('boxColor', this.colors, 4, false);
+    this.mesh.thinInstanceRefreshBoundingInfo();
+    this.mesh.isPickable = false;
+
+    this.width = width;
+    this.mesh.material = this.createMaterial();
+  }
+
+  // ピッキング用の描画では箱の番号を出力する
+  createMaterial (picking: boolean = false): BABYLON.ShaderMaterial {
+    const scene = this.mesh.getScene();
+    const material = new BABYLON.ShaderMaterial(this.mesh.name, scene, { vertex: 'boxes', fragment: 'boxes' }, {
+      attributes: ['position', 'other', 'side', 'boxColor'],
+      uniforms: ['world', 'viewProjection', 'resolution', 'width', 'pickObject'],
+      defines: picking ? ['#define PICKING'] : []
+    });
+    material.backFaceCulling = false;
+    material.setFloat('width', this.width);
+    bindResolution(material, scene);
+    return material;
+  }
+
+  get numBoxes (): number {
+    return this.colors.length / 4;
+  }
+
+  // indices の箱の色を r,g,b (0-255) に変更する
+  setColors (indices: Uint32Array, rgb: Uint8Array): string | null {
+    if (rgb.length !== indices.length * 3) return 'length of colors does not match indices';
+    if (!this.inRange(indices)) return 'index out of range';
+    for (let i = 0; i < indices.length; i++) {
+      const index = indices[i];
+      this.colors[index * 4 + 0] = rgb[i * 3 + 0] / 255;
+      this.colors[index * 4 + 1] = rgb[i * 3 + 1] / 255;
+      this.colors[index * 4 + 2] = rgb[i * 3 + 2] / 255;
+    }
+    this.mesh.thinInstanceBufferUpdated('boxColor');
+    return null;
+  }
+
+  // indices の箱の表示、非表示を切り替える
+  setVisible (indices: Uint32Array, visible: Uint8Array): string | null {
+    if (visible.length !== indices.length) return 'length of visible does not match indices';
+    if (!this.inRange(indices)) return 'index out of range';
+    for (let i = 0; i < indices.length; i++) {
+      const index = indices[i];
+      this.colors[index * 4 + 3] = visible[i] !== 0 ? 1 : 0;
+    }
+    this.mesh.thinInstanceBufferUpdated('boxColor');
+    return null;
+  }
+
+  // 途中で失敗して一部の箱だけが変更されないように、変更する前にすべての番号を確かめる
+  private inRange (indices: Uint32Array): boolean {
+    return indices.every((index) => index < this.numBoxes);
+  }
+
+  // 表示中の箱のラベルを上面の中心に描画する
+  renderLabels (canvas: Canvas2D, transformMatrix: BABYLON.Matrix): void {
+    if (this.labels.length === 0 || !this.mesh.isEnabled()) return;
+    transformMatrix = this.mesh.getWorldMatrix().multiply(transformMatrix);
+    const frustumPlanes = BABYLON.Frustum.GetPlanes(transformMatrix);
+    const viewport = new BABYLON.Viewport(0, 0, canvas.domElement.width, canvas.domElement.height);
+    const p = new BABYLON.Vector3();
+
+    canvas.ctx.save();
+    canvas.ctx.font = `${12 * window.devicePixelRatio}px sans-serif`;
+    canvas.ctx.textAlign = 'center';
+    canvas.ctx.textBaseline = 'bottom';
+    for (let i = 0; i < this.labels.length && i < this.numBoxes; i++) {
+      if (this.labels[i] === '' || this.colors[i * 4 + 3] === 0) continue;
+      BABYLON.Vector3.FromArrayToRef(this.tops, i * 3, p);
+      if (!BABYLON.Frustum.IsPointInFrustum(p, frustumPlanes)) continue;
+      BABYLON.Vector3.ProjectToRef(p, BABYLON.Matrix.IdentityReadOnly, transformMatrix, viewport, p);
+      const r = Math.round(this.colors[i * 4 + 0] * 255);
+      const g = Math.round(this.colors[i * 4 + 1] * 255);
+      const b = Math.round(this.colors[i * 4 + 2] * 255);
+      canvas.ctx.fillStyle = 'rgb(' + r + ',' + g + ',' + b + ')';
+      canvas.ctx.fillText(this.labels[i], p.x, p.y);
+    }
+    canvas.ctx.restore();
+  }
+}
@@ -0,0 +1,123 @@
+import * as PB from './protobuf/server';
+import { PICKING_FRAGMENT_GLSL, PICKING_VERTEX_GLSL } from './picking';
+import * as BABYLON from '@babylonjs/core';
+
+// 同じ形状を位置、大きさ、向き、色を変えて描画するシェーダー。
+// ライトを使わずに形状が分かるように、視線方向を向いた面ほど明るくする
+BABYLON.Effect.ShadersStore.glyphsVertexShader = `
+precision highp float;
+attribute vec3 position;
+attribute vec3 normal;
+attribute vec4 glyphColor;
+#include<instancesDeclaration>
+uniform mat4 viewProjection;
+uniform mat4 view;
+varying vec4 vColor;
+${PICKING_VERTEX_GLSL}
+void main(void) {
+#include<instancesVertex>
+  gl_Position = viewProjection * finalWorld * vec4(position, 1.0);
+  vec3 n = normalize(mat3(view) * mat3(finalWorld) * normal);
+  vColor = vec4(glyphColor.rgb * (0.4 + 0.6 * abs(n.z)), 1.0);
+#ifdef PICKING
+  setPickIndex(gl_InstanceID);
+#endif
+}
+`;
+
+BABYLON.Effect.ShadersStore.glyphsFragmentShader = `
+precision highp float;
+varying vec4 vColor;
+${PICKING_FRAGMENT_GLSL}
+void main(void) {
+#ifdef PICKING
+  gl_FragColor = pickColor();
+#else
+  gl_FragColor = vColor;
+#endif
+}
+`;
+
+// 大きさが1の形状を作る。矢印と円錐は原点から+x方向に長さ1で伸びる
+function createGlyphVertexData (shape: PB.AddObjectGlyphsShape): BABYLON.VertexData {
+  // y軸方向の円柱を、y=from から y=to の範囲に移動してから+x方向に向ける
+  const alongX = (vertexData: BABYLON.VertexData, from: number, to: number) => {
+    vertexData.transform(
+      BABYLON.Matrix.Translation(0, (from + to) / 2, 0).multiply(BABYLON.Matrix.RotationZ(-Math.PI / 2))
+    );
+    return vertexData;
+  };
+  switch (shape) {
+    case PB.AddObjectGlyphsShape.ARROW: {
+      const shaft = alongX(BABYLON.VertexData.CreateCylinder({ height: 0.75, diameter: 0.1, tessellation: 12 }), 0, 0.75);
+      const head = alongX(
+        BABYLON.VertexData.CreateCylinder({ height: 0.25, diameterTop: 0, diameterBottom: 0.25, tessellation: 12 }),
+        0.75,
+        1
+      );
+      shaft.merge(head);
+      return shaft;
+    }
+    case PB.AddObjectGlyphsShape.CONE:
+      return alongX(BABYLON.VertexData.CreateCylinder({ height: 1, diameterTop: 0, diameterBottom: 0.5, tessellation: 16 }), 0, 1);
+    case PB.AddObjectGlyphsShape.CUBE:
+      return BABYLON.VertexData.CreateBox({ size: 1 });
+    default:
+      return BABYLON.VertexData.CreateSphere({ diameter: 1, segments: 8 });
+  }
+}
+
+// positions, scales, rotations, rgb で指定した数の形状を1回の描画命令で描画するMeshを作る
+export function createGlyphsMesh (
+  uuid: string,
+  scene: BABYLON.Scene,
+  shape: PB.AddObjectGlyphsShape,
+  positions: Float32Array,
+  scales: Float32Array,
+  rotations: Float32Array,
+  rgb: Uint8Array
+): BABYLON.Mesh {
+  const numGlyphs = Math.floor(positions.length / 3);
+  const matrices = new Float32Array(numGlyphs * 16);
+  const colors = new Float32Array(numGlyphs * 4);
+  const scaling = new BABYLON.Vector3();
+  const rotation = new BABYLON.Quaternion();
+  const translation = new BABYLON.Vector3();
+  const matrix = new BABYLON.Matrix();
+  for (let i = 0; i < numGlyphs; i++) {
+    BABYLON.Vector3.FromArrayToRef(scales, i * 3, scaling);
+    rotation.set(rotations[i * 4], rotations[i * 4 + 1], rotations[i * 4 + 2], rotations[i * 4 + 3]);
+    BABYLON.Vector3.FromArrayToRef(positions, i * 3, translation);
+    BABYLON.Matrix.ComposeToRef(scaling, rotation, translation, matrix);
+    matrix.copyToArray(matrices, i * 16);
+
+    const hasColor = i * 3 + 2 < rgb.length;
+    colors[i * 4 + 0] = hasColor ? rgb[i * 3 + 0] / 255 : 1;
+    colors[i * 4 + 1] = hasColor ? rgb[i * 3 + 1] / 255 : 1;
+    colors[i * 4 + 2] = hasColor ? rgb[i * 3 + 2] / 255 : 1;
+    colors[i * 4 + 3] = 1;
+  }
+
+  const mesh = new BABYLON.Mesh(uuid, scene);
+  createGlyphVertexData(shape).applyToMesh(mesh);
+  mesh.thinInstanceSetBuffer('matrix', matrices, 16, true);
+  mesh.thinInstanceSetBuffer('glyphColor', colors, 4, true);
+  mesh.thinInstanceRefreshBoundingInfo();
+  mesh.isPickable = false;
+
+  mesh.material = createGlyphsMaterial(uuid, scene);
+
+  return mesh;
+}
+
+// createGlyphsMesh で作ったMeshのマテリアル。ピッキング用の描画では形状の番号を出力する
+export function createGlyphsMaterial (uuid: string, scene: BABYLON.Scene, picking: boolean = false): BABYLON.ShaderMaterial {
+  const material = new BABYLON.ShaderMaterial(uuid, scene, { vertex: 'glyphs', fragment: 'glyphs' }, {
+    attributes: ['position', 'normal', 'glyphColor'],
+    uniforms: ['world', 'view', 'viewProjection', 'pickObject'],
+    defines: picking ? ['#define PICKING'] : []
+  });
+  // 右手系のシーンで面の向きが反転しても表示されるように、裏面も描画する
+  material.backFaceCulling = false;
+  return material;
+}
@@ -1,13 +1,16 @@
 import { Canvas2D } from './canvas2d';
+import { PICKING_FRAGMENT_GLSL, PICKING_VERTEX_GLSL } from './picking';
 import * as BABYLON from '@babylonjs/core';
 
 export class Lineset {
-  // positions: number[] // x,y,z,x,y,z,...
-  // colors: number[] // r,g,b,r,g,b,...
-  // indices: number[] // from,to,from,to,...
+  // positions: ArrayLike<number> // x,y,z,x,y,z,...
+  // colors: ArrayLike<number> // r,g,b,r,g,b,...
+  // indices: ArrayLike<number> // from,to,from,to,...
   colorsStr: string[] = [];
   UUID: string
-  constructor (private positions: number[], private indices: number[], colors: number[], private widths: number[], uuid: string) {
+  // set_transform や set_parent で動かす場合の座標系
+  node: BABYLON.TransformNode | null = null
+  constructor (private positions: ArrayLike<number>, private indices: ArrayLike<number>, colors: ArrayLike<number>, private widths: ArrayLike<number>, uuid: string) {
     for (let i = 0; i + 2 < colors.length; i += 3) {
       const r = colors[i + 0];
       const g = colors[i + 1];
@@ -18,6 +21,10 @@ export class Lineset {
   }
 
   render (canvas: Canvas2D, transformMatrix: BABYLON.Matrix) {
+    if (this.node !== null) {
+      if (!this.node.isEnabled()) return;
+      transformMatrix = this.node.computeWorldMatrix().multiply(transformMatrix);
+    }
     const frustumPlanes = BABYLON.Frustum.GetPlanes(transformMatrix);
     const viewport = new BABYLON.Viewport(0, 0, canvas.domElement.clientWidth, canvas.domElement.clientHeight);
     const p0 = new BABYLON.Vector3();
@@ -101,3 +108,160 @@ function trimLineEndPoint (p: BABYLON.Vector3, q: BABYLON.Vector3, frustumPlanes
 
   return false;
 }
+
+// 線分を画面上で太さを持つ四角形に展開するGLSLの関数。
+// p, q は線分の両端のクリップ座標で、p の側の頂点を画面上で side の側に width/2 ピクセルずらしたクリップ座標を返す
+export const EXPAND_LINE_GLSL = `
+vec4 expandLine(vec4 p, vec4 q, float side, float width, vec2 resolution) {
+  const float near = 1e-5;
+  if (p.w < near && q.w < near) {
+    return vec4(2.0, 2.0, 2.0, 1.0);
+  }
+  // カメラの後ろにある端点は、線分に沿ってカメラの前まで移動する
+  if (p.w < near) p = mix(p, q, (near - p.w) / (q.w - p.w));
+  if (q.w < near) q = mix(q, p, (near - q.w) / (p.w - q.w));
+  vec2 dir = (q.xy / q.w - p.xy / p.w) * resolution;
+  dir = length(dir) > 0.0 ? normalize(dir) : vec2(1.0, 0.0);
+  vec2 offset = vec2(-dir.y, dir.x) * side * width / resolution;
+  return vec4(p.xy + offset * p.w, p.z, p.w);
+}
+`;
+
+// 各線分は4頂点からなり、other は線分のもう一方の端点、side は線分の左右どちら側の頂点かを表す
+BABYLON.Effect.ShadersStore.gpuLinesetVertexShader = `
+precision highp float;
+attribute vec3 position;
+attribute vec3 other;
+attribute float side;
+attribute vec4 color;
+attribute float width;
+uniform mat4 worldViewProjection;
+uniform vec2 resolution;
+varying vec4 vColor;
+${EXPAND_LINE_GLSL}
+${PICKING_VERTEX_GLSL}
+void main(void) {
+  gl_Position = expandLine(
+    worldViewProjection * vec4(position, 1.0),
+    worldViewProjection * vec4(other, 1.0),
+    side, width, resolution
+  );
+  vColor = color;
+#ifdef PICKING
+  setPickIndex(gl_VertexID / 4);
+#endif
+}
+`;
+
+BABYLON.Effect.ShadersStore.gpuLinesetFragmentShader = `
+precision highp float;
+varying vec4 vColor;
+${PICKING_FRAGMENT_GLSL}
+void main(void) {
+#ifdef PICKING
+  gl_FragColor = pickColor();
+#else
+  gl_FragColor = vColor;
+#endif
+}
+`;
+
+// 線分ごとの四角形の頂点を作る。線分 i の頂点は i * 4 から i * 4 + 3 になる
+export function createLineQuads (positions: ArrayLike<number>, indices: ArrayLike<number>): {
+  positions: Float32Array,
+  others: Float32Array,
+  sides: Float32Array,
+  indices: Uint32Array
+} {
+  const numLines = Math.floor(indices.length / 2);
+  const quadPositions = new Float32Array(numLines * 4 * 3);
+  const quadOthers = new Float32Array(numLines * 4 * 3);
+  const quadSides = new Float32Array(numLines * 4);
+  const quadIndices = new Uint32Array(numLines * 6);
+  for (let i = 0; i < numLines; i++) {
+    const i0 = indices[i * 2 + 0] * 3;
+    const i1 = indices[i * 2 + 1] * 3;
+    for (let k = 0; k < 4; k++) {
+      const v = i * 4 + k;
+      // 頂点0,1は始点、頂点2,3は終点。
+      // 終点から見ると線分の向きが逆になるので、頂点0,1,2,3が四角形を一周する順に並ぶ
+      const from = k < 2 ? i0 : i1;
+      const to = k < 2 ? i1 : i0;
+      for (let d = 0; d < 3; d++) {
+        quadPositions[v * 3 + d] = positions[from + d];
+        quadOthers[v * 3 + d] = positions[to + d];
+      }
+      quadSides[v] = (k % 2 === 0) ? 1 : -1;
+    }
+    quadIndices[i * 6 + 0] = i * 4;
+    quadIndices[i * 6 + 1] = i * 4 + 1;
+    quadIndices[i * 6 + 2] = i * 4 + 2;
+    quadIndices[i * 6 + 3] = i * 4;
+    quadIndices[i * 6 + 4] = i * 4 + 2;
+    quadIndices[i * 6 + 5] = i * 4 + 3;
+  }
+  return { positions: quadPositions, others: quadOthers, sides: quadSides, indices: quadIndices };
+}
+
+// 描画先の解像度(ピクセル)を resolution に設定する
+export function bindResolution (material: BABYLON.ShaderMaterial, scene: BABYLON.Scene): void {
+  material.onBindObservable.add(() => {
+    const engine = scene.getEngine();
+    material.getEffect()?.setFloat2('resolution', engine.getRenderWidth(), engine.getRenderHeight());
+  });
+}
+
+// 線分の色(r,g,b 0-255)と太さ(ピクセル)をGPUで描画するMeshを作る。
+// Canvas2Dでの描画と異なり、他の物体との前後関係が反映される
+export function createLinesetMesh (
+  uuid: string,
+  scene: BABYLON.Scene,
+  positions: ArrayLike<number>,
+  indices: ArrayLike<number>,
+  colors: ArrayLike<number>,
+  widths: ArrayLike<number>
+): BABYLON.Mesh {
+  const quads = createLineQuads(positions, indices);
+  const numLines = quads.indices.length / 6;
+  const vertexColors = new Float32Array(numLines * 4 * 4);
+  const vertexWidths = new Float32Array(numLines * 4);
+  for (let i = 0; i < numLines; i++) {
+    const hasColor = i * 3 + 2 < colors.length;
+    const r = hasColor ? colors[i * 3 + 0] / 255 : 1;
+    const g = hasColor ? colors[i * 3 + 1] / 255 : 1;
+    const b = hasColor ? colors[i * 3 + 2] / 255 : 1;
+    const w = (i < widths.length) ? widths[i] : 1;
+    for (let v = i * 4; v < i * 4 + 4; v++) {
+      vertexColors[v * 4 + 0] = r;
+      vertexColors[v * 4 + 1] = g;
+      vertexColors[v * 4 + 2] = b;
+      vertexColors[v * 4 + 3] = 1;
+      vertexWidths[v] = w;
+    }
+  }
+
+  const mesh = new BABYLON.Mesh(uuid, scene);
+  mesh.setVerticesData(BABYLON.VertexBuffer.PositionKind, quads.positions, false, 3);
+  mesh.setVerticesData('other', quads.others, false, 3);
+  mesh.setVerticesData('side', quads.sides, false, 1);
+  mesh.setVerticesData(BABYLON.VertexBuffer.ColorKind, vertexColors, false, 4);
+  mesh.setVerticesData('width', vertexWidths, false, 1);
+  mesh.setIndices(quads.indices);
+  mesh.isPickable = false;
+
+  mesh.material = createLinesetMaterial(uuid, scene);
+
+  return mesh;
+}
+
+// createLinesetMesh で作ったMeshのマテリアル。ピッキング用の描画では線分の番号を出力する
+export function createLinesetMaterial (uuid: string, scene: BABYLON.Scene, picking: boolean = false): BABYLON.ShaderMaterial {
+  const material = new BABYLON.ShaderMaterial(uuid, scene, { vertex: 'gpuLineset', fragment: 'gpuLineset' }, {
+    attributes: ['position', 'other', 'side', 'color', 'width'],
+    uniforms: ['worldViewProjection', 'resolution', 'pickObject'],
+    defines: picking ? ['#define PICKING'] : []
+  });
+  material.backFaceCulling = false;
+  bindResolution(material, scene);
+  return material;
+}
@@ -8,6 +8,8 @@ export class Overlay {
   __position: BABYLON.Vector3
   __elem: HTMLElement
   __coordType: PB.AddObjectOverlayCoordinateType
+  // set_transform や set_parent で動かす場合の座標系
+  node: BABYLON.TransformNode | null = null
   constructor(elem: HTMLElement, position: BABYLON.Vector3, coordType: PB.AddObjectOverlayCoordinateType, uuid: string);
 
   constructor (elem: HTMLElement, position: BABYLON.Vector3, coordType: PB.AddObjectOverlayCoordinateType, uuid: string) {
@@ -19,6 +21,10 @@ export class Overlay {
   }
 
   render (canvas: HTMLCanvasElement, scene: BABYLON.Scene) {
+    const visible = this.node === null || this.node.isEnabled();
+    this.__elem.style.display = visible ? '' : 'none';
+    if (!visible) return;
+
     let x: number;
     let y: number;
 
@@ -27,7 +33,7 @@ export class Overlay {
     if (this.__coordType === CoordinateType.WORLD_COORDINATE) {
       const p = BABYLON.Vector3.Project(
         this.__position,
-        BABYLON.Matrix.IdentityReadOnly,
+        this.node !== null ? this.node.computeWorldMatrix() : BABYLON.Matrix.IdentityReadOnly,
         scene.getTransformMatrix(),
         new BABYLON.Viewport(0, 0, canvas.clientWidth, canvas.clientHeight)
       );
@@ -42,6 +48,20 @@ export class Overlay {
     this.__elem.style.left = '' + (x + offset.left) + 'px';
   }
 
+  setPosition (position: BABYLON.Vector3) {
+    this.__position = position;
+  }
+
+  // 文字列のオーバーレイは send_overlay_text でスタイルを指定したdivの中身のみを置き換える
+  setTextHTML (html: string) {
+    const inner = this.__elem.firstElementChild;
+    if (inner !== null) {
+      inner.innerHTML = html;
+    } else {
+      this.__elem.innerHTML = html;
+    }
+  }
+
   dispose () {
     this.__elem.remove();
   }
@@ -0,0 +1,162 @@
+import * as PB from './protobuf/server';
+import { Canvas2D } from './canvas2d';
+import * as BABYLON from '@babylonjs/core';
+
+// 重なり判定に使う格子の1マスの大きさ(ピクセル)
+const DECLUTTER_CELL_SIZE = 64;
+const LABEL_PADDING = 2;
+
+// 大量の文字列をDOM要素を作らずに Canvas2D に描画する
+export class OverlayTexts {
+  UUID: string
+  // set_transform や set_parent で動かす場合の座標系
+  node: BABYLON.TransformNode | null = null
+  // 文字列ごとの幅(ピクセル)。フォントが決まる最初の描画時に計測する
+  private widths: Float32Array | null = null
+  private screen: Float32Array
+  private order: Uint32Array
+
+  constructor (
+    uuid: string,
+    private texts: string[],
+    private positions: Float32Array,
+    private styles: PB.OverlayTextStyle[],
+    private styleIndices: Uint16Array,
+    private declutter: boolean
+  ) {
+    this.UUID = uuid.toUpperCase();
+    this.screen = new Float32Array(texts.length * 3);
+    this.order = new Uint32Array(texts.length);
+  }
+
+  private styleOf (i: number): PB.OverlayTextStyle {
+    return this.styles[i < this.styleIndices.length ? this.styleIndices[i] : 0];
+  }
+
+  private font (style: PB.OverlayTextStyle): string {
+    return `${style.fontSize * window.devicePixelRatio}px sans-serif`;
+  }
+
+  private measure (ctx: CanvasRenderingContext2D): Float32Array {
+    const widths = new Float32Array(this.texts.length);
+    for (let i = 0; i < this.texts.length; i++) {
+      ctx.font = this.font(this.styleOf(i));
+      widths[i] = ctx.measureText(this.texts[i]).width;
+    }
+    return widths;
+  }
+
+  render (canvas: Canvas2D, transformMatrix: BABYLON.Matrix): void {
+    if (this.texts.length === 0 || this.styles.length === 0) return;
+    if (this.node !== null && !this.node.isEnabled()) return;
+    const ctx = canvas.ctx;
+    if (this.widths === null) this.widths = this.measure(ctx);
+    const widths = this.widths;
+    const width = canvas.domElement.width;
+    const height = canvas.domElement.height;
+    const m = (this.node !== null ? this.node.computeWorldMatrix().multiply(transformMatrix) : transformMatrix).m;
+
+    // 視錐台の外にある文字列を除き、画面上の位置とカメラからの奥行きを求める
+    let numVisible = 0;
+    for (let i = 0; i < this.texts.length; i++) {
+      const x = this.positions[i * 3 + 0];
+      const y = this.positions[i * 3 + 1];
+      const z = this.positions[i * 3 + 2];
+      const w = x * m[3] + y * m[7] + z * m[11] + m[15];
+      if (w <= 0) continue;
+      const cx = (x * m[0] + y * m[4] + z * m[8] + m[12]) / w;
+      const cy = (x * m[1] + y * m[5] + z * m[9] + m[13]) / w;
+      if (cx < -1 || cx > 1 || cy < -1 || cy > 1) continue;
+      this.screen[i * 3 + 0] = (cx + 1) / 2 * width;
+      this.screen[i * 3 + 1] = (1 - cy) / 2 * height;
+      this.screen[i * 3 + 2] = w;
+      this.order[numVisible++] = i;
+    }
+    const visible = this.order.subarray(0, numVisible);
+
+    // 手前の文字列から順に、既に置いた文字列と重ならないものだけを描画する
+    const placed: Map<number, number[]> = new Map();
+    if (this.declutter) {
+      visible.sort((a, b) => this.screen[a * 3 + 2] - this.screen[b * 3 + 2]);
+    }
+
+    ctx.save();
+    ctx.textBaseline = 'top';
+    let currentStyle: PB.OverlayTextStyle | null = null;
+    for (let k = 0; k < visible.length; k++) {
+      const i = visible[k];
+      const style = this.styleOf(i);
+      const left = this.screen[i * 3 + 0];
+      const top = this.screen[i * 3 + 1];
+      const right = left + widths[i] + LABEL_PADDING * 2;
+      const bottom = top + style.fontSize * window.devicePixelRatio + LABEL_PADDING * 2;
+
+      if (this.declutter) {
+        const c0 = Math.floor(left / DECLUTTER_CELL_SIZE);
+        const c1 = Math.floor(right / DECLUTTER_CELL_SIZE);
+        const r0 = Math.floor(top / DECLUTTER_CELL_SIZE);
+        const r1 = Math.floor(bottom / DECLUTTER_CELL_SIZE);
+        if (overlapsPlaced(placed, this.screen, widths, c0, c1, r0, r1, left, top, right, bottom)) continue;
+        for (let r = r0; r <= r1; r++) {
+          for (let c = c0; c <= c1; c++) {
+            const cell = cellKey(c, r);
+            const labels = placed.get(cell);
+            if (labels === undefined) {
+              placed.set(cell, [i, bottom]);
+            } else {
+              labels.push(i, bottom);
+            }
+          }
+        }
+      }
+
+      if (style !== currentStyle) {
+        ctx.font = this.font(style);
+        currentStyle = style;
+      }
+      if (style.background !== '') {
+        ctx.fillStyle = style.background;
+        ctx.fillRect(left, top, right - left, bottom - top);
+      }
+      ctx.fillStyle = style.color;
+      ctx.fillText(this.texts[i], left + LABEL_PADDING, top + LABEL_PADDING);
+    }
+    ctx.restore();
+  }
+}
+
+function cellKey (column: number, row: number): number {
+  return row * 65536 + column;
+}
+
+// 格子の c0-c1 列、r0-r1 行に置かれた文字列のいずれかと、矩形が重なるかどうか
+function overlapsPlaced (
+  placed: Map<number, number[]>,
+  screen: Float32Array,
+  widths: Float32Array,
+  c0: number,
+  c1: number,
+  r0: number,
+  r1: number,
+  left: number,
+  top: number,
+  right: number,
+  bottom: number
+): boolean {
+  for (let r = r0; r <= r1; r++) {
+    for (let c = c0; c <= c1; c++) {
+      const labels = placed.get(cellKey(c, r));
+      if (labels === undefined) continue;
+      // labels には置いた文字列の番号と下端の座標が交互に入っている
+      for (let j = 0; j < labels.length; j += 2) {
+        const other = labels[j];
+        const otherLeft = screen[other * 3 + 0];
+        const otherTop = screen[other * 3 + 1];
+        const otherRight = otherLeft + widths[other] + LABEL_PADDING * 2;
+        const otherBottom = labels[j + 1];
+        if (left < otherRight && otherLeft < right && top < otherBottom && otherTop < bottom) return true;
+      }
+    }
+  }
+  return false;
+}
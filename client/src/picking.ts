@@ -0,0 +1,222 @@
+import * as BABYLON from '@babylonjs/core';
+
+// ピッキング用の描画では、オブジェクトの番号(1から)と要素の番号を色として浮動小数点数のテクスチャに書き込む。
+// 要素の番号は float の精度を超えないように上位と下位の16ビットに分けて渡す。
+// 各シェーダーは PICKING が定義されている場合に setPickIndex で要素の番号を設定し、pickColor を出力する
+export const PICKING_VERTEX_GLSL = `
+#ifdef PICKING
+varying vec2 vPickIndex;
+
+void setPickIndex(int index) {
+  vPickIndex = vec2(float(index / 65536), float(index % 65536));
+}
+#endif
+`;
+
+export const PICKING_FRAGMENT_GLSL = `
+#ifdef PICKING
+uniform float pickObject;
+varying vec2 vPickIndex;
+
+vec4 pickColor() {
+  return vec4(pickObject, floor(vPickIndex + 0.5), 1.0);
+}
+#endif
+`;
+
+// 要素の番号を持たないMeshや画像のピッキング用のシェーダー
+BABYLON.Effect.ShadersStore.pickMeshVertexShader = `
+precision highp float;
+attribute vec3 position;
+uniform mat4 worldViewProjection;
+
+void main(void) {
+  gl_Position = worldViewProjection * vec4(position, 1.0);
+}
+`;
+
+BABYLON.Effect.ShadersStore.pickMeshFragmentShader = `
+precision highp float;
+uniform float pickObject;
+
+void main(void) {
+  gl_FragColor = vec4(pickObject, -1.0, 0.0, 1.0);
+}
+`;
+
+export function createMeshPickingMaterial (name: string, scene: BABYLON.Scene): BABYLON.ShaderMaterial {
+  const material = new BABYLON.ShaderMaterial(name, scene, { vertex: 'pickMesh', fragment: 'pickMesh' }, {
+    attributes: ['position'],
+    uniforms: ['worldViewProjection', 'pickObject']
+  });
+  material.backFaceCulling = false;
+  return material;
+}
+
+// クリックした位置から、この距離(ピクセル)以内で最も近いオブジェクトを選ぶ
+const PICK_RADIUS = 4;
+
+// 表示中のMeshの material が変わった場合は、ピッキング用のマテリアルを作り直す
+type Pickable = {
+  createMaterial: () => BABYLON.ShaderMaterial
+  // 要素の位置(ローカル座標)。分からない場合は null を返す
+  getPosition: ((index: number) => BABYLON.Vector3 | null) | null
+  source: BABYLON.Nullable<BABYLON.Material>
+  material: BABYLON.ShaderMaterial | null
+};
+
+export type PickResult = {
+  // オブジェクトのUUID(大文字)
+  object: string
+  // 要素の番号。要素の番号を持たないオブジェクトの場合は-1
+  index: number
+  // 要素のワールド座標。分からない場合は null
+  position: BABYLON.Vector3 | null
+};
+
+// オブジェクトと要素の番号を書き込んだテクスチャ(IDバッファ)をクリックした時などにだけ描画し、
+// カーソル付近の画素を読み出して、カーソルの位置にあるオブジェクトを調べる。
+// 点の数によらずGPUでの描画1回と数十画素の読み出しで済む
+export class Picker {
+  private pickables = new Map<BABYLON.Mesh, Pickable>();
+  private target: BABYLON.RenderTargetTexture | null = null;
+  // 描画と読み出しの間に他のピッキングで描画し直されないように、順番に処理する
+  private queue: Promise<unknown> = Promise.resolve();
+
+  constructor (private scene: BABYLON.Scene) {}
+
+  // 浮動小数点数のテクスチャへの描画と gl_VertexID が必要なので WebGL2 でのみ使える
+  get supported (): boolean {
+    const engine = this.scene.getEngine();
+    return engine.webGLVersion >= 2 && engine.getCaps().textureFloatRender;
+  }
+
+  // mesh をピッキングの対象にする。mesh が破棄されると対象から外れる
+  register (
+    mesh: BABYLON.Mesh,
+    createMaterial: () => BABYLON.ShaderMaterial,
+    getPosition: ((index: number) => BABYLON.Vector3 | null) | null = null
+  ): void {
+    this.pickables.set(mesh, { createMaterial, getPosition, source: null, material: null });
+    mesh.onDisposeObservable.addOnce(() => {
+      this.pickables.get(mesh)?.material?.dispose();
+      this.pickables.delete(mesh);
+    });
+  }
+
+  // canvas上の位置(CSSピクセル)にあるオブジェクトを調べる。何もない場合は null
+  pick (x: number, y: number): Promise<PickResult | null> {
+    const result = this.queue.then(() => this.pickNow(x, y));
+    this.queue = result.catch(() => null);
+    return result;
+  }
+
+  private async pickNow (x: number, y: number): Promise<PickResult | null> {
+    const engine = this.scene.getEngine();
+    const width = engine.getRenderWidth();
+    const height = engine.getRenderHeight();
+    const canvas = engine.getRenderingCanvas();
+    const scale = (canvas !== null && canvas.clientWidth > 0) ? width / canvas.clientWidth : 1;
+    const px = Math.floor(x * scale);
+    // テクスチャは下の行から並ぶ
+    const py = height - 1 - Math.floor(y * scale);
+    if (px < 0 || px >= width || py < 0 || py >= height) {
+      return null;
+    }
+
+    const meshes: BABYLON.Mesh[] = [];
+    const target = this.getTarget(width, height);
+    this.pickables.forEach((pickable, mesh) => {
+      if (!mesh.isEnabled() || !mesh.isVisible) {
+        return;
+      }
+      if (pickable.material === null || pickable.source !== mesh.material) {
+        pickable.material?.dispose();
+        pickable.material = pickable.createMaterial();
+        pickable.source = mesh.material;
+      }
+      meshes.push(mesh);
+      pickable.material.setFloat('pickObject', meshes.length);
+      target.setMaterialForRendering(mesh, pickable.material);
+    });
+    if (meshes.length === 0) {
+      return null;
+    }
+    await whenReady(meshes.map((mesh): [BABYLON.Mesh, BABYLON.Material | null] => [
+      mesh, this.pickables.get(mesh)?.material ?? null
+    ]));
+    target.renderList = meshes;
+    target.render();
+
+    const x0 = Math.max(0, px - PICK_RADIUS);
+    const y0 = Math.max(0, py - PICK_RADIUS);
+    const w = Math.min(width, px + PICK_RADIUS + 1) - x0;
+    const h = Math.min(height, py + PICK_RADIUS + 1) - y0;
+    const pixels = await target.readPixels(0, 0, null, true, false, x0, y0, w, h);
+    if (pixels === null) {
+      return null;
+    }
+    const data = pixels as Float32Array;
+
+    let nearest = -1;
+    let nearestDistance = Infinity;
+    for (let j = 0; j < h; j++) {
+      for (let i = 0; i < w; i++) {
+        if (data[(j * w + i) * 4] < 0.5) continue;
+        const distance = (x0 + i - px) ** 2 + (y0 + j - py) ** 2;
+        if (distance < nearestDistance) {
+          nearest = j * w + i;
+          nearestDistance = distance;
+        }
+      }
+    }
+    if (nearest < 0) {
+      return null;
+    }
+    const mesh = meshes[Math.round(data[nearest * 4]) - 1];
+    if (mesh === undefined) {
+      return null;
+    }
+    const encodedIndex = Math.round(data[nearest * 4 + 1]) * 65536 + Math.round(data[nearest * 4 + 2]);
+    const index = encodedIndex < 0 ? -1 : encodedIndex;
+    let position: BABYLON.Vector3 | null = null;
+    const getPosition = this.pickables.get(mesh)?.getPosition;
+    if (index >= 0 && getPosition) {
+      const local = getPosition(index);
+      if (local !== null) {
+        position = BABYLON.Vector3.TransformCoordinates(local, mesh.computeWorldMatrix());
+      }
+    }
+    return { object: mesh.name.toUpperCase(), index, position };
+  }
+
+  private getTarget (width: number, height: number): BABYLON.RenderTargetTexture {
+    if (this.target !== null) {
+      const size = this.target.getSize();
+      if (size.width === width && size.height === height) {
+        return this.target;
+      }
+      this.target.dispose();
+    }
+    const target = new BABYLON.RenderTargetTexture(
+      'picking', { width, height }, this.scene,
+      false, // generateMipMaps
+      true, // doNotChangeAspectRatio
+      BABYLON.Constants.TEXTURETYPE_FLOAT,
+      false, // isCube
+      BABYLON.Texture.NEAREST_SAMPLINGMODE
+    );
+    target.clearColor = new BABYLON.Color4(0, 0, 0, 0);
+    this.target = target;
+    return target;
+  }
+}
+
+// mesh を material で描画するためのシェーダーのコンパイルを待つ
+export async function whenReady (pairs: [BABYLON.Mesh, BABYLON.Material | null][]): Promise<void> {
+  for (let i = 0; i < 100; i++) {
+    const ready = pairs.every(([mesh, material]) => material === null || material.isReady(mesh, mesh.hasThinInstances));
+    if (ready) return;
+    await new Promise((resolve) => setTimeout(resolve, 10));
+  }
+}
@@ -0,0 +1,582 @@
+import * as BABYLON from '@babylonjs/core';
+import { PICKING_FRAGMENT_GLSL, PICKING_VERTEX_GLSL } from './picking';
+
+// 範囲選択の結果を書き込むテクスチャの幅。点 i の結果は (i % SELECTION_RESULT_WIDTH, i / SELECTION_RESULT_WIDTH) の画素に書き込む
+export const SELECTION_RESULT_WIDTH = 4096;
+
+const VERTEX_SHADER = `
+precision highp float;
+
+attribute vec3 position;
+#ifdef VERTEX_COLOR
+attribute vec3 rgb;
+#endif
+#ifdef SCALAR
+attribute float scalar;
+uniform vec2 scalarRange;
+varying float vScalar;
+#endif
+#ifdef PALETTE
+attribute float label;
+varying float vLabel;
+#endif
+
+#ifdef QUANTIZED
+// チャンクごとに原点とスケールの2テクセル
+uniform sampler2D chunks;
+
+vec4 fetchChunkTexel(int i) {
+  return texelFetch(chunks, ivec2(i % CHUNK_TEXTURE_WIDTH, i / CHUNK_TEXTURE_WIDTH), 0);
+}
+#endif
+
+uniform mat4 worldViewProjection;
+uniform float pointSize;
+
+varying vec3 vColor;
+${PICKING_VERTEX_GLSL}
+#ifdef SELECTION
+uniform sampler2D selectionMask;
+uniform float resultHeight;
+#endif
+
+void main(void) {
+#ifdef QUANTIZED
+  int chunk = gl_VertexID / CHUNK_SIZE;
+  vec3 p = fetchChunkTexel(chunk * 2).xyz + position * fetchChunkTexel(chunk * 2 + 1).xyz;
+#else
+  vec3 p = position;
+#endif
+  gl_Position = worldViewProjection * vec4(p, 1.0);
+  gl_PointSize = pointSize;
+#ifdef SCALAR
+  vScalar = clamp((scalar - scalarRange.x) / max(scalarRange.y - scalarRange.x, 1e-20), 0.0, 1.0);
+#endif
+#ifdef PALETTE
+  vLabel = label;
+#endif
+#ifdef VERTEX_COLOR
+  vColor = rgb;
+#else
+  vColor = vec3(1.0);
+#endif
+#ifdef PICKING
+  setPickIndex(gl_VertexID);
+#endif
+#ifdef SELECTION
+  // 画面上で選択範囲の内側に投影される点だけを、点の番号に対応する画素に書き込む
+  vec2 ndc = gl_Position.xy / gl_Position.w;
+  bool inside = gl_Position.w > 0.0 && abs(ndc.x) <= 1.0 && abs(ndc.y) <= 1.0 &&
+    texture2D(selectionMask, ndc * 0.5 + 0.5).r > 0.5;
+  vec2 texel = vec2(float(gl_VertexID % SELECTION_RESULT_WIDTH), float(gl_VertexID / SELECTION_RESULT_WIDTH)) + 0.5;
+  gl_Position = inside
+    ? vec4(texel / vec2(float(SELECTION_RESULT_WIDTH), resultHeight) * 2.0 - 1.0, 0.0, 1.0)
+    : vec4(2.0, 2.0, 2.0, 1.0);
+  gl_PointSize = 1.0;
+#endif
+}
+`;
+
+const FRAGMENT_SHADER = `
+precision highp float;
+
+varying vec3 vColor;
+#ifdef SCALAR
+varying float vScalar;
+uniform sampler2D colormap;
+#endif
+#ifdef PALETTE
+varying float vLabel;
+uniform sampler2D palette;
+uniform float paletteHeight;
+#endif
+${PICKING_FRAGMENT_GLSL}
+void main(void) {
+#ifdef PALETTE
+  float label = floor(vLabel + 0.5);
+  float x = mod(label, PALETTE_WIDTH);
+  float y = floor(label / PALETTE_WIDTH);
+  vec4 color = texture2D(palette, vec2((x + 0.5) / PALETTE_WIDTH, (y + 0.5) / paletteHeight));
+  // パレットで非表示にしたラベルの点はピッキングの対象にもしない
+  if (color.a < 0.5 / 255.0) {
+    discard;
+  }
+#endif
+#ifdef PICKING
+  gl_FragColor = pickColor();
+#elif defined(SELECTION)
+  gl_FragColor = vec4(1.0);
+#elif defined(SCALAR)
+  gl_FragColor = vec4(texture2D(colormap, vec2(vScalar, 0.5)).rgb, 1.0);
+#elif defined(PALETTE)
+  gl_FragColor = vec4(color.rgb, 1.0);
+#else
+  gl_FragColor = vec4(vColor, 1.0);
+#endif
+}
+`;
+
+const COLORMAP_RESOLUTION = 256;
+
+const CHUNK_TEXTURE_WIDTH = 1024;
+
+// パレットは最大65536色になるので、テクスチャの幅の上限を超えないように複数行に分けて格納する
+const PALETTE_WIDTH = 256;
+
+// [位置, r, g, b]
+const COLORMAPS: { [name: string]: [number, number, number, number][] } = {
+  viridis: [
+    [0.0, 68, 1, 84], [0.125, 71, 44, 122], [0.25, 59, 81, 139], [0.375, 44, 113, 142], [0.5, 33, 144, 141],
+    [0.625, 39, 173, 129], [0.75, 92, 200, 99], [0.875, 170, 220, 50], [1.0, 253, 231, 37]
+  ],
+  turbo: [
+    [0.0, 48, 18, 59], [0.125, 70, 107, 227], [0.25, 40, 187, 236], [0.375, 49, 242, 153], [0.5, 162, 252, 60],
+    [0.625, 237, 208, 58], [0.75, 251, 128, 34], [0.875, 212, 52, 4], [1.0, 122, 4, 3]
+  ],
+  jet: [
+    [0.0, 0, 0, 128], [0.125, 0, 0, 255], [0.375, 0, 255, 255], [0.625, 255, 255, 0], [0.875, 255, 0, 0], [1.0, 128, 0, 0]
+  ],
+  gray: [
+    [0.0, 0, 0, 0], [1.0, 255, 255, 255]
+  ]
+};
+
+function colormapData (name: string): Uint8Array {
+  const stops = COLORMAPS[name];
+  const data = new Uint8Array(COLORMAP_RESOLUTION * 4);
+  let s = 0;
+  for (let i = 0; i < COLORMAP_RESOLUTION; i++) {
+    const t = i / (COLORMAP_RESOLUTION - 1);
+    while (s + 2 < stops.length && stops[s + 1][0] < t) s++;
+    const [t0, r0, g0, b0] = stops[s];
+    const [t1, r1, g1, b1] = stops[s + 1];
+    const a = Math.max(0, Math.min(1, (t - t0) / (t1 - t0)));
+    data[i * 4 + 0] = Math.round(r0 + (r1 - r0) * a);
+    data[i * 4 + 1] = Math.round(g0 + (g1 - g0) * a);
+    data[i * 4 + 2] = Math.round(b0 + (b1 - b0) * a);
+    data[i * 4 + 3] = 255;
+  }
+  return data;
+}
+
+function createColormapTexture (data: Uint8Array, scene: BABYLON.Scene): BABYLON.RawTexture {
+  const texture = BABYLON.RawTexture.CreateRGBATexture(
+    data, COLORMAP_RESOLUTION, 1, scene, false, false, BABYLON.Texture.BILINEAR_SAMPLINGMODE
+  );
+  texture.wrapU = BABYLON.Texture.CLAMP_ADDRESSMODE;
+  texture.wrapV = BABYLON.Texture.CLAMP_ADDRESSMODE;
+  return texture;
+}
+
+function paletteHeight (colors: Uint8Array): number {
+  return Math.max(1, Math.ceil(colors.length / 4 / PALETTE_WIDTH));
+}
+
+// colors は r,g,b,a,r,g,b,a,... 。パレットに含まれないラベルはアルファ値0として扱う
+function paletteData (colors: Uint8Array, height: number): Uint8Array {
+  const data = new Uint8Array(PALETTE_WIDTH * height * 4);
+  data.set(colors);
+  return data;
+}
+
+function createPaletteTexture (data: Uint8Array, height: number, scene: BABYLON.Scene): BABYLON.RawTexture {
+  const texture = BABYLON.RawTexture.CreateRGBATexture(
+    data, PALETTE_WIDTH, height, scene, false, false, BABYLON.Texture.NEAREST_SAMPLINGMODE
+  );
+  texture.wrapU = BABYLON.Texture.CLAMP_ADDRESSMODE;
+  texture.wrapV = BABYLON.Texture.CLAMP_ADDRESSMODE;
+  return texture;
+}
+
+function createChunkTexture (chunks: Float32Array, scene: BABYLON.Scene): BABYLON.RawTexture {
+  const numChunks = chunks.length / 6;
+  const height = Math.max(1, Math.ceil(numChunks * 2 / CHUNK_TEXTURE_WIDTH));
+  const data = new Float32Array(CHUNK_TEXTURE_WIDTH * height * 4);
+  for (let i = 0; i < numChunks; i++) {
+    data.set(chunks.subarray(i * 6, i * 6 + 3), i * 8);
+    data.set(chunks.subarray(i * 6 + 3, i * 6 + 6), i * 8 + 4);
+  }
+  return new BABYLON.RawTexture(
+    data, CHUNK_TEXTURE_WIDTH, height, BABYLON.Constants.TEXTUREFORMAT_RGBA, scene,
+    false, false, BABYLON.Texture.NEAREST_SAMPLINGMODE, BABYLON.Constants.TEXTURETYPE_FLOAT
+  );
+}
+
+export type QuantizedPositions = {
+  positions: Uint16Array // x,y,z,x,y,z,...
+  chunks: Float32Array // チャンクごとに原点x,y,z, スケールx,y,z
+  chunkSize: number
+};
+
+export function dequantizePositions (quantized: QuantizedPositions): Float32Array {
+  const q = quantized.positions;
+  const chunks = quantized.chunks;
+  const positions = new Float32Array(q.length);
+  for (let i = 0; i < q.length / 3; i++) {
+    const c = Math.floor(i / quantized.chunkSize) * 6;
+    for (let k = 0; k < 3; k++) {
+      positions[i * 3 + k] = chunks[c + k] + q[i * 3 + k] * chunks[c + 3 + k];
+    }
+  }
+  return positions;
+}
+
+export function isColormapName (name: string): boolean {
+  return name in COLORMAPS;
+}
+
+type ColorMode = {
+  type: 'rgb'
+} | {
+  type: 'scalar'
+  field: string
+  colormap: string
+  min: number
+  max: number
+} | {
+  type: 'palette'
+  colors: Uint8Array
+};
+
+type ScalarField = {
+  values: Float32Array
+  min: number
+  max: number
+};
+
+export class PointCloud {
+  mesh: BABYLON.Mesh
+  material: BABYLON.ShaderMaterial | null = null
+  colormapTexture: BABYLON.RawTexture | null = null
+  colormapName: string | null = null
+  paletteTexture: BABYLON.RawTexture | null = null
+  chunkTexture: BABYLON.RawTexture | null = null
+
+  positions: Float32Array // x,y,z,x,y,z,...
+  colors: Uint8Array | null // r,g,b,r,g,b,...
+  scalars: { [name: string]: ScalarField } = {}
+  labels: Float32Array | null = null
+  colorMode: ColorMode = { type: 'rgb' }
+  // 'scalar' 属性としてGPUに送ってあるスカラー値の名前
+  uploadedScalar: string | null = null
+  // 量子化された座標を受け取った場合、WebGL2では量子化されたままGPUに送って頂点シェーダで復元する
+  quantized: QuantizedPositions | null
+
+  constructor (
+    private uuid: string,
+    private scene: BABYLON.Scene,
+    positions: Float32Array,
+    colors: Uint8Array | null,
+    private pointSize: number,
+    quantized: QuantizedPositions | null = null
+  ) {
+    this.mesh = new BABYLON.Mesh(uuid, scene);
+    this.positions = positions;
+    this.colors = colors;
+    this.quantized = scene.getEngine().webGLVersion >= 2 ? quantized : null;
+    this.uploadGeometry();
+    this.updateMaterial();
+  }
+
+  get numPoints (): number {
+    return this.positions.length / 3;
+  }
+
+  addScalarField (name: string, values: Float32Array, min: number, max: number) {
+    this.scalars[name] = { values, min, max };
+  }
+
+  setLabels (labels: Float32Array) {
+    this.labels = labels;
+  }
+
+  useVertexColor () {
+    this.setColorMode({ type: 'rgb' });
+  }
+
+  // 指定したスカラー値をカラーマップで色に変換して表示する。エラーの場合はその内容を返す
+  useColormap (field: string, colormap: string, min: number | undefined, max: number | undefined): string | null {
+    const scalar = this.scalars[field];
+    if (scalar === undefined) {
+      return `scalar field ${field} not found`;
+    }
+    if (!isColormapName(colormap)) {
+      return `unknown colormap ${colormap}`;
+    }
+    this.setColorMode({
+      type: 'scalar',
+      field,
+      colormap,
+      min: min ?? scalar.min,
+      max: max ?? scalar.max
+    });
+    return null;
+  }
+
+  // ラベルに対応する色で表示する。エラーの場合はその内容を返す
+  usePalette (colors: Uint8Array): string | null {
+    if (this.labels === null) {
+      return 'pointcloud has no labels';
+    }
+    if (colors.length % 4 !== 0) {
+      return 'invalid palette length';
+    }
+    this.setColorMode({ type: 'palette', colors });
+    return null;
+  }
+
+  // 差分を適用する。clear, change, remove, add の順に適用される。エラーの場合はその内容を返す
+  applyDelta (
+    clear: boolean,
+    removeIndices: Uint32Array,
+    changeIndices: Uint32Array,
+    changeColors: Uint8Array,
+    addPositions: Float32Array,
+    addColors: Uint8Array
+  ): string | null {
+    const numOld = clear ? 0 : this.numPoints;
+    const numAdd = addPositions.length / 3;
+    if (addColors.length !== numAdd * 3) {
+      return 'length of add_colors does not match';
+    }
+    const oldColors = (this.colors !== null && !clear) ? this.colors.slice() : new Uint8Array(numOld * 3).fill(255);
+
+    for (let i = 0; i < changeIndices.length; i++) {
+      const j = changeIndices[i];
+      if (j >= numOld) {
+        return 'change index out of range';
+      }
+      oldColors[j * 3 + 0] = changeColors[i * 3 + 0];
+      oldColors[j * 3 + 1] = changeColors[i * 3 + 1];
+      oldColors[j * 3 + 2] = changeColors[i * 3 + 2];
+    }
+
+    const removed = new Uint8Array(numOld);
+    for (let i = 0; i < removeIndices.length; i++) {
+      const j = removeIndices[i];
+      if (j >= numOld) {
+        return 'remove index out of range';
+      }
+      removed[j] = 1;
+    }
+    const kept: number[] = [];
+    for (let i = 0; i < numOld; i++) {
+      if (!removed[i]) kept.push(i);
+    }
+
+    const numNew = kept.length + numAdd;
+    const positions = new Float32Array(numNew * 3);
+    const colors = new Uint8Array(numNew * 3);
+    for (let n = 0; n < kept.length; n++) {
+      const i = kept[n];
+      for (let k = 0; k < 3; k++) {
+        positions[n * 3 + k] = this.positions[i * 3 + k];
+        colors[n * 3 + k] = oldColors[i * 3 + k];
+      }
+    }
+    positions.set(addPositions, kept.length * 3);
+    colors.set(addColors, kept.length * 3);
+
+    // 追加された点のスカラー値とラベルは0とする
+    const compact = (values: Float32Array) => {
+      const compacted = new Float32Array(numNew);
+      for (let n = 0; n < kept.length; n++) {
+        compacted[n] = values[kept[n]];
+      }
+      return compacted;
+    };
+    for (const name in this.scalars) {
+      this.scalars[name].values = compact(this.scalars[name].values);
+    }
+    if (this.labels !== null) {
+      this.labels = compact(this.labels);
+    }
+
+    this.positions = positions;
+    this.colors = colors;
+    // 差分を適用した後はチャンクの構造が保てないのでfloat32の座標を使う
+    this.quantized = null;
+    if (this.chunkTexture !== null) {
+      this.chunkTexture.dispose();
+      this.chunkTexture = null;
+    }
+    this.uploadGeometry();
+    this.updateMaterial();
+    return null;
+  }
+
+  private uploadGeometry () {
+    const mesh = this.mesh;
+    if (this.quantized !== null) {
+      mesh.setVerticesBuffer(new BABYLON.VertexBuffer(
+        this.scene.getEngine(), this.quantized.positions, BABYLON.VertexBuffer.PositionKind,
+        false, // updatable
+        false, // postponeInternalCreation
+        3, // stride
+        false, // instanced
+        0, // offset
+        3, // size
+        BABYLON.VertexBuffer.UNSIGNED_SHORT,
+        false // normalized
+      ));
+      if (this.chunkTexture === null) {
+        this.chunkTexture = createChunkTexture(this.quantized.chunks, this.scene);
+      }
+      // バウンディングボックスは量子化された値から計算されてしまうので設定し直す
+      const { minimum, maximum } = BABYLON.extractMinAndMax(this.positions, 0, this.numPoints);
+      mesh.setBoundingInfo(new BABYLON.BoundingInfo(minimum, maximum));
+      mesh.alwaysSelectAsActiveMesh = true;
+    } else {
+      mesh.setVerticesData(BABYLON.VertexBuffer.PositionKind, this.positions, true);
+      mesh.alwaysSelectAsActiveMesh = false;
+    }
+    if (this.colors !== null) {
+      mesh.setVerticesBuffer(new BABYLON.VertexBuffer(
+        this.scene.getEngine(), this.colors, 'rgb',
+        false, // updatable
+        false, // postponeInternalCreation
+        3, // stride
+        false, // instanced
+        0, // offset
+        3, // size
+        BABYLON.VertexBuffer.UNSIGNED_BYTE,
+        true // normalized
+      ));
+    }
+    // 点が変わるとスカラー値とラベルも変わるので送り直す
+    for (const kind of ['scalar', 'label']) {
+      if (mesh.isVerticesDataPresent(kind)) mesh.removeVerticesData(kind);
+    }
+    this.uploadedScalar = null;
+    this.uploadColorAttributes();
+  }
+
+  // 色の表示方法に必要なスカラー値とラベルの属性のみを送る。座標と色は送り直さない
+  private uploadColorAttributes () {
+    const mesh = this.mesh;
+    if (this.colorMode.type === 'scalar') {
+      if (this.uploadedScalar !== this.colorMode.field) {
+        mesh.setVerticesData('scalar', this.scalars[this.colorMode.field].values, false, 1);
+        this.uploadedScalar = this.colorMode.field;
+      }
+    } else if (this.uploadedScalar !== null) {
+      mesh.removeVerticesData('scalar');
+      this.uploadedScalar = null;
+    }
+    if (this.colorMode.type === 'palette' && this.labels !== null) {
+      if (!mesh.isVerticesDataPresent('label')) mesh.setVerticesData('label', this.labels, false, 1);
+    } else if (mesh.isVerticesDataPresent('label')) {
+      mesh.removeVerticesData('label');
+    }
+  }
+
+  // pass が 'picking' の場合はピッキング用に点の番号を出力し、'selection' の場合は範囲選択の結果を書き込む。
+  // どちらの場合もパレットで非表示にした点は描画しない
+  createMaterial (pass: 'color' | 'picking' | 'selection' = 'color'): BABYLON.ShaderMaterial {
+    const attributes = ['position'];
+    const defines: string[] = [];
+    if (this.quantized !== null) {
+      defines.push(
+        '#define QUANTIZED',
+        `#define CHUNK_SIZE ${this.quantized.chunkSize}`,
+        `#define CHUNK_TEXTURE_WIDTH ${CHUNK_TEXTURE_WIDTH}`
+      );
+    }
+    if (pass === 'picking') {
+      defines.push('#define PICKING');
+    } else if (pass === 'selection') {
+      defines.push('#define SELECTION', `#define SELECTION_RESULT_WIDTH ${SELECTION_RESULT_WIDTH}`);
+    }
+    if (this.colorMode.type === 'scalar' && pass === 'color') {
+      attributes.push('scalar');
+      defines.push('#define SCALAR');
+    } else if (this.colorMode.type === 'palette') {
+      attributes.push('label');
+      defines.push('#define PALETTE', `#define PALETTE_WIDTH ${PALETTE_WIDTH.toFixed(1)}`);
+    } else if (this.colors !== null && pass === 'color') {
+      attributes.push('rgb');
+      defines.push('#define VERTEX_COLOR');
+    }
+
+    const material = new BABYLON.ShaderMaterial(this.uuid, this.scene, {
+      vertexSource: VERTEX_SHADER,
+      fragmentSource: FRAGMENT_SHADER
+    }, {
+      attributes,
+      uniforms: ['worldViewProjection', 'pointSize', 'scalarRange', 'paletteHeight', 'pickObject', 'resultHeight'],
+      samplers: ['colormap', 'palette', 'chunks', 'selectionMask'],
+      defines
+    });
+    material.pointsCloud = true;
+    material.backFaceCulling = false;
+    material.setFloat('pointSize', this.pointSize);
+    if (this.chunkTexture !== null) {
+      material.setTexture('chunks', this.chunkTexture);
+    }
+    this.bindColorMode(material);
+    return material;
+  }
+
+  private bindColorMode (material: BABYLON.ShaderMaterial) {
+    if (this.colorMode.type === 'scalar' && this.colormapTexture !== null) {
+      material.setTexture('colormap', this.colormapTexture);
+      material.setVector2('scalarRange', new BABYLON.Vector2(this.colorMode.min, this.colorMode.max));
+    } else if (this.colorMode.type === 'palette' && this.paletteTexture !== null) {
+      material.setTexture('palette', this.paletteTexture);
+      material.setFloat('paletteHeight', this.paletteTexture.getSize().height);
+    }
+  }
+
+  // i番目の点の位置(ローカル座標)
+  getPosition (i: number): BABYLON.Vector3 | null {
+    if (i < 0 || i >= this.numPoints) return null;
+    return BABYLON.Vector3.FromArray(this.positions, i * 3);
+  }
+
+  // 表示方法の種類が変わらない場合は、マテリアルをそのまま使いテクスチャとユニフォームのみを更新する
+  private setColorMode (colorMode: ColorMode) {
+    const typeChanged = colorMode.type !== this.colorMode.type;
+    this.colorMode = colorMode;
+    this.uploadColorAttributes();
+    const textureCreated = this.updateColorTexture();
+    if (this.material === null || typeChanged || textureCreated) {
+      this.updateMaterial();
+    } else {
+      this.bindColorMode(this.material);
+    }
+  }
+
+  // 表示方法に使うテクスチャを更新する。テクスチャを作り直した場合は true を返す
+  private updateColorTexture (): boolean {
+    if (this.colorMode.type === 'scalar') {
+      if (this.colormapTexture === null) {
+        this.colormapTexture = createColormapTexture(colormapData(this.colorMode.colormap), this.scene);
+        this.colormapName = this.colorMode.colormap;
+        return true;
+      }
+      if (this.colormapName !== this.colorMode.colormap) {
+        this.colormapTexture.update(colormapData(this.colorMode.colormap));
+        this.colormapName = this.colorMode.colormap;
+      }
+    } else if (this.colorMode.type === 'palette') {
+      const height = paletteHeight(this.colorMode.colors);
+      // ピッキング用のマテリアルも同じテクスチャを参照するので、大きさが同じなら同じテクスチャに書き込む
+      if (this.paletteTexture !== null && this.paletteTexture.getSize().height === height) {
+        this.paletteTexture.update(paletteData(this.colorMode.colors, height));
+        return false;
+      }
+      if (this.paletteTexture !== null) this.paletteTexture.dispose();
+      this.paletteTexture = createPaletteTexture(paletteData(this.colorMode.colors, height), height, this.scene);
+      return true;
+    }
+    return false;
+  }
+
+  private updateMaterial () {
+    const material = this.createMaterial();
+
+    if (this.material !== null) this.material.dispose();
+    this.material = material;
+    this.mesh.material = material;
+  }
+}
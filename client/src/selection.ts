@@ -0,0 +1,287 @@
+import * as BABYLON from '@babylonjs/core';
+import { PointCloud, SELECTION_RESULT_WIDTH } from './pointcloud';
+import { whenReady } from './picking';
+
+export type SelectionShape = 'box' | 'lasso' | 'polygon';
+
+export type PointSelection = {
+  // 点群のUUID(大文字)
+  object: string
+  numPoints: number
+  numSelected: number
+  // 点 i が選択されている場合に i / 8 バイト目の i % 8 ビット目(下位から)が1
+  bitmask: Uint8Array
+};
+
+// canvas上の多角形 polygon (CSSピクセル)の内側に投影される点をGPUで求める。
+// 多角形をマスク画像に描画し、頂点シェーダで各点を投影してマスクの内側にある点の番号に対応する画素に書き込む。
+// 手前の点に隠れている点も選択される
+export async function selectPoints (
+  scene: BABYLON.Scene,
+  canvas: HTMLCanvasElement,
+  polygon: [number, number][],
+  pointClouds: PointCloud[]
+): Promise<PointSelection[]> {
+  const width = Math.max(1, canvas.clientWidth);
+  const height = Math.max(1, canvas.clientHeight);
+  const mask = new BABYLON.DynamicTexture(
+    'selectionMask', { width, height }, scene, false, BABYLON.Texture.NEAREST_SAMPLINGMODE
+  );
+  mask.wrapU = BABYLON.Texture.CLAMP_ADDRESSMODE;
+  mask.wrapV = BABYLON.Texture.CLAMP_ADDRESSMODE;
+  const context = mask.getContext();
+  context.fillStyle = '#000';
+  context.fillRect(0, 0, width, height);
+  context.fillStyle = '#fff';
+  context.beginPath();
+  polygon.forEach(([x, y], i) => {
+    if (i === 0) {
+      context.moveTo(x, y);
+    } else {
+      context.lineTo(x, y);
+    }
+  });
+  context.closePath();
+  context.fill();
+  mask.update();
+
+  try {
+    const selections: PointSelection[] = [];
+    for (const pointCloud of pointClouds) {
+      selections.push(await selectPointsInPointCloud(scene, pointCloud, mask));
+    }
+    return selections;
+  } finally {
+    mask.dispose();
+  }
+}
+
+async function selectPointsInPointCloud (
+  scene: BABYLON.Scene,
+  pointCloud: PointCloud,
+  mask: BABYLON.Texture
+): Promise<PointSelection> {
+  const numPoints = pointCloud.numPoints;
+  const bitmask = new Uint8Array(Math.ceil(numPoints / 8));
+  const object = pointCloud.mesh.name.toUpperCase();
+  if (numPoints === 0) {
+    return { object, numPoints, numSelected: 0, bitmask };
+  }
+  const rows = Math.ceil(numPoints / SELECTION_RESULT_WIDTH);
+  if (rows > scene.getEngine().getCaps().maxTextureSize) {
+    throw new Error(`too many points to select in ${object}`);
+  }
+
+  const target = new BABYLON.RenderTargetTexture(
+    'selection', { width: SELECTION_RESULT_WIDTH, height: rows }, scene,
+    false, // generateMipMaps
+    true, // doNotChangeAspectRatio
+    BABYLON.Constants.TEXTURETYPE_UNSIGNED_BYTE,
+    false, // isCube
+    BABYLON.Texture.NEAREST_SAMPLINGMODE,
+    false // generateDepthBuffer
+  );
+  target.clearColor = new BABYLON.Color4(0, 0, 0, 0);
+  const material = pointCloud.createMaterial('selection');
+  material.setTexture('selectionMask', mask);
+  material.setFloat('resultHeight', rows);
+  try {
+    target.setMaterialForRendering(pointCloud.mesh, material);
+    target.renderList = [pointCloud.mesh];
+    await whenReady([[pointCloud.mesh, material]]);
+    target.render();
+    const pixels = await target.readPixels(0, 0, null, true);
+    if (pixels === null) {
+      throw new Error(`failed to read selection of ${object}`);
+    }
+    const result = pixels as Uint8Array;
+    let numSelected = 0;
+    for (let i = 0; i < numPoints; i++) {
+      if (result[i * 4] !== 0) {
+        bitmask[i >> 3] |= 1 << (i & 7);
+        numSelected++;
+      }
+    }
+    return { object, numPoints, numSelected, bitmask };
+  } finally {
+    material.dispose();
+    target.dispose();
+  }
+}
+
+// 選択されている点が連続する範囲の (開始番号, 点数) の並び。ビットマスクより大きくなる場合は null
+export function encodeRuns (selection: PointSelection): Uint32Array | null {
+  const { bitmask, numPoints } = selection;
+  const maxRuns = Math.floor(bitmask.length / 8);
+  const runs: number[] = [];
+  let start = -1;
+  for (let i = 0; i <= numPoints; i++) {
+    const selected = i < numPoints && (bitmask[i >> 3] & (1 << (i & 7))) !== 0;
+    if (selected && start < 0) {
+      start = i;
+    } else if (!selected && start >= 0) {
+      if (runs.length / 2 >= maxRuns) return null;
+      runs.push(start, i - start);
+      start = -1;
+    }
+  }
+  return Uint32Array.from(runs);
+}
+
+// ポインタがこの距離(CSSピクセル)以内にある場合、多角形の最初の頂点をクリックしたとみなす
+const CLOSE_DISTANCE = 8;
+
+// マウスの左ボタンで canvas 上の範囲を描く。
+// box と lasso はドラッグ、polygon はクリックで頂点を追加し、最初の頂点のクリック、ダブルクリック、Enterで確定する。
+// Escで描いている範囲を取り消す
+export class RegionSelector {
+  private points: [number, number][] = [];
+  private drawing = false;
+  private svg: SVGSVGElement;
+  private outline: SVGPolygonElement;
+  private previousCursor: string;
+  private removeListeners: () => void;
+
+  constructor (
+    private canvas: HTMLCanvasElement,
+    container: HTMLElement,
+    overlayContainer: HTMLElement,
+    private shape: SelectionShape,
+    private onSelect: (polygon: [number, number][], event: MouseEvent | KeyboardEvent) => void
+  ) {
+    this.svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+    this.svg.style.position = 'absolute';
+    this.svg.style.width = '100%';
+    this.svg.style.height = '100%';
+    this.svg.style.pointerEvents = 'none';
+    this.outline = document.createElementNS('http://www.w3.org/2000/svg', 'polygon');
+    this.outline.setAttribute('fill', 'rgba(255, 255, 255, 0.15)');
+    this.outline.setAttribute('stroke', 'white');
+    this.outline.setAttribute('stroke-dasharray', '4 2');
+    this.svg.appendChild(this.outline);
+    overlayContainer.appendChild(this.svg);
+    this.previousCursor = canvas.style.cursor;
+    canvas.style.cursor = 'crosshair';
+
+    // カメラの操作より先に受け取って、左ボタンの操作がカメラの回転にならないようにする
+    const onPointerDown = (ev: PointerEvent) => {
+      if (ev.target !== canvas || ev.button !== 0) return;
+      ev.stopPropagation();
+      ev.preventDefault();
+      this.onPointerDown(ev);
+    };
+    const onPointerMove = (ev: PointerEvent) => this.onPointerMove(ev);
+    const onPointerUp = (ev: PointerEvent) => {
+      if (ev.button === 0) this.onPointerUp(ev);
+    };
+    const onDoubleClick = (ev: MouseEvent) => {
+      if (this.shape === 'polygon' && this.drawing) this.finish(ev);
+    };
+    const onKeyDown = (ev: KeyboardEvent) => {
+      if (!this.drawing) return;
+      if (ev.key === 'Escape') {
+        this.cancel();
+      } else if (ev.key === 'Enter' && this.shape === 'polygon') {
+        this.finish(ev);
+      }
+    };
+    container.addEventListener('pointerdown', onPointerDown, true);
+    document.addEventListener('pointermove', onPointerMove);
+    document.addEventListener('pointerup', onPointerUp);
+    canvas.addEventListener('dblclick', onDoubleClick);
+    window.addEventListener('keydown', onKeyDown);
+    this.removeListeners = () => {
+      container.removeEventListener('pointerdown', onPointerDown, true);
+      document.removeEventListener('pointermove', onPointerMove);
+      document.removeEventListener('pointerup', onPointerUp);
+      canvas.removeEventListener('dblclick', onDoubleClick);
+      window.removeEventListener('keydown', onKeyDown);
+    };
+  }
+
+  dispose (): void {
+    this.removeListeners();
+    this.svg.remove();
+    this.canvas.style.cursor = this.previousCursor;
+  }
+
+  private position (ev: MouseEvent): [number, number] {
+    const rect = this.canvas.getBoundingClientRect();
+    return [ev.clientX - rect.left, ev.clientY - rect.top];
+  }
+
+  private onPointerDown (ev: PointerEvent): void {
+    const p = this.position(ev);
+    if (this.shape !== 'polygon') {
+      this.drawing = true;
+      this.points = [p, p];
+    } else if (!this.drawing) {
+      this.drawing = true;
+      // 最後の頂点はポインタに追従する
+      this.points = [p, p];
+    } else {
+      const [x0, y0] = this.points[0];
+      if (this.points.length > 3 && Math.hypot(p[0] - x0, p[1] - y0) < CLOSE_DISTANCE) {
+        this.finish(ev);
+        return;
+      }
+      this.points.push(p);
+    }
+    this.redraw();
+  }
+
+  private onPointerMove (ev: PointerEvent): void {
+    if (!this.drawing) return;
+    const p = this.position(ev);
+    if (this.shape === 'lasso') {
+      this.points.push(p);
+    } else {
+      this.points[this.points.length - 1] = p;
+    }
+    this.redraw();
+  }
+
+  private onPointerUp (ev: PointerEvent): void {
+    if (this.drawing && this.shape !== 'polygon') {
+      this.finish(ev);
+    }
+  }
+
+  private polygon (): [number, number][] {
+    if (this.shape !== 'box') {
+      return this.points;
+    }
+    const [x0, y0] = this.points[0];
+    const [x1, y1] = this.points[this.points.length - 1];
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]];
+  }
+
+  private redraw (): void {
+    const points = this.drawing ? this.polygon() : [];
+    this.outline.setAttribute('points', points.map(([x, y]) => `${x},${y}`).join(' '));
+  }
+
+  private finish (ev: MouseEvent | KeyboardEvent): void {
+    let polygon = this.polygon();
+    if (this.shape === 'polygon') {
+      // ポインタに追従している頂点と、ダブルクリックで重なった頂点を除く
+      polygon = polygon.slice(0, -1).filter(([x, y], i, all) => i === 0 || x !== all[i - 1][0] || y !== all[i - 1][1]);
+    }
+    this.cancel();
+    // 面積がない範囲は単なるクリックとみなす
+    let area = 0;
+    polygon.forEach(([x0, y0], i) => {
+      const [x1, y1] = polygon[(i + 1) % polygon.length];
+      area += x0 * y1 - x1 * y0;
+    });
+    if (polygon.length >= 3 && Math.abs(area) / 2 >= 1) {
+      this.onSelect(polygon, ev);
+    }
+  }
+
+  private cancel (): void {
+    this.drawing = false;
+    this.points = [];
+    this.redraw();
+  }
+}
@@ -1,6 +1,10 @@
 import { Overlay } from './overlay';
 import { Canvas2D } from './canvas2d';
 import { Lineset } from './lineset';
+import { Boxes } from './boxes';
+import { OverlayTexts } from './overlay_texts';
+import { PointCloud } from './pointcloud';
+import { Picker } from './picking';
 import { Spinner } from './spinner';
 
 import * as BABYLON from '@babylonjs/core';
@@ -22,11 +26,22 @@ export class PointCloudViewer {
 
   linesets: Lineset[] = [];
 
+  pointClouds: { [uuid: string]: PointCloud } = {};
+
+  boxes: { [uuid: string]: Boxes } = {};
+
+  overlayTexts: { [uuid: string]: OverlayTexts } = {};
+
+  // タグからそのタグが付いたオブジェクトのUUIDへの辞書
+  tags: { [tag: string]: Set<string> } = {};
+
   camera: BABYLON.TargetCamera;
   cameraInput: CustomCameraInput<PointCloudViewer['camera']>;
 
   gui: GUIManager
 
+  picker: Picker
+
   keyEventHandler = new class {
     onKeyUp: ((ev: KeyboardEvent) => any) | null = null
     onKeyDown: ((ev: KeyboardEvent) => any) | null = null
@@ -41,6 +56,12 @@ export class PointCloudViewer {
     statechange: {}
   }
 
+  // ピッキングのイベントハンドラーのUUIDから、登録したイベントリスナーを削除する関数への辞書
+  pickEventHandler: { [uuid: string]: () => void } = {};
+
+  // 範囲選択のイベントハンドラーのUUIDから、範囲選択を終了する関数への辞書。登録できるのは1つまで
+  selectionEventHandler: { [uuid: string]: () => void } = {};
+
   config = new class {
     camera = new class {
       usePerspective: boolean = true;
@@ -54,7 +75,7 @@ export class PointCloudViewer {
     }();
   }();
 
-  constructor (private container: HTMLDivElement) {
+  constructor (public container: HTMLDivElement) {
     const cameraNear = 0.1;
     const cameraFar = 10000;
 
@@ -72,6 +93,7 @@ export class PointCloudViewer {
     this.scene.clearColor = new BABYLON.Color4(0, 0, 0);
     this.scene.lightsEnabled = false;
     this.scene.useRightHandedSystem = true;
+    this.picker = new Picker(this.scene);
 
     this.camera = new BABYLON.FreeCamera('camera', new BABYLON.Vector3(-1, -1, -1), this.scene);
     this.camera.fov = (this.config.camera.perspective.fov / 180) * Math.PI;
@@ -156,6 +178,12 @@ export class PointCloudViewer {
     for (let i = 0; i < this.linesets.length; i++) {
       this.linesets[i].render(this.canvas2d, mat);
     }
+    for (const uuid in this.boxes) {
+      this.boxes[uuid].renderLabels(this.canvas2d, mat);
+    }
+    for (const uuid in this.overlayTexts) {
+      this.overlayTexts[uuid].render(this.canvas2d, mat);
+    }
   }
 
   switchCamera (perspective: boolean): void {
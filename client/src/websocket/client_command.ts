@@ -1,4 +1,6 @@
 import * as PB from '../protobuf/client';
+import { PickResult } from '../picking';
+import { PointSelection, encodeRuns } from '../selection';
 
 export function sendSuccess (websocket: WebSocket, commandID: string, message: string): void {
   const resultSuccess = new PB.Result();
@@ -118,3 +120,63 @@ export function sendCameraStateChanged (websocket: WebSocket, commandID: string,
   command.UUID = commandID;
   websocket.send(command.serializeBinary());
 }
+
+export function sendPickEventOccurred (
+  websocket: WebSocket,
+  commandID: string,
+  type: PB.PickEventOccurredType,
+  result: PickResult | null,
+  event: PointerEvent
+) {
+  const picked = new PB.PickEventOccurred();
+  picked.type = type;
+  picked.object = result?.object ?? '';
+  picked.index = result?.index ?? -1;
+  if (result?.position) {
+    const position = new PB.VecXYZf();
+    position.x = result.position.x;
+    position.y = result.position.y;
+    position.z = result.position.z;
+    picked.position = position;
+  }
+  picked.x = event.offsetX;
+  picked.y = event.offsetY;
+  picked.shiftKey = event.shiftKey;
+  picked.altKey = event.altKey;
+  picked.ctrlKey = event.ctrlKey;
+  picked.metaKey = event.metaKey;
+  const command = new PB.ClientCommand();
+  command.pickEventOccurred = picked;
+  command.UUID = commandID;
+  websocket.send(command.serializeBinary());
+}
+
+export function sendPointsSelected (
+  websocket: WebSocket,
+  commandID: string,
+  selections: PointSelection[],
+  event: MouseEvent | KeyboardEvent
+) {
+  const selected = new PB.PointsSelected();
+  selected.selections = selections.map((selection) => {
+    const pbSelection = new PB.PointsSelectedSelection();
+    pbSelection.object = selection.object;
+    pbSelection.numPoints = selection.numPoints;
+    pbSelection.numSelected = selection.numSelected;
+    const runs = encodeRuns(selection);
+    if (runs !== null) {
+      pbSelection.runs = new Uint8Array(runs.buffer, runs.byteOffset, runs.byteLength);
+    } else {
+      pbSelection.bitmask = selection.bitmask;
+    }
+    return pbSelection;
+  });
+  selected.shiftKey = event.shiftKey;
+  selected.altKey = event.altKey;
+  selected.ctrlKey = event.ctrlKey;
+  selected.metaKey = event.metaKey;
+  const command = new PB.ClientCommand();
+  command.pointsSelected = selected;
+  command.UUID = commandID;
+  websocket.send(command.serializeBinary());
+}
@@ -0,0 +1,16 @@
+import * as PB from '../protobuf/server';
+
+// TypeScriptのバージョンによっては型定義が無いので、globalThisから取得する
+type DecompressionStreamConstructor = new (format: 'deflate') => TransformStream<Uint8Array, Uint8Array>;
+
+// 圧縮されたコマンドを展開する。展開はブラウザによってメインスレッドの外で行われる
+export async function decompressServerCommand (message: PB.ServerCommand): Promise<PB.ServerCommand> {
+  const decompressed = await inflate(message.compressed);
+  return PB.ServerCommand.deserializeBinary(decompressed);
+}
+
+async function inflate (data: Uint8Array): Promise<Uint8Array> {
+  const DecompressionStream = (globalThis as unknown as { DecompressionStream: DecompressionStreamConstructor }).DecompressionStream;
+  const stream = new Blob([data]).stream().pipeThrough(new DecompressionStream('deflate'));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
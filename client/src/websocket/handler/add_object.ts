@@ -4,7 +4,15 @@ import * as imageType from 'image-type';
 import { Overlay } from '../../overlay';
 import { sendSuccess, sendFailure } from '../client_command';
 import { PointCloudViewer } from '../../viewer';
-import { Lineset } from '../../lineset';
+import { Lineset, createLinesetMaterial, createLinesetMesh } from '../../lineset';
+import { Boxes } from '../../boxes';
+import { createGlyphsMaterial, createGlyphsMesh } from '../../glyphs';
+import { OverlayTexts } from '../../overlay_texts';
+import { PointCloud, QuantizedPositions, dequantizePositions } from '../../pointcloud';
+import { createMeshPickingMaterial } from '../../picking';
+import { applyColorMap } from './set_pointcloud_color';
+import { addTags } from './set_visible';
+import { bytesToFloat32Array, bytesToUint16Array, bytesToUint32Array, toQuantizedPositions } from './util';
 import { PCDLoader } from '@loaders.gl/pcd';
 import * as Loaders from '@loaders.gl/core';
 
@@ -15,6 +23,7 @@ export function handleAddObject (websocket: WebSocket, commandID: string, viewer
     sendFailure(websocket, commandID, 'failed to get add_object command');
     return;
   }
+  addTags(viewer, commandID, addObject.tags);
   switch (addObject.Object) {
     case 'lineSet':
       handleLineSet(websocket, commandID, viewer, addObject.lineSet);
@@ -31,6 +40,18 @@ export function handleAddObject (websocket: WebSocket, commandID: string, viewer
     case 'image':
       handleImage(websocket, commandID, viewer, addObject.image);
       break;
+    case 'boxes':
+      handleBoxes(websocket, commandID, viewer, addObject.boxes);
+      break;
+    case 'glyphs':
+      handleGlyphs(websocket, commandID, viewer, addObject.glyphs);
+      break;
+    case 'overlayTexts':
+      handleOverlayTexts(websocket, commandID, viewer, addObject.overlayTexts);
+      break;
+    case 'group':
+      handleGroup(websocket, commandID, viewer);
+      break;
     default:
       sendFailure(websocket, commandID, 'message has not any object');
       break;
@@ -107,44 +128,60 @@ function handleMesh (websocket: WebSocket, commandID:string, viewer: PointCloudV
     sendFailure(websocket, commandID, 'failed to get mesh');
     return;
   }
-  const points = PBmesh.points;
-  const positions: number[] = [];
-  for (let i = 0; i < points.length; i++) {
-    const v = points[i];
-    positions.push(v.x, v.y, v.z);
-  }
-  const a = PBmesh.vertexAIndex;
-  const b = PBmesh.vertexBIndex;
-  const c = PBmesh.vertexCIndex;
-  const indices: number[] = [];
-  for (let i = 0; i < a.length; i++) {
-    indices.push(a[i], b[i], c[i]);
-  }
   const material = new BABYLON.StandardMaterial(commandID, viewer.scene);
   material.emissiveColor = new BABYLON.Color3(1, 1, 1);
 
   const mesh = new BABYLON.Mesh(commandID, viewer.scene);
   mesh.material = material;
+  viewer.picker.register(mesh, () => createMeshPickingMaterial(commandID, viewer.scene));
 
   const vertex = new BABYLON.VertexData();
-  vertex.positions = positions;
-  vertex.indices = indices;
-
-  const PBcolors = PBmesh.colors;
-  if (PBcolors.length !== 0) {
-    const colors: number[] = [];
-    for (let i = 0; i < PBcolors.length; i++) {
-      colors.push(
-        Math.max(0, Math.min(1, PBcolors[i].r)),
-        Math.max(0, Math.min(1, PBcolors[i].g)),
-        Math.max(0, Math.min(1, PBcolors[i].b)),
-        0
-      );
+  if (PBmesh.packedPositions.length !== 0) {
+    vertex.positions = bytesToFloat32Array(PBmesh.packedPositions);
+    vertex.indices = bytesToUint32Array(PBmesh.packedIndices);
+    const rgb = PBmesh.packedColors;
+    if (rgb.length !== 0) {
+      const colors = new Float32Array(rgb.length / 3 * 4);
+      for (let i = 0, j = 0; i + 2 < rgb.length; i += 3, j += 4) {
+        colors[j + 0] = rgb[i + 0] / 255;
+        colors[j + 1] = rgb[i + 1] / 255;
+        colors[j + 2] = rgb[i + 2] / 255;
+      }
+      vertex.colors = colors;
+    }
+  } else {
+    const points = PBmesh.points;
+    const positions: number[] = [];
+    for (let i = 0; i < points.length; i++) {
+      const v = points[i];
+      positions.push(v.x, v.y, v.z);
+    }
+    const a = PBmesh.vertexAIndex;
+    const b = PBmesh.vertexBIndex;
+    const c = PBmesh.vertexCIndex;
+    const indices: number[] = [];
+    for (let i = 0; i < a.length; i++) {
+      indices.push(a[i], b[i], c[i]);
+    }
+    vertex.positions = positions;
+    vertex.indices = indices;
+
+    const PBcolors = PBmesh.colors;
+    if (PBcolors.length !== 0) {
+      const colors: number[] = [];
+      for (let i = 0; i < PBcolors.length; i++) {
+        colors.push(
+          Math.max(0, Math.min(1, PBcolors[i].r)),
+          Math.max(0, Math.min(1, PBcolors[i].g)),
+          Math.max(0, Math.min(1, PBcolors[i].b)),
+          0
+        );
+      }
+      vertex.colors = colors;
     }
-    vertex.colors = colors;
   }
 
-  const normals:BABYLON.FloatArray = [];
+  const normals = new Float32Array(vertex.positions.length);
   BABYLON.VertexData.ComputeNormals(
     vertex.positions,
     vertex.indices,
@@ -152,7 +189,71 @@ function handleMesh (websocket: WebSocket, commandID:string, viewer: PointCloudV
   );
   vertex.normals = normals;
 
-  vertex.applyToMesh(mesh);
+  // update_mesh で頂点を書き換えられるようにする
+  vertex.applyToMesh(mesh, true);
+
+  sendSuccess(websocket, commandID, commandID);
+}
+
+function handleBoxes (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, pbBoxes: PB.AddObjectBoxes | undefined): void {
+  if (pbBoxes === undefined) {
+    sendFailure(websocket, commandID, 'failed to get boxes');
+    return;
+  }
+  const boxes = new Boxes(
+    commandID,
+    viewer.scene,
+    bytesToFloat32Array(pbBoxes.centers),
+    bytesToFloat32Array(pbBoxes.sizes),
+    bytesToFloat32Array(pbBoxes.rotations),
+    pbBoxes.colors,
+    pbBoxes.labels,
+    pbBoxes.lineWidth
+  );
+  viewer.boxes[boxes.UUID] = boxes;
+  viewer.picker.register(boxes.mesh, () => boxes.createMaterial(true));
+
+  sendSuccess(websocket, commandID, commandID);
+}
+
+function handleGroup (websocket: WebSocket, commandID: string, viewer: PointCloudViewer): void {
+  const group = new BABYLON.TransformNode(commandID, viewer.scene);
+  sendSuccess(websocket, commandID, group.name);
+}
+
+function handleOverlayTexts (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, texts: PB.AddObjectOverlayTexts | undefined): void {
+  if (texts === undefined) {
+    sendFailure(websocket, commandID, 'failed to get overlay texts');
+    return;
+  }
+  const overlayTexts = new OverlayTexts(
+    commandID,
+    texts.texts,
+    bytesToFloat32Array(texts.positions),
+    texts.styles,
+    bytesToUint16Array(texts.styleIndices),
+    texts.declutter
+  );
+  viewer.overlayTexts[overlayTexts.UUID] = overlayTexts;
+
+  sendSuccess(websocket, commandID, commandID);
+}
+
+function handleGlyphs (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, glyphs: PB.AddObjectGlyphs | undefined): void {
+  if (glyphs === undefined) {
+    sendFailure(websocket, commandID, 'failed to get glyphs');
+    return;
+  }
+  const mesh = createGlyphsMesh(
+    commandID,
+    viewer.scene,
+    glyphs.shape,
+    bytesToFloat32Array(glyphs.positions),
+    bytesToFloat32Array(glyphs.scales),
+    bytesToFloat32Array(glyphs.rotations),
+    glyphs.colors
+  );
+  viewer.picker.register(mesh, () => createGlyphsMaterial(commandID, viewer.scene, true));
 
   sendSuccess(websocket, commandID, commandID);
 }
@@ -162,6 +263,20 @@ function handleLineSet (websocket: WebSocket, commandID: string, viewer: PointCl
     sendFailure(websocket, commandID, 'failed to get lineset');
     return;
   }
+  if (lineset.packedPositions.length !== 0) {
+    addLineset(
+      viewer,
+      commandID,
+      bytesToFloat32Array(lineset.packedPositions),
+      bytesToUint32Array(lineset.packedIndices),
+      lineset.packedColors,
+      bytesToFloat32Array(lineset.packedWidths),
+      lineset.renderer
+    );
+    sendSuccess(websocket, commandID, commandID);
+    return;
+  }
+
   const points = lineset.points;
   const positions: number[] = [];
   for (let i = 0; i < points.length; i++) {
@@ -189,11 +304,33 @@ function handleLineSet (websocket: WebSocket, commandID: string, viewer: PointCl
 
   const widths = lineset.widths;
 
-  viewer.linesets.push(new Lineset(positions, indices, colors, widths, commandID));
+  addLineset(viewer, commandID, positions, indices, colors, widths, lineset.renderer);
 
   sendSuccess(websocket, commandID, commandID);
 }
 
+// 線分の数がこれ以上の場合、AUTO ではGPUで描画する
+const GPU_LINESET_MIN_NUM_LINES = 1000;
+
+function addLineset (
+  viewer: PointCloudViewer,
+  commandID: string,
+  positions: ArrayLike<number>,
+  indices: ArrayLike<number>,
+  colors: ArrayLike<number>,
+  widths: ArrayLike<number>,
+  renderer: PB.AddObjectLineSetRenderer
+): void {
+  const useGPU = renderer === PB.AddObjectLineSetRenderer.GPU ||
+    (renderer === PB.AddObjectLineSetRenderer.AUTO && indices.length / 2 >= GPU_LINESET_MIN_NUM_LINES);
+  if (useGPU) {
+    const mesh = createLinesetMesh(commandID, viewer.scene, positions, indices, colors, widths);
+    viewer.picker.register(mesh, () => createLinesetMaterial(commandID, viewer.scene, true));
+  } else {
+    viewer.linesets.push(new Lineset(positions, indices, colors, widths, commandID));
+  }
+}
+
 function handlePointCloud (
   websocket: WebSocket,
   commandID: string,
@@ -205,32 +342,122 @@ function handlePointCloud (
     return;
   }
 
-  const data_ = pbPointcloud.pcdData;
+  let positions: Float32Array;
+  let rgb: Uint8Array | null = null;
+  const pbQuantized = pbPointcloud.quantizedPositions;
+  let quantized: QuantizedPositions | null = null;
+  if (pbPointcloud.hasQuantizedPositions && pbQuantized !== undefined) {
+    quantized = toQuantizedPositions(pbQuantized);
+    positions = dequantizePositions(quantized);
+    if (pbPointcloud.colors.length !== 0) {
+      rgb = pbPointcloud.colors.slice();
+    }
+  } else {
+    const parsed = parsePCD(websocket, commandID, pbPointcloud.pcdData);
+    if (parsed === null) { return; }
+    [positions, rgb] = parsed;
+  }
+  const numPoints = positions.length / 3;
+  if (rgb !== null && rgb.length !== numPoints * 3) {
+    sendFailure(websocket, commandID, 'length of colors does not match');
+    return;
+  }
+
+  const pointCloud = new PointCloud(commandID, viewer.scene, positions, rgb, pbPointcloud.pointSize, quantized);
+
+  for (const field of pbPointcloud.scalarFields) {
+    let values: Float32Array;
+    switch (field.Values) {
+      case 'float32':
+        values = bytesToFloat32Array(field.float32);
+        break;
+      case 'uint16':
+        values = Float32Array.from(bytesToUint16Array(field.uint16));
+        break;
+      default:
+        pointCloud.mesh.dispose(false, true);
+        sendFailure(websocket, commandID, `scalar field ${field.name} has no values`);
+        return;
+    }
+    if (values.length !== numPoints) {
+      pointCloud.mesh.dispose(false, true);
+      sendFailure(websocket, commandID, `length of scalar field ${field.name} does not match`);
+      return;
+    }
+    pointCloud.addScalarField(field.name, values, field.min, field.max);
+  }
+
+  const labels = pbPointcloud.labels;
+  if (pbPointcloud.hasLabels && labels !== undefined) {
+    let values: Float32Array;
+    switch (labels.Values) {
+      case 'uint8':
+        values = Float32Array.from(labels.uint8);
+        break;
+      case 'uint16':
+        values = Float32Array.from(bytesToUint16Array(labels.uint16));
+        break;
+      default:
+        pointCloud.mesh.dispose(false, true);
+        sendFailure(websocket, commandID, 'labels has no values');
+        return;
+    }
+    if (values.length !== numPoints) {
+      pointCloud.mesh.dispose(false, true);
+      sendFailure(websocket, commandID, 'length of labels does not match');
+      return;
+    }
+    pointCloud.setLabels(values);
+  }
+
+  const palette = pbPointcloud.palette;
+  if (pbPointcloud.hasPalette && palette !== undefined) {
+    const error = pointCloud.usePalette(palette.colors);
+    if (error !== null) {
+      pointCloud.mesh.dispose(false, true);
+      sendFailure(websocket, commandID, error);
+      return;
+    }
+  }
+
+  if (pbPointcloud.hasColorMap) {
+    const error = applyColorMap(pointCloud, pbPointcloud.colorMap);
+    if (error !== null) {
+      pointCloud.mesh.dispose(false, true);
+      sendFailure(websocket, commandID, error);
+      return;
+    }
+  }
+
+  viewer.pointClouds[commandID] = pointCloud;
+  viewer.picker.register(pointCloud.mesh, () => pointCloud.createMaterial('picking'), (i) => pointCloud.getPosition(i));
+
+  sendSuccess(websocket, commandID, commandID);
+}
+
+function parsePCD (websocket: WebSocket, commandID: string, data_: Uint8Array): [Float32Array, Uint8Array | null] | null {
   const data = data_.buffer.slice(data_.byteOffset);
 
   const pc = Loaders.parseSync(data, PCDLoader);
 
-  const vertexData = new BABYLON.VertexData();
-
   // https://loaders.gl/docs/specifications/category-mesh#gltf-attribute-name-mapping
 
-  if ('POSITION' in pc.attributes) {
-    const positions:Float32Array = pc.attributes.POSITION.value;
-    vertexData.set(positions, BABYLON.VertexBuffer.PositionKind);
-  }
+  const positions: Float32Array = 'POSITION' in pc.attributes ? pc.attributes.POSITION.value : new Float32Array(0);
+  const numPoints = positions.length / 3;
 
+  let rgb: Uint8Array | null = null;
   if ('COLOR_0' in pc.attributes) {
     const color: Uint8Array | Uint16Array | Float32Array = pc.attributes.COLOR_0.value;
     const size: number = pc.attributes.COLOR_0.size;
-    const normalizedColor: Float32Array | null = (() => {
+    const scale: number | null = (() => {
       switch (color.BYTES_PER_ELEMENT) {
         case 1:
-          return Float32Array.from(color, v => v / 255);
+          return 1;
         case 2:
-          return Float32Array.from(color, v => v / 65535);
+          return 255 / 65535;
         case 4:
           if (color instanceof Float32Array) {
-            return color;
+            return 255;
           }
           break;
         default:
@@ -239,45 +466,19 @@ function handlePointCloud (
       sendFailure(websocket, commandID, `unsupported type: ${Object.prototype.toString.call(color)}, BYTES_PER_ELEMENT: ${color.BYTES_PER_ELEMENT}`);
       return null;
     })();
-    if (normalizedColor === null) { return; };
-    if (size === 4) {
-      const n = normalizedColor.length / 4;
-      const rgba = new Float32Array(n * 4);
-
-      for (let i = 0; i < n; i++) {
-        rgba[i * 4 + 0] = normalizedColor[i * 3 + 2];
-        rgba[i * 4 + 1] = normalizedColor[i * 3 + 1];
-        rgba[i * 4 + 2] = normalizedColor[i * 3 + 0];
-        rgba[i * 4 + 3] = normalizedColor[i * 4 + 3];
-      }
-      vertexData.set(rgba, BABYLON.VertexBuffer.ColorKind);
-    } else if (size === 3) {
-      const n = normalizedColor.length / 3;
-      const rgba = new Float32Array(n * 4);
-
-      for (let i = 0; i < n; i++) {
-        rgba[i * 4 + 0] = normalizedColor[i * 3 + 2];
-        rgba[i * 4 + 1] = normalizedColor[i * 3 + 1];
-        rgba[i * 4 + 2] = normalizedColor[i * 3 + 0];
-        rgba[i * 4 + 3] = 1.0;
-      }
-      vertexData.set(rgba, BABYLON.VertexBuffer.ColorKind);
-    } else {
-      sendFailure(websocket, commandID, `unsupported element size: ${color.BYTES_PER_ELEMENT}`);
+    if (scale === null) { return null; };
+    if (size !== 3 && size !== 4) {
+      sendFailure(websocket, commandID, `unsupported element size: ${size}`);
+      return null;
+    }
+    rgb = new Uint8Array(numPoints * 3);
+    for (let i = 0; i < numPoints; i++) {
+      rgb[i * 3 + 0] = color[i * size + 2] * scale;
+      rgb[i * 3 + 1] = color[i * size + 1] * scale;
+      rgb[i * 3 + 2] = color[i * size + 0] * scale;
     }
   }
-
-  const mat = new BABYLON.StandardMaterial(commandID, viewer.scene);
-  mat.emissiveColor = new BABYLON.Color3(1, 1, 1);
-  mat.disableLighting = true;
-  mat.pointsCloud = true;
-  mat.pointSize = pbPointcloud.pointSize;
-
-  const mesh = new BABYLON.Mesh(commandID, viewer.scene);
-  vertexData.applyToMesh(mesh, true);
-  mesh.material = mat;
-
-  sendSuccess(websocket, commandID, commandID);
+  return [positions, rgb];
 }
 
 function handleImage (
@@ -349,6 +550,7 @@ function handleImage (
       const mesh = new BABYLON.Mesh(commandID, viewer.scene);
       vertexData.applyToMesh(mesh);
       mesh.material = mat;
+      viewer.picker.register(mesh, () => createMeshPickingMaterial(commandID, viewer.scene));
 
       sendSuccess(websocket, commandID, commandID);
     },
@@ -0,0 +1,21 @@
+import { PointCloudViewer } from '../../viewer';
+import { sendSuccess, sendFailure } from '../client_command';
+
+export function handleMeasureFrameTime (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, numFrames: number): void {
+  if (numFrames === 0) {
+    sendFailure(websocket, commandID, 'number of frames must be positive');
+    return;
+  }
+  // 描画命令の発行だけでなくGPUでの描画が終わるまでの時間を計測するため、毎フレーム gl.finish() で待つ
+  const gl = viewer.engine._gl;
+  viewer.cameraInput.checkInputs();
+  viewer.render();
+  gl.finish();
+  const start = performance.now();
+  for (let i = 0; i < numFrames; i++) {
+    viewer.render();
+    gl.finish();
+  }
+  const frameTime = (performance.now() - start) / numFrames;
+  sendSuccess(websocket, commandID, frameTime.toString());
+}
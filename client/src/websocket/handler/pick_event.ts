@@ -0,0 +1,102 @@
+import { PickEventOccurredType } from '../../protobuf/client';
+import { SetPickEventHandler, SetPickEventHandlerAdd } from '../../protobuf/server';
+import { PointCloudViewer } from '../../viewer';
+import { sendFailure, sendPickEventOccurred, sendSuccess } from '../client_command';
+
+// ボタンを押してから離すまでにこの距離(CSSピクセル)以上動いた場合は、カメラの操作とみなしてクリックとして扱わない
+const CLICK_TOLERANCE = 4;
+
+export function handleSetPickEventHandler (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, action: SetPickEventHandler) {
+  switch (action.Action) {
+    case 'add':
+      handleAdd(websocket, commandID, viewer, action.add);
+      break;
+    case 'removeAll':
+      handleRemoveAll(websocket, commandID, viewer);
+      break;
+    case 'removeByUuid':
+      handleRemoveByUUID(websocket, commandID, viewer, action.removeByUuid);
+  }
+}
+
+function handleAdd (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, add: SetPickEventHandlerAdd | undefined) {
+  if (add === undefined) {
+    sendFailure(websocket, commandID, 'failed to get pick event handler');
+    return;
+  }
+  if (!viewer.picker.supported) {
+    sendFailure(websocket, commandID, 'picking requires WebGL2 with float render targets');
+    return;
+  }
+  const canvas = viewer.canvas;
+  const listeners: [string, (ev: PointerEvent) => void][] = [];
+
+  if (add.click) {
+    let down: { x: number, y: number } | null = null;
+    listeners.push(['pointerdown', (ev: PointerEvent) => {
+      down = ev.button === 0 ? { x: ev.offsetX, y: ev.offsetY } : null;
+    }]);
+    listeners.push(['pointerup', (ev: PointerEvent) => {
+      if (down === null || ev.button !== 0) return;
+      const moved = Math.hypot(ev.offsetX - down.x, ev.offsetY - down.y);
+      down = null;
+      if (moved >= CLICK_TOLERANCE) return;
+      viewer.picker.pick(ev.offsetX, ev.offsetY).then((result) => {
+        sendPickEventOccurred(websocket, commandID, PickEventOccurredType.CLICK, result, ev);
+      }, (error) => console.error(error));
+    }]);
+  }
+
+  if (add.hover) {
+    // hoverInterval ごとに最後のカーソル位置を調べ、カーソルの下のオブジェクトか要素が変わった場合のみ送る
+    let latest: PointerEvent | null = null;
+    let timer: number | null = null;
+    let lastKey = '';
+    const onTimer = () => {
+      timer = null;
+      const ev = latest;
+      if (ev === null) return;
+      viewer.picker.pick(ev.offsetX, ev.offsetY).then((result) => {
+        const key = result === null ? '' : `${result.object}:${result.index}`;
+        if (key === lastKey) return;
+        lastKey = key;
+        sendPickEventOccurred(websocket, commandID, PickEventOccurredType.HOVER, result, ev);
+      }, (error) => console.error(error));
+    };
+    listeners.push(['pointermove', (ev: PointerEvent) => {
+      latest = ev;
+      if (timer === null) {
+        timer = window.setTimeout(onTimer, add.hoverInterval * 1000);
+      }
+    }]);
+  }
+
+  for (const [type, listener] of listeners) {
+    canvas.addEventListener(type, listener as EventListener);
+  }
+  viewer.pickEventHandler[commandID] = () => {
+    for (const [type, listener] of listeners) {
+      canvas.removeEventListener(type, listener as EventListener);
+    }
+  };
+  sendSuccess(websocket, commandID, 'success');
+}
+
+function handleRemoveAll (websocket: WebSocket, commandID: string, viewer: PointCloudViewer) {
+  for (const uuid in viewer.pickEventHandler) {
+    viewer.pickEventHandler[uuid]();
+    delete viewer.pickEventHandler[uuid];
+  }
+  sendSuccess(websocket, commandID, 'success');
+}
+
+function handleRemoveByUUID (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, uuid: string) {
+  const UUID = uuid.toUpperCase();
+  if (UUID in viewer.pickEventHandler) {
+    viewer.pickEventHandler[UUID]();
+    delete viewer.pickEventHandler[UUID];
+    sendSuccess(websocket, commandID, 'success');
+  } else {
+    sendFailure(websocket, commandID, `handler ${UUID} not found`);
+  }
+}
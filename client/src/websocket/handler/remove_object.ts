@@ -2,6 +2,7 @@ import * as PB from '../../protobuf/server';
 
 import { sendSuccess, sendFailure } from '../client_command';
 import { PointCloudViewer } from '../../viewer';
+import { selectObjects } from './set_visible';
 
 export function handleRemoveObject (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, removeObject: PB.RemoveObject | undefined): void {
   if (removeObject === undefined) {
@@ -15,6 +16,9 @@ export function handleRemoveObject (websocket: WebSocket, commandID: string, vie
     case 'byUuid':
       handleRemoveByUUID(websocket, commandID, viewer, removeObject.byUuid);
       break;
+    case 'objects':
+      handleRemoveObjects(websocket, commandID, viewer, removeObject.objects);
+      break;
     default:
       sendFailure(websocket, commandID, 'message has not any object');
       break;
@@ -25,44 +29,92 @@ function handleRemoveAll (websocket: WebSocket, commandID: string, viewer: Point
   while (viewer.scene.meshes[0]) {
     viewer.scene.meshes[0].dispose(false, true);
   }
+  while (viewer.scene.transformNodes[0]) {
+    viewer.scene.transformNodes[0].dispose(false, true);
+  }
+  viewer.pointClouds = {};
+  viewer.boxes = {};
 
   for (const overlay of viewer.overlays) {
     overlay.dispose();
   }
   viewer.overlays = [];
+  viewer.overlayTexts = {};
 
   viewer.linesets = [];
+  viewer.tags = {};
 
   sendSuccess(websocket, commandID, 'success');
 }
 
 function handleRemoveByUUID (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, uuid: string) {
-  const normalizedUUID = uuid.toUpperCase();
+  const removed = removeObjectByUUID(viewer, uuid.toUpperCase());
+  if (removed.length === 0) {
+    sendFailure(websocket, commandID, 'object not found');
+    return;
+  }
+  sendSuccess(websocket, commandID, removed.join(','));
+}
 
-  const babylonjsObject = viewer.scene.getNodeByName(normalizedUUID);
-  if (babylonjsObject !== null) {
-    babylonjsObject.dispose(false, true);
-    sendSuccess(websocket, commandID, 'success');
+function handleRemoveObjects (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, selector: PB.ObjectSelector | undefined) {
+  if (selector === undefined) {
+    sendFailure(websocket, commandID, 'failed to get objects');
     return;
   }
+  const uuids = selectObjects(viewer, selector);
+  if (uuids === null) {
+    sendFailure(websocket, commandID, 'object not found');
+    return;
+  }
+  const removed: string[] = [];
+  for (const uuid of uuids) {
+    removed.push(...removeObjectByUUID(viewer, uuid));
+  }
+  sendSuccess(websocket, commandID, removed.join(','));
+}
 
-  for (let i = 0; i < viewer.overlays.length; i++) {
-    const overlay = viewer.overlays[i];
-    if (overlay.uuid === uuid.toUpperCase()) {
-      overlay.dispose();
-      viewer.overlays.splice(i, 1);
-      sendSuccess(websocket, commandID, 'success');
-      return;
-    }
+// uuid のオブジェクトを削除し、削除したオブジェクトのUUIDを返す。set_parent で子にしたオブジェクトも一緒に削除される
+function removeObjectByUUID (viewer: PointCloudViewer, uuid: string): string[] {
+  const node = viewer.scene.getNodeByName(uuid);
+  if (node === null) {
+    return forgetObject(viewer, uuid) ? [uuid] : [];
   }
+  const uuids = [uuid];
+  for (const descendant of node.getDescendants(false)) {
+    uuids.push(descendant.name);
+  }
+  node.dispose(false, true);
+  for (const uuid of uuids) {
+    forgetObject(viewer, uuid);
+  }
+  return uuids;
+}
 
-  for (let i = 0; i < viewer.linesets.length; i++) {
-    const lineset = viewer.linesets[i];
-    if (lineset.UUID === normalizedUUID) {
-      viewer.linesets.splice(i, 1);
-      sendSuccess(websocket, commandID, 'success');
-      return;
-    }
-  }
-  sendFailure(websocket, commandID, 'object not found');
+// Babylon.jsのシーンの外で管理しているオブジェクトを削除する
+function forgetObject (viewer: PointCloudViewer, uuid: string): boolean {
+  let found = false;
+  if (uuid in viewer.pointClouds) {
+    delete viewer.pointClouds[uuid];
+    found = true;
+  }
+  if (uuid in viewer.boxes) {
+    delete viewer.boxes[uuid];
+    found = true;
+  }
+  if (uuid in viewer.overlayTexts) {
+    delete viewer.overlayTexts[uuid];
+    found = true;
+  }
+  const overlayIndex = viewer.overlays.findIndex((overlay) => overlay.uuid === uuid);
+  if (overlayIndex !== -1) {
+    viewer.overlays[overlayIndex].dispose();
+    viewer.overlays.splice(overlayIndex, 1);
+    found = true;
+  }
+  const linesetIndex = viewer.linesets.findIndex((lineset) => lineset.UUID === uuid);
+  if (linesetIndex !== -1) {
+    viewer.linesets.splice(linesetIndex, 1);
+    found = true;
+  }
+  return found;
 }
@@ -0,0 +1,97 @@
+import { SetSelectionEventHandler, SetSelectionEventHandlerAdd, SetSelectionEventHandlerAddTool } from '../../protobuf/server';
+import { PointCloudViewer } from '../../viewer';
+import { PointCloud } from '../../pointcloud';
+import { RegionSelector, SelectionShape, selectPoints } from '../../selection';
+import { sendFailure, sendPointsSelected, sendSuccess } from '../client_command';
+import { selectObjects } from './set_visible';
+
+export function handleSetSelectionEventHandler (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, action: SetSelectionEventHandler) {
+  switch (action.Action) {
+    case 'add':
+      handleAdd(websocket, commandID, viewer, action.add);
+      break;
+    case 'removeAll':
+      handleRemoveAll(websocket, commandID, viewer);
+      break;
+    case 'removeByUuid':
+      handleRemoveByUUID(websocket, commandID, viewer, action.removeByUuid);
+  }
+}
+
+function toSelectionShape (tool: SetSelectionEventHandlerAddTool): SelectionShape {
+  switch (tool) {
+    case SetSelectionEventHandlerAddTool.LASSO:
+      return 'lasso';
+    case SetSelectionEventHandlerAddTool.POLYGON:
+      return 'polygon';
+    default:
+      return 'box';
+  }
+}
+
+// 選択の対象にする表示中の点群。対象を指定しない場合はすべての点群
+function targetPointClouds (viewer: PointCloudViewer, add: SetSelectionEventHandlerAdd): PointCloud[] {
+  let uuids = Object.keys(viewer.pointClouds);
+  if (add.hasTargets) {
+    uuids = selectObjects(viewer, add.targets) ?? add.targets.uuids.map((uuid) => uuid.toUpperCase());
+  }
+  const pointClouds: PointCloud[] = [];
+  for (const uuid of uuids) {
+    const pointCloud = viewer.pointClouds[uuid];
+    if (pointCloud !== undefined && pointCloud.mesh.isEnabled()) {
+      pointClouds.push(pointCloud);
+    }
+  }
+  return pointClouds;
+}
+
+function handleAdd (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, add: SetSelectionEventHandlerAdd | undefined) {
+  if (add === undefined) {
+    sendFailure(websocket, commandID, 'failed to get selection event handler');
+    return;
+  }
+  if (viewer.engine.webGLVersion < 2) {
+    sendFailure(websocket, commandID, 'selection requires WebGL2');
+    return;
+  }
+  if (Object.keys(viewer.selectionEventHandler).length > 0) {
+    sendFailure(websocket, commandID, 'another selection handler is already added');
+    return;
+  }
+  if (add.hasTargets && selectObjects(viewer, add.targets) === null) {
+    sendFailure(websocket, commandID, 'object not found');
+    return;
+  }
+  const selector = new RegionSelector(
+    viewer.canvas,
+    viewer.container,
+    viewer.overlayContainer,
+    toSelectionShape(add.tool),
+    (polygon, event) => {
+      selectPoints(viewer.scene, viewer.canvas, polygon, targetPointClouds(viewer, add)).then((selections) => {
+        sendPointsSelected(websocket, commandID, selections, event);
+      }, (error) => console.error(error));
+    }
+  );
+  viewer.selectionEventHandler[commandID] = () => selector.dispose();
+  sendSuccess(websocket, commandID, 'success');
+}
+
+function handleRemoveAll (websocket: WebSocket, commandID: string, viewer: PointCloudViewer) {
+  for (const uuid in viewer.selectionEventHandler) {
+    viewer.selectionEventHandler[uuid]();
+    delete viewer.selectionEventHandler[uuid];
+  }
+  sendSuccess(websocket, commandID, 'success');
+}
+
+function handleRemoveByUUID (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, uuid: string) {
+  const UUID = uuid.toUpperCase();
+  if (UUID in viewer.selectionEventHandler) {
+    viewer.selectionEventHandler[UUID]();
+    delete viewer.selectionEventHandler[UUID];
+    sendSuccess(websocket, commandID, 'success');
+  } else {
+    sendFailure(websocket, commandID, `handler ${UUID} not found`);
+  }
+}
@@ -0,0 +1,72 @@
+import * as PB from '../../protobuf/server';
+
+import { sendSuccess, sendFailure } from '../client_command';
+import { PointCloudViewer } from '../../viewer';
+import { PointCloud } from '../../pointcloud';
+
+export function handleSetPointCloudColor (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, setColor: PB.SetPointCloudColor | undefined): void {
+  if (setColor === undefined) {
+    sendFailure(websocket, commandID, 'failed to get set_point_cloud_color command');
+    return;
+  }
+  const target = setColor.target.toUpperCase();
+  const pointCloud = viewer.pointClouds[target];
+  if (pointCloud === undefined) {
+    sendFailure(websocket, commandID, 'pointcloud not found');
+    return;
+  }
+  switch (setColor.Color) {
+    case 'vertexColor':
+      pointCloud.useVertexColor();
+      break;
+    case 'colorMap':
+      {
+        const error = applyColorMap(pointCloud, setColor.colorMap);
+        if (error !== null) {
+          sendFailure(websocket, commandID, error);
+          return;
+        }
+      }
+      break;
+    case 'palette':
+      {
+        const palette = setColor.palette;
+        if (palette === undefined) {
+          sendFailure(websocket, commandID, 'failed to get palette');
+          return;
+        }
+        const error = pointCloud.usePalette(palette.colors);
+        if (error !== null) {
+          sendFailure(websocket, commandID, error);
+          return;
+        }
+      }
+      break;
+    default:
+      sendFailure(websocket, commandID, 'message has not any color');
+      return;
+  }
+  sendSuccess(websocket, commandID, target);
+}
+
+// エラーの場合はその内容を返す
+export function applyColorMap (pointCloud: PointCloud, colorMap: PB.ColorMap | undefined): string | null {
+  if (colorMap === undefined) {
+    return 'failed to get color_map';
+  }
+  const name = (() => {
+    switch (colorMap.type) {
+      case PB.ColorMapType.VIRIDIS:
+        return 'viridis';
+      case PB.ColorMapType.TURBO:
+        return 'turbo';
+      case PB.ColorMapType.JET:
+        return 'jet';
+      case PB.ColorMapType.GRAY:
+        return 'gray';
+      default:
+        return `${colorMap.type}`;
+    }
+  })();
+  return pointCloud.useColormap(colorMap.scalarField, name, colorMap.min, colorMap.max);
+}
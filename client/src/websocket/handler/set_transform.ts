@@ -0,0 +1,93 @@
+import * as PB from '../../protobuf/server';
+
+import { sendSuccess, sendFailure } from '../client_command';
+import { PointCloudViewer } from '../../viewer';
+import { Lineset } from '../../lineset';
+import { Overlay } from '../../overlay';
+import { OverlayTexts } from '../../overlay_texts';
+import { bytesToFloat32Array } from './util';
+
+import * as BABYLON from '@babylonjs/core';
+
+export function handleSetTransform (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, setTransform: PB.SetTransform | undefined): void {
+  if (setTransform === undefined) {
+    sendFailure(websocket, commandID, 'failed to get set_transform command');
+    return;
+  }
+  const targets = setTransform.targets;
+  const matrices = bytesToFloat32Array(setTransform.matrices);
+  if (matrices.length !== targets.length * 16) {
+    sendFailure(websocket, commandID, 'number of matrices does not match targets');
+    return;
+  }
+
+  const nodes: BABYLON.TransformNode[] = [];
+  for (const target of targets) {
+    const node = getTransformNode(viewer, target.toUpperCase());
+    if (node === null) {
+      sendFailure(websocket, commandID, `object not found: ${target}`);
+      return;
+    }
+    nodes.push(node);
+  }
+
+  const matrix = new BABYLON.Matrix();
+  for (let i = 0; i < nodes.length; i++) {
+    const node = nodes[i];
+    BABYLON.Matrix.FromArrayToRef(matrices, i * 16, matrix);
+    if (node.rotationQuaternion === null) node.rotationQuaternion = new BABYLON.Quaternion();
+    matrix.decompose(node.scaling, node.rotationQuaternion, node.position);
+  }
+
+  sendSuccess(websocket, commandID, 'success');
+}
+
+export function handleSetParent (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, setParent: PB.SetParent | undefined): void {
+  if (setParent === undefined) {
+    sendFailure(websocket, commandID, 'failed to get set_parent command');
+    return;
+  }
+  const node = getTransformNode(viewer, setParent.target.toUpperCase());
+  if (node === null) {
+    sendFailure(websocket, commandID, 'object not found');
+    return;
+  }
+  if (setParent.parent === '') {
+    node.parent = null;
+    sendSuccess(websocket, commandID, 'success');
+    return;
+  }
+  const parent = getTransformNode(viewer, setParent.parent.toUpperCase());
+  if (parent === null) {
+    sendFailure(websocket, commandID, 'parent not found');
+    return;
+  }
+  if (parent === node || parent.isDescendantOf(node)) {
+    sendFailure(websocket, commandID, 'parent must not be a descendant of the object');
+    return;
+  }
+  node.parent = parent;
+  sendSuccess(websocket, commandID, 'success');
+}
+
+// uuid のオブジェクトの座標系を表すノードを返す。
+// Babylon.jsのノードを持たないオブジェクト(Canvas2Dの線分や文字列、DOMのオーバーレイ)には、初めて呼ばれたときにTransformNodeを作る
+export function getTransformNode (viewer: PointCloudViewer, uuid: string): BABYLON.TransformNode | null {
+  const node = viewer.scene.getNodeByName(uuid);
+  if (node instanceof BABYLON.TransformNode) return node;
+
+  const target = findCanvasObject(viewer, uuid);
+  if (target === undefined) return null;
+  target.node = new BABYLON.TransformNode(uuid, viewer.scene);
+  return target.node;
+}
+
+export function hasObject (viewer: PointCloudViewer, uuid: string): boolean {
+  return viewer.scene.getNodeByName(uuid) !== null || findCanvasObject(viewer, uuid) !== undefined;
+}
+
+function findCanvasObject (viewer: PointCloudViewer, uuid: string): Lineset | Overlay | OverlayTexts | undefined {
+  return viewer.linesets.find((lineset) => lineset.UUID === uuid) ??
+    viewer.overlays.find((overlay) => overlay.uuid === uuid) ??
+    viewer.overlayTexts[uuid];
+}
@@ -0,0 +1,56 @@
+import * as PB from '../../protobuf/server';
+
+import { sendSuccess, sendFailure } from '../client_command';
+import { PointCloudViewer } from '../../viewer';
+import { getTransformNode, hasObject } from './set_transform';
+
+export function handleSetVisible (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, setVisible: PB.SetVisible | undefined): void {
+  if (setVisible === undefined || !setVisible.hasObjects) {
+    sendFailure(websocket, commandID, 'failed to get set_visible command');
+    return;
+  }
+  const uuids = selectObjects(viewer, setVisible.objects);
+  if (uuids === null) {
+    sendFailure(websocket, commandID, 'object not found');
+    return;
+  }
+  // 非表示にしてもGPU上のデータは残すので、再度表示するときに送信し直す必要がない
+  for (const uuid of uuids) {
+    getTransformNode(viewer, uuid)?.setEnabled(setVisible.visible);
+  }
+  sendSuccess(websocket, commandID, 'success');
+}
+
+export function addTags (viewer: PointCloudViewer, uuid: string, tags: string[]): void {
+  for (const tag of tags) {
+    const uuids = viewer.tags[tag];
+    if (uuids === undefined) {
+      viewer.tags[tag] = new Set([uuid]);
+    } else {
+      uuids.add(uuid);
+    }
+  }
+}
+
+// selector で指定したオブジェクトのUUIDを返す。uuids に存在しないオブジェクトが含まれる場合は null を返す
+export function selectObjects (viewer: PointCloudViewer, selector: PB.ObjectSelector): string[] | null {
+  const selected: Set<string> = new Set();
+  for (const uuid of selector.uuids) {
+    const upper = uuid.toUpperCase();
+    if (!hasObject(viewer, upper)) return null;
+    selected.add(upper);
+  }
+  const tagged = viewer.tags[selector.tag];
+  if (selector.tag !== '' && tagged !== undefined) {
+    // 削除済みのオブジェクトや追加に失敗したオブジェクトはここでタグから取り除く
+    for (const uuid of tagged) {
+      if (hasObject(viewer, uuid)) {
+        selected.add(uuid);
+      } else {
+        tagged.delete(uuid);
+      }
+    }
+    if (tagged.size === 0) delete viewer.tags[selector.tag];
+  }
+  return Array.from(selected);
+}
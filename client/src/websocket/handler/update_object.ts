@@ -0,0 +1,241 @@
+import * as PB from '../../protobuf/server';
+
+import { sendSuccess, sendFailure } from '../client_command';
+import { PointCloudViewer } from '../../viewer';
+import { dequantizePositions } from '../../pointcloud';
+import { bytesToFloat32Array, bytesToUint32Array, toQuantizedPositions } from './util';
+import * as imageType from 'image-type';
+
+import * as BABYLON from '@babylonjs/core';
+
+export function handleUpdateObject (websocket: WebSocket, commandID: string, viewer: PointCloudViewer, updateObject: PB.UpdateObject | undefined): void {
+  if (updateObject === undefined) {
+    sendFailure(websocket, commandID, 'failed to get update_object command');
+    return;
+  }
+  const target = updateObject.target.toUpperCase();
+  switch (updateObject.Object) {
+    case 'pointCloud':
+      handleUpdatePointCloud(websocket, commandID, viewer, target, updateObject.pointCloud);
+      break;
+    case 'boxes':
+      handleUpdateBoxes(websocket, commandID, viewer, target, updateObject.boxes);
+      break;
+    case 'overlay':
+      handleUpdateOverlay(websocket, commandID, viewer, target, updateObject.overlay);
+      break;
+    case 'image':
+      handleUpdateImage(websocket, commandID, viewer, target, updateObject.image);
+      break;
+    case 'mesh':
+      handleUpdateMesh(websocket, commandID, viewer, target, updateObject.mesh);
+      break;
+    default:
+      sendFailure(websocket, commandID, 'message has not any object');
+      break;
+  }
+}
+
+function handleUpdatePointCloud (
+  websocket: WebSocket,
+  commandID: string,
+  viewer: PointCloudViewer,
+  target: string,
+  update: PB.UpdateObjectPointCloud | undefined
+): void {
+  if (update === undefined) {
+    sendFailure(websocket, commandID, 'failed to get pointcloud');
+    return;
+  }
+  const pointCloud = viewer.pointClouds[target];
+  if (pointCloud === undefined) {
+    sendFailure(websocket, commandID, 'pointcloud not found');
+    return;
+  }
+
+  const addQuantized = update.addQuantizedPositions;
+  const addPositions = update.hasAddQuantizedPositions && addQuantized !== undefined
+    ? dequantizePositions(toQuantizedPositions(addQuantized))
+    : bytesToFloat32Array(update.addPositions);
+
+  const error = pointCloud.applyDelta(
+    update.clear,
+    bytesToUint32Array(update.removeIndices),
+    bytesToUint32Array(update.changeIndices),
+    update.changeColors,
+    addPositions,
+    update.addColors
+  );
+  if (error !== null) {
+    sendFailure(websocket, commandID, error);
+    return;
+  }
+
+  sendSuccess(websocket, commandID, target);
+}
+
+function handleUpdateBoxes (
+  websocket: WebSocket,
+  commandID: string,
+  viewer: PointCloudViewer,
+  target: string,
+  update: PB.UpdateObjectBoxes | undefined
+): void {
+  if (update === undefined) {
+    sendFailure(websocket, commandID, 'failed to get boxes');
+    return;
+  }
+  const boxes = viewer.boxes[target];
+  if (boxes === undefined) {
+    sendFailure(websocket, commandID, 'boxes not found');
+    return;
+  }
+
+  const indices = bytesToUint32Array(update.indices);
+  let error: string | null = null;
+  if (update.colors.length !== 0) {
+    error = boxes.setColors(indices, update.colors);
+  }
+  if (error === null && update.visible.length !== 0) {
+    error = boxes.setVisible(indices, update.visible);
+  }
+  if (error !== null) {
+    sendFailure(websocket, commandID, error);
+    return;
+  }
+
+  sendSuccess(websocket, commandID, target);
+}
+
+function handleUpdateOverlay (
+  websocket: WebSocket,
+  commandID: string,
+  viewer: PointCloudViewer,
+  target: string,
+  update: PB.UpdateObjectOverlay | undefined
+): void {
+  if (update === undefined) {
+    sendFailure(websocket, commandID, 'failed to get overlay');
+    return;
+  }
+  const overlay = viewer.overlays.find((overlay) => overlay.uuid === target);
+  if (overlay === undefined) {
+    sendFailure(websocket, commandID, 'overlay not found');
+    return;
+  }
+
+  const position = update.position;
+  if (update.hasPosition && position !== undefined) {
+    overlay.setPosition(new BABYLON.Vector3(position.x, position.y, position.z));
+  }
+  if (update.Contents === 'textHtml') {
+    overlay.setTextHTML(update.textHtml);
+  }
+
+  sendSuccess(websocket, commandID, target);
+}
+
+function handleUpdateImage (
+  websocket: WebSocket,
+  commandID: string,
+  viewer: PointCloudViewer,
+  target: string,
+  update: PB.UpdateObjectImage | undefined
+): void {
+  if (update === undefined) {
+    sendFailure(websocket, commandID, 'failed to get image');
+    return;
+  }
+  const mesh = viewer.scene.getMeshByName(target);
+  const material = mesh?.material;
+  if (!(material instanceof BABYLON.StandardMaterial) || material.diffuseTexture === null) {
+    sendFailure(websocket, commandID, 'image not found');
+    return;
+  }
+
+  const type = imageType.default(update.data);
+  if (type === null) {
+    sendFailure(websocket, commandID, 'unknown data type');
+    return;
+  }
+  const url = URL.createObjectURL(new Blob([update.data], {
+    type: type.mime
+  }));
+
+  // 読み込みが終わるまでは前の画像を表示し続け、読み込み後にテクスチャのみを差し替える
+  const texture: BABYLON.Texture = new BABYLON.Texture(
+    url,
+    viewer.scene,
+    undefined, // noMipmapOrOptions
+    undefined, // invertY
+    undefined, // samplingMode
+    () => {
+      // onLoad
+      URL.revokeObjectURL(url);
+      const previous = material.diffuseTexture;
+      texture.hasAlpha = true;
+      material.diffuseTexture = texture;
+      previous?.dispose();
+      sendSuccess(websocket, commandID, target);
+    },
+    () => {
+      // onError
+      URL.revokeObjectURL(url);
+      texture.dispose();
+      sendFailure(websocket, commandID, 'failed to load texture');
+    }
+  );
+}
+
+function handleUpdateMesh (
+  websocket: WebSocket,
+  commandID: string,
+  viewer: PointCloudViewer,
+  target: string,
+  update: PB.UpdateObjectMesh | undefined
+): void {
+  if (update === undefined) {
+    sendFailure(websocket, commandID, 'failed to get mesh');
+    return;
+  }
+  const mesh = viewer.scene.getMeshByName(target);
+  if (!(mesh instanceof BABYLON.Mesh) || mesh.getIndices() === null) {
+    sendFailure(websocket, commandID, 'mesh not found');
+    return;
+  }
+  const numVertices = mesh.getTotalVertices();
+
+  if (update.positions.length !== 0) {
+    const positions = bytesToFloat32Array(update.positions);
+    if (positions.length !== numVertices * 3) {
+      sendFailure(websocket, commandID, 'number of vertices does not match');
+      return;
+    }
+    const normals = new Float32Array(positions.length);
+    BABYLON.VertexData.ComputeNormals(positions, mesh.getIndices(), normals);
+    mesh.updateVerticesData(BABYLON.VertexBuffer.PositionKind, positions);
+    mesh.updateVerticesData(BABYLON.VertexBuffer.NormalKind, normals);
+    mesh.refreshBoundingInfo();
+  }
+
+  if (update.colors.length !== 0) {
+    const rgb = update.colors;
+    if (rgb.length !== numVertices * 3) {
+      sendFailure(websocket, commandID, 'number of colors does not match');
+      return;
+    }
+    const colors = new Float32Array(numVertices * 4);
+    for (let i = 0, j = 0; i < rgb.length; i += 3, j += 4) {
+      colors[j + 0] = rgb[i + 0] / 255;
+      colors[j + 1] = rgb[i + 1] / 255;
+      colors[j + 2] = rgb[i + 2] / 255;
+    }
+    if (mesh.isVerticesDataPresent(BABYLON.VertexBuffer.ColorKind)) {
+      mesh.updateVerticesData(BABYLON.VertexBuffer.ColorKind, colors);
+    } else {
+      mesh.setVerticesData(BABYLON.VertexBuffer.ColorKind, colors, true);
+    }
+  }
+
+  sendSuccess(websocket, commandID, target);
+}
@@ -1,5 +1,7 @@
 import * as BABYLON from '@babylonjs/core';
 import { VecXYZf } from '../../protobuf/client';
+import * as PB from '../../protobuf/server';
+import { QuantizedPositions } from '../../pointcloud';
 
 export function Vector32VecXYZf (v: BABYLON.Vector3): VecXYZf {
   return new VecXYZf({
@@ -8,3 +10,24 @@ export function Vector32VecXYZf (v: BABYLON.Vector3): VecXYZf {
     z: v.z
   });
 }
+
+// protobufのbytesフィールドはバッファ内の任意の位置を指すので、アラインメントを揃えるためにコピーしてから変換する
+export function bytesToFloat32Array (bytes: Uint8Array): Float32Array {
+  return new Float32Array(bytes.slice().buffer);
+}
+
+export function bytesToUint32Array (bytes: Uint8Array): Uint32Array {
+  return new Uint32Array(bytes.slice().buffer);
+}
+
+export function bytesToUint16Array (bytes: Uint8Array): Uint16Array {
+  return new Uint16Array(bytes.slice().buffer);
+}
+
+export function toQuantizedPositions (pbQuantized: PB.QuantizedPositions): QuantizedPositions {
+  return {
+    positions: bytesToUint16Array(pbQuantized.positions),
+    chunks: bytesToFloat32Array(pbQuantized.chunks),
+    chunkSize: pbQuantized.chunkSize
+  };
+}
@@ -2,6 +2,7 @@ import * as PB from '../protobuf/server';
 
 import { PointCloudViewer } from '../viewer';
 import { sendFailure } from './client_command';
+import { decompressServerCommand } from './decompress';
 
 import { handleAddControl } from './handler/add_control';
 import { handleAddObject } from './handler/add_object';
@@ -9,6 +10,9 @@ import { handleSetCameraStateEventHandler } from './handler/camera_state_event';
 import { handleScreenCapture } from './handler/capture_screen';
 import { handleGetCameraState } from './handler/get_camera';
 import { handleLogMessage } from './handler/log_message';
+import { handleMeasureFrameTime } from './handler/measure_frame_time';
+import { handleSetPickEventHandler } from './handler/pick_event';
+import { handleSetSelectionEventHandler } from './handler/selection_event';
 import { handleRemoveControl } from './handler/remove_control';
 import { handleRemoveObject } from './handler/remove_object';
 import { handleSetCamera } from './handler/set_camera';
@@ -16,12 +20,30 @@ import { handleSetConfig } from './handler/set_config';
 import { handleSetControl } from './handler/set_control';
 import { handleSetEnable } from './handler/set_enable';
 import { handleSetKeyEvent } from './handler/set_key_event';
+import { handleSetPointCloudColor } from './handler/set_pointcloud_color';
+import { handleSetParent, handleSetTransform } from './handler/set_transform';
+import { handleSetVisible } from './handler/set_visible';
+import { handleUpdateObject } from './handler/update_object';
 
 export function connectWebSocket (viewer: PointCloudViewer, url: string) {
   const websocket = new WebSocket(url);
+  websocket.binaryType = 'arraybuffer';
+  // 圧縮されたコマンドは非同期に展開されるので、受け取った順に処理されるように直列化する
+  let received = Promise.resolve();
   websocket.onmessage = function (ev: MessageEvent) {
-    const message = PB.ServerCommand.deserializeBinary(ev.data);
-    handleProtobuf(websocket, viewer, message);
+    const data = new Uint8Array(ev.data);
+    received = received.then(async () => {
+      let message = PB.ServerCommand.deserializeBinary(data);
+      if (message.Command === 'compressed') {
+        try {
+          message = await decompressServerCommand(message);
+        } catch (error) {
+          sendFailure(websocket, message.UUID.toUpperCase(), `failed to decompress command: ${error}`);
+          return;
+        }
+      }
+      handleProtobuf(websocket, viewer, message);
+    }).catch((error) => console.error(error));
   };
   websocket.onclose = function () {
     console.log('try to reconnecting');
@@ -74,6 +96,30 @@ function handleProtobuf (websocket: WebSocket, viewer: PointCloudViewer, message
       case 'setConfig':
         handleSetConfig(websocket, commandID, viewer, message.setConfig);
         break;
+      case 'updateObject':
+        handleUpdateObject(websocket, commandID, viewer, message.updateObject);
+        break;
+      case 'setPointCloudColor':
+        handleSetPointCloudColor(websocket, commandID, viewer, message.setPointCloudColor);
+        break;
+      case 'measureFrameTime':
+        handleMeasureFrameTime(websocket, commandID, viewer, message.measureFrameTime);
+        break;
+      case 'setTransform':
+        handleSetTransform(websocket, commandID, viewer, message.setTransform);
+        break;
+      case 'setParent':
+        handleSetParent(websocket, commandID, viewer, message.setParent);
+        break;
+      case 'setVisible':
+        handleSetVisible(websocket, commandID, viewer, message.setVisible);
+        break;
+      case 'setPickEventHandler':
+        handleSetPickEventHandler(websocket, commandID, viewer, message.setPickEventHandler);
+        break;
+      case 'setSelectionEventHandler':
+        handleSetSelectionEventHandler(websocket, commandID, viewer, message.setSelectionEventHandler);
+        break;
       default:
         sendFailure(websocket, commandID, 'message has not any command');
         break;
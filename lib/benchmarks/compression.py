@@ -0,0 +1,98 @@
+"""圧縮方法ごとに、点群を送信するコマンドの大きさとエンコード・デコードの時間を計測する。
+
+    poetry run python benchmarks/compression.py [num_points] [position_precision]
+
+デコードの時間はクライアントと同じ処理をPythonで行った場合の時間。
+"""
+import sys
+import time
+import zlib
+
+import numpy
+
+from cumo._vendor.pypcd import pypcd
+from cumo._internal.protobuf import server_pb2
+from cumo._internal.quantize import dequantize_positions, quantize_positions, spatial_order
+
+# pylint: disable=no-member
+
+
+def make_scene(num_points: int, rng: numpy.random.Generator) -> numpy.ndarray:
+    """LiDARのように原点から離れるほど疎になる点群を、座標を1mm単位に丸めて作る。
+
+    色は100点ずつ同じ色にして、実際の点群のように色が連続するようにする。
+
+    Returns:
+        numpy.ndarray: shape が (num_points,4) の x,y,z,rgb の点群
+    """
+    r = 100.0 ** rng.random(num_points)
+    theta = rng.random(num_points) * 2 * numpy.pi
+    xyz = numpy.column_stack((r * numpy.cos(theta), r * numpy.sin(theta), rng.normal(0, 0.5, num_points)))
+    xyz = numpy.round(xyz, 3).astype(numpy.float32)
+    colors = numpy.repeat(rng.integers(0, 1 << 24, -(-num_points // 100), dtype=numpy.uint32), 100)[:num_points]
+    return numpy.column_stack((xyz, colors.view(numpy.float32)))
+
+
+def encode_pcd(pc: numpy.ndarray, data: str) -> server_pb2.ServerCommand:
+    cloud = server_pb2.AddObject.PointCloud()
+    cloud.pcd_data = pypcd.make_xyz_rgb_point_cloud(pc).save_pcd_to_buffer(data)
+    return _wrap(cloud)
+
+
+def encode_quantized(pc: numpy.ndarray, precision: float) -> server_pb2.ServerCommand:
+    pc = pc[spatial_order(pc[:, :3])]
+    cloud = server_pb2.AddObject.PointCloud()
+    cloud.quantized_positions.CopyFrom(quantize_positions(pc[:, :3], precision))
+    packed = numpy.ascontiguousarray(pc[:, 3]).view(numpy.uint32)
+    cloud.colors = numpy.column_stack((packed >> 16, packed >> 8, packed)).astype(numpy.uint8).tobytes()
+    return _wrap(cloud)
+
+
+def _wrap(cloud: server_pb2.AddObject.PointCloud) -> server_pb2.ServerCommand:
+    command = server_pb2.ServerCommand()
+    command.add_object.point_cloud.CopyFrom(cloud)
+    return command
+
+
+def decode(data: bytes, deflate: bool) -> None:
+    if deflate:
+        data = server_pb2.ServerCommand.FromString(data).compressed
+        data = zlib.decompress(data)
+    cloud = server_pb2.ServerCommand.FromString(data).add_object.point_cloud
+    if cloud.HasField("quantized_positions"):
+        dequantize_positions(cloud.quantized_positions)
+    else:
+        _, fields = pypcd.pc_fields_from_buffer(cloud.pcd_data)
+        numpy.stack([fields["x"], fields["y"], fields["z"]], axis=1)
+
+
+def run(name: str, encode, deflate: bool) -> None:
+    start = time.perf_counter()
+    data = encode().SerializeToString()
+    if deflate:
+        envelope = server_pb2.ServerCommand()
+        envelope.compressed = zlib.compress(data)
+        data = envelope.SerializeToString()
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    decode(data, deflate)
+    decode_time = time.perf_counter() - start
+    print(f"{name:<24}{len(data) / 1e6:>10.2f}{encode_time * 1000:>12.0f}{decode_time * 1000:>12.0f}")
+
+
+def main():
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    precision = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    pc = make_scene(num_points, numpy.random.default_rng(0))
+
+    print(f"points: {num_points}, position_precision: {precision}")
+    print(f"{'compression':<24}{'size [MB]':>10}{'encode [ms]':>12}{'decode [ms]':>12}")
+    run("NONE", lambda: encode_pcd(pc, "binary"), False)
+    run("LZF", lambda: encode_pcd(pc, "binary_compressed"), False)
+    run("DEFLATE", lambda: encode_pcd(pc, "binary"), True)
+    run("NONE + quantization", lambda: encode_quantized(pc, precision), False)
+    run("DEFLATE + quantization", lambda: encode_quantized(pc, precision), True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""ダウンサンプルの各方法の処理時間と、細い構造や遠くの物体に残る点数を計測する。
+
+    poetry run python benchmarks/down_sample.py [num_points] [max_num_points]
+"""
+import os
+import sys
+import time
+
+import numpy
+
+from cumo import DownSampleStrategy
+from cumo._internal.down_sample import down_sample_pointcloud
+
+
+def make_scene(num_points: int, rng: numpy.random.Generator):
+    """LiDARのように原点から離れるほど疎になる地面と、遠くにあるポールと電線からなる点群を作る。
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): 点群と、各点が細い構造(ポールと電線)に属するかどうか
+    """
+    num_thin = num_points // 1000
+    # 地面: 原点からの距離の2乗に反比例する密度
+    r = 100.0 ** rng.random(num_points - 2 * num_thin)
+    theta = rng.random(r.shape[0]) * 2 * numpy.pi
+    ground = numpy.column_stack((r * numpy.cos(theta), r * numpy.sin(theta), rng.normal(0, 0.02, r.shape[0])))
+    # ポール: 半径5cm、高さ8mの円柱を80m先に10本
+    pole_index = rng.integers(10, size=num_thin)
+    pole_theta = rng.random(num_thin) * 2 * numpy.pi
+    poles = numpy.column_stack((
+        80 + 0.05 * numpy.cos(pole_theta),
+        pole_index * 5.0 - 25 + 0.05 * numpy.sin(pole_theta),
+        rng.random(num_thin) * 8,
+    ))
+    # 電線: ポールの上端を結ぶ線
+    t = rng.random(num_thin)
+    wires = numpy.column_stack((numpy.full(num_thin, 80.0), t * 45 - 25, numpy.full(num_thin, 8.0)))
+    xyz = numpy.concatenate((ground, poles, wires)).astype(numpy.float32)
+    is_thin = numpy.concatenate((numpy.zeros(ground.shape[0], dtype=bool), numpy.ones(2 * num_thin, dtype=bool)))
+    return xyz, is_thin
+
+
+def main():
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    max_num_points = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    rng = numpy.random.default_rng(0)
+    xyz, is_thin = make_scene(num_points, rng)
+    # 細い構造に属するかどうかを4列目に入れて、ダウンサンプル後も判別できるようにする
+    pc = numpy.column_stack((xyz, is_thin.astype(numpy.float32)))
+    is_far = numpy.linalg.norm(xyz[:, :2], axis=1) > 50
+
+    strategies = [
+        DownSampleStrategy.RANDOM_SAMPLE,
+        DownSampleStrategy.HASH_SAMPLE,
+        DownSampleStrategy.VOXEL_GRID.set_voxel_size(0.1),
+        DownSampleStrategy.FARTHEST_POINT,
+        DownSampleStrategy.POISSON_DISK.set_min_distance(0.3),
+        DownSampleStrategy.DENSITY_ADAPTIVE.set_voxel_size(0.5),
+    ]
+    print(f"points: {num_points}, max_num_points: {max_num_points}, "
+          f"thin: {int(is_thin.sum())}, far: {int(is_far.sum())}")
+    print(f"{'strategy':<22}{'time [s]':>10}{'points':>10}{'thin':>10}{'far':>10}")
+    for strategy in strategies:
+        run(pc, strategy, max_num_points, strategy.name)
+
+    # 並列化に対応している方法はCPUのコア数のスレッドでも計測する
+    num_workers = os.cpu_count() or 1
+    for strategy in strategies[:3]:
+        run(pc, strategy.set_num_workers(num_workers), max_num_points, f"{strategy.name} x{num_workers}")
+        strategy.set_num_workers(None)
+
+
+def run(pc: numpy.ndarray, strategy: DownSampleStrategy, max_num_points: int, name: str):
+    start = time.perf_counter()
+    down_sampled = down_sample_pointcloud(pc, strategy, max_num_points)
+    elapsed = time.perf_counter() - start
+    thin = int(down_sampled[:, 3].sum())
+    far = int((numpy.linalg.norm(down_sampled[:, :2], axis=1) > 50).sum())
+    print(f"{name:<22}{elapsed:>10.2f}{down_sampled.shape[0]:>10}{thin:>10}{far:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Linesetの描画方法ごとに、線分の数に対する1フレームの描画時間を計測する。
+
+    poetry run python benchmarks/lineset.py [max_num_lines]
+
+起動後に表示されるURLをブラウザで開くと計測が始まる。
+"""
+import sys
+
+import numpy
+
+from cumo import PointCloudViewer, LinesetRenderer
+
+
+def make_lines(num_lines: int, rng: numpy.random.Generator):
+    """走行軌跡のように連続した折れ線を、半径50mの範囲に作る。"""
+    steps = rng.normal(0, 0.5, (num_lines + 1, 3)).astype(numpy.float32)
+    steps[:, 2] *= 0.1
+    xyz = numpy.cumsum(steps, axis=0)
+    xyz[:, :2] = (xyz[:, :2] + 50) % 100 - 50
+    from_to = numpy.column_stack((numpy.arange(num_lines), numpy.arange(1, num_lines + 1))).astype(numpy.uint32)
+    rgb = rng.integers(0, 256, (num_lines, 3), dtype=numpy.uint8)
+    width = rng.uniform(1, 4, num_lines).astype(numpy.float32)
+    return xyz, from_to, rgb, width
+
+
+def main():
+    max_num_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = numpy.random.default_rng(0)
+    viewer = PointCloudViewer(autostart=True)
+    print("open http://127.0.0.1:8082 on your browser")
+    viewer.set_camera_position(0, 0, 100)
+    viewer.set_camera_target(0, 0, 0)
+
+    renderers = [LinesetRenderer.CANVAS, LinesetRenderer.GPU]
+    print(f"{'lines':>10}" + "".join(f"{r.name + ' [ms]':>14}" for r in renderers))
+    viewer.remove_all_objects()
+    empty = viewer.measure_frame_time(10)
+    print(f"{0:>10}" + "".join(f"{empty:>14.2f}" for _ in renderers))
+    num_lines = 100
+    while num_lines <= max_num_lines:
+        xyz, from_to, rgb, width = make_lines(num_lines, rng)
+        row = f"{num_lines:>10}"
+        for renderer in renderers:
+            uuid = viewer.send_lineset(xyz, from_to, rgb, width, renderer=renderer)
+            row += f"{viewer.measure_frame_time(10):>14.2f}"
+            viewer.remove_object(uuid)
+        print(row)
+        num_lines *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,8 @@
-from cumo.pointcloudviewer import PointCloudViewer, DownSampleStrategy
+from cumo.pointcloudviewer import (
+    PointCloudViewer, DownSampleStrategy, Colormap, Compression, LinesetRenderer, GlyphShape, SelectionTool,
+)
 from cumo.keyboard_event import KeyboardEvent
+from cumo.overlay_text_style import OverlayTextStyle
+from cumo.object_info import ObjectInfo
+from cumo.pick_event import PickEvent, PickEventType
+from cumo.selection_event import SelectionEvent, PointSelection
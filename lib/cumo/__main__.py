@@ -13,6 +13,7 @@ def main():
 
     parser = ArgumentParser()
     parser.add_argument("pcd_filepath")
+    parser.add_argument("--no-cache", action="store_true", help="do not cache the downsampled point cloud on disk")
     args = parser.parse_args()
 
     viewer = PointCloudViewer(
@@ -24,6 +25,9 @@ def main():
 
     reset_client(viewer)
 
+    if not args.no_cache:
+        viewer.set_pcd_disk_cache()
+
     radius = send_pointcloud_pcd(viewer, args.pcd_filepath)
 
     create_axis_arrows(viewer, args.pcd_filepath)
@@ -68,9 +72,7 @@ def main():
 
 
 def send_pointcloud_pcd(viewer: PointCloudViewer, filename: str) -> float:
-    with open(filename, "rb") as f:
-        b = f.read()
-        viewer.send_pointcloud_pcd(b)
+    viewer.send_pointcloud_pcd_file(filename)
     return 1
 
 
@@ -0,0 +1,93 @@
+import os
+import tempfile
+from typing import Optional
+
+from cumo.cache_stats import CacheStats
+
+_SUFFIX = ".bin"
+
+
+class DiskCache:
+    """ディレクトリにデータをファイルとして保持するキャッシュ。
+
+    合計サイズが上限を超えた場合は、最後に使われた時刻(ファイルの更新時刻)が古いものから削除する。
+    複数のプロセスから同じディレクトリを使っても壊れないように、書き込みは一時ファイルの置き換えで行う。
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """key に対応するデータを返す。ない場合はNoneを返す。
+
+        ファイル全体を bytes として読み込む。データはサーバープロセスへのキューに渡す際にコピーされるので、
+        mmap したまま返してもコピーは減らない。
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return data
+
+    def put(self, key: bytes, value: bytes) -> None:
+        if len(value) > self._max_bytes:
+            return
+        (fd, tmp_path) = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def clear(self) -> None:
+        for entry in self._entries():
+            _unlink(entry.path)
+
+    def stats(self) -> CacheStats:
+        entries = self._entries()
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            num_entries=len(entries),
+            num_bytes=sum(entry.stat().st_size for entry in entries),
+            max_bytes=self._max_bytes,
+        )
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        num_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if num_bytes <= self._max_bytes:
+                break
+            num_bytes -= entry.stat().st_size
+            _unlink(entry.path)
+            self._evictions += 1
+
+    def _entries(self):
+        with os.scandir(self._directory) as it:
+            return [entry for entry in it if entry.is_file() and entry.name.endswith(_SUFFIX)]
+
+    def _path(self, key: bytes) -> str:
+        return os.path.join(self._directory, key.hex() + _SUFFIX)
+
+
+def _unlink(path: str) -> None:
+    # 他のプロセスが先に削除した場合は無視する
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -1,48 +1,373 @@
-from typing import Dict, Tuple
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
 
 import numpy
 import numpy.random
 
 from cumo.pointcloudviewer import DownSampleStrategy
 
+# splitmix64 の定数
+_HASH_MULTIPLIERS = numpy.array([0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB], dtype=numpy.uint64)
+# 点数と選ぶ点数の積がこれ以下の場合は厳密な最遠点サンプリングを行う
+_FARTHEST_POINT_EXACT_MAX_WORK = 100_000_000
+_FARTHEST_POINT_EXACT_MAX_NUM_POINTS = 10_000
+# 近似的な最遠点サンプリングで格子を細かくする回数の上限
+_FARTHEST_POINT_MAX_LEVELS = 21
+# ポアソンディスクサンプリングで1つのセルについて試す点の数
+_POISSON_DISK_ATTEMPTS = 3
+# 並列にダウンサンプルする際の、分割した点群1つあたりの最小の点数
+_PARALLEL_MIN_POINTS_PER_PARTITION = 100_000
+
 
 def down_sample_pointcloud(pc: numpy.ndarray, strategy: DownSampleStrategy, max_num_points: int) -> numpy.ndarray:
-    assert pc.shape[1] == 3 or pc.shape[1] == 4
+    assert pc.shape[1] >= 3
 
     if pc.shape[0] <= max_num_points:
         return pc
 
     if strategy == DownSampleStrategy.NONE:
         return pc
+    num_partitions = min(strategy.num_workers or 1, pc.shape[0] // _PARALLEL_MIN_POINTS_PER_PARTITION)
+    if num_partitions > 1 and strategy in (
+            DownSampleStrategy.RANDOM_SAMPLE, DownSampleStrategy.HASH_SAMPLE, DownSampleStrategy.VOXEL_GRID):
+        with ThreadPoolExecutor(num_partitions) as executor:
+            return _down_sample_parallel(pc, strategy, max_num_points, num_partitions, executor)
+    return _DOWN_SAMPLERS[strategy](pc, strategy, max_num_points)
+
+
+def _down_sample_voxel_grid(pc: numpy.ndarray, strategy: DownSampleStrategy, max_num_points: int) -> numpy.ndarray:
+    assert strategy.voxel_size is not None
+    return down_sample_voxel(pc, strategy.voxel_size, max_num_points, strategy.seed)
+
+
+def _down_sample_poisson_disk(pc: numpy.ndarray, strategy: DownSampleStrategy, max_num_points: int) -> numpy.ndarray:
+    assert strategy.min_distance is not None
+    return down_sample_poisson_disk(pc, strategy.min_distance, max_num_points, strategy.seed)
+
+
+def _down_sample_density_adaptive(
+    pc: numpy.ndarray, strategy: DownSampleStrategy, max_num_points: int
+) -> numpy.ndarray:
+    assert strategy.voxel_size is not None
+    return down_sample_density_adaptive(pc, strategy.voxel_size, max_num_points, strategy.seed)
+
+
+# DownSampleStrategy.NONE 以外の方法と、点群・方法・点数の上限を受け取ってダウンサンプルする関数
+_DOWN_SAMPLERS: Dict[DownSampleStrategy, Callable[[numpy.ndarray, DownSampleStrategy, int], numpy.ndarray]] = {
+    DownSampleStrategy.RANDOM_SAMPLE: lambda pc, strategy, n: down_sample_random(pc, n, strategy.seed),
+    DownSampleStrategy.HASH_SAMPLE: lambda pc, strategy, n: down_sample_hash(pc, n, strategy.seed),
+    DownSampleStrategy.VOXEL_GRID: _down_sample_voxel_grid,
+    DownSampleStrategy.FARTHEST_POINT: lambda pc, strategy, n: down_sample_farthest_point(pc, n, strategy.seed),
+    DownSampleStrategy.POISSON_DISK: _down_sample_poisson_disk,
+    DownSampleStrategy.DENSITY_ADAPTIVE: _down_sample_density_adaptive,
+}
+
+
+def down_sample_chunks(
+    chunks: Iterable[numpy.ndarray], strategy: DownSampleStrategy, max_num_points: int
+) -> numpy.ndarray:
+    """チャンクに分割された点群を、全体をメモリに載せずにダウンサンプルする。
+
+    RANDOM_SAMPLE と HASH_SAMPLE では各点に優先度を付けて上位 max_num_points 点のみを保持する
+    リザーバーサンプリングを行うので、点群全体を一度にダウンサンプルした場合と同じ分布で点が選ばれる。
+
+    Args:
+        chunks (Iterable[numpy.ndarray]): 列数が同じ点群の列。1つ以上必要。
+        strategy (DownSampleStrategy): ダウンサンプルの方法。
+        max_num_points (int): 点数をこの数字以下に削減する。
+
+    Returns:
+        numpy.ndarray: ダウンサンプルした点群。
+    """
+    if strategy in (DownSampleStrategy.RANDOM_SAMPLE, DownSampleStrategy.HASH_SAMPLE):
+        rng = numpy.random.default_rng(strategy.seed)
+        kept: Optional[numpy.ndarray] = None
+        kept_keys = numpy.zeros((0,), dtype=numpy.uint64)
+        for chunk in chunks:
+            if strategy == DownSampleStrategy.RANDOM_SAMPLE:
+                keys = rng.integers(numpy.iinfo(numpy.uint64).max, size=chunk.shape[0], dtype=numpy.uint64)
+            else:
+                keys = _hash_points(chunk[:, :3], strategy.seed)
+            kept = chunk if kept is None else numpy.concatenate((kept, chunk))
+            kept_keys = numpy.concatenate((kept_keys, keys))
+            if kept.shape[0] > max_num_points:
+                selected = numpy.sort(numpy.argpartition(kept_keys, max_num_points - 1)[:max_num_points])
+                kept = kept[selected]
+                kept_keys = kept_keys[selected]
+        assert kept is not None
+        return kept
+
+    # それ以外の方法ではチャンクごとにダウンサンプルしてから、まとめたものを再度ダウンサンプルする
+    down_sampled: List[numpy.ndarray] = [
+        down_sample_pointcloud(chunk, strategy, max_num_points) for chunk in chunks
+    ]
+    assert len(down_sampled) > 0
+    return down_sample_pointcloud(numpy.concatenate(down_sampled), strategy, max_num_points)
+
+
+def _down_sample_parallel(
+    pc: numpy.ndarray,
+    strategy: DownSampleStrategy,
+    max_num_points: int,
+    num_partitions: int,
+    executor: ThreadPoolExecutor,
+) -> numpy.ndarray:
+    # numpyの処理の多くはGILを解放するので、スレッドで並列に実行できる
+    bounds = numpy.linspace(0, pc.shape[0], num_partitions + 1).astype(numpy.int64)
+    ranges = list(zip(bounds[:-1], bounds[1:]))
+
     if strategy == DownSampleStrategy.RANDOM_SAMPLE:
-        return down_sample_random(pc, max_num_points)
-    if strategy == DownSampleStrategy.VOXEL_GRID:
-        assert strategy.voxel_size is not None
-        return down_sample_voxel(pc, strategy.voxel_size, max_num_points)
+        # 点数に比例して選ぶ点数を割り当てる。各範囲では異なるシードを使う。
+        # 範囲ごとの層化抽出になるので、同じシードでも並列化しない場合とは異なる点が選ばれる
+        quotas = numpy.diff(max_num_points * bounds // pc.shape[0])
+        seeds = numpy.random.SeedSequence(strategy.seed).generate_state(num_partitions)
+        indices = executor.map(
+            lambda i: ranges[i][0] + random_sample_indices(
+                int(ranges[i][1] - ranges[i][0]), int(quotas[i]), int(seeds[i])),
+            range(num_partitions))
+        return pc[numpy.concatenate(list(indices))]
+
+    if strategy == DownSampleStrategy.HASH_SAMPLE:
+        # ハッシュ値の計算のみを分割するので、結果は並列化しない場合と同じになる
+        keys = numpy.concatenate(list(executor.map(
+            lambda r: _hash_points(pc[r[0]:r[1], :3], strategy.seed), ranges)))
+        return pc[numpy.sort(numpy.argpartition(keys, max_num_points - 1)[:max_num_points])]
+
+    # VOXEL_GRID: 1つのボクセルが複数に分かれないように、x方向のボクセルの番号で分割する
+    assert strategy.voxel_size is not None
+    voxel_size = strategy.voxel_size
+    cells_x = numpy.round(pc[:, 0] * (1.0 / voxel_size))
+    edges = numpy.unique(numpy.quantile(cells_x, numpy.linspace(0, 1, num_partitions + 1)[1:-1]))
+    # 分割は一度だけ行い、各スレッドには連続した範囲を渡す。
+    # 分割の番号は小さい整数なので安定ソートは基数ソートになり、各分割の中では元の順番が保たれる
+    slab_ids = numpy.digitize(cells_x, edges).astype(numpy.min_scalar_type(edges.shape[0]))
+    order = numpy.argsort(slab_ids, kind="stable")
+    offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(slab_ids, minlength=edges.shape[0] + 1))))
+    partitioned = pc[order]
+    averaged = numpy.concatenate(list(executor.map(
+        lambda i: _voxel_average(partitioned[offsets[i]:offsets[i + 1]], voxel_size), range(edges.shape[0] + 1))))
+    if averaged.shape[0] > max_num_points:
+        return down_sample_random(averaged, max_num_points, strategy.seed)
+    return averaged
+
+
+def down_sample_random(pc: numpy.ndarray, max_num_points: int, seed: Optional[int] = None) -> numpy.ndarray:
+    return pc[random_sample_indices(pc.shape[0], max_num_points, seed)]
+
+
+def random_sample_indices(num_points: int, max_num_points: int, seed: Optional[int] = None) -> numpy.ndarray:
+    """num_points 点から重複なしに max_num_points 点を選び、そのインデックスを昇順で返す。"""
+    if num_points <= max_num_points:
+        return numpy.arange(num_points)
+    rng = numpy.random.default_rng(seed)
+    return numpy.sort(rng.choice(num_points, max_num_points, replace=False))
+
+
+def down_sample_hash(pc: numpy.ndarray, max_num_points: int, seed: Optional[int] = None) -> numpy.ndarray:
+    return pc[hash_sample_indices(pc[:, :3], max_num_points, seed)]
 
-    assert False, f"strategy not implemented: {strategy.name}"
 
+def hash_sample_indices(xyz: numpy.ndarray, max_num_points: int, seed: Optional[int] = None) -> numpy.ndarray:
+    """座標のハッシュ値が小さい順に max_num_points 点を選び、そのインデックスを昇順で返す。
 
-def down_sample_random(pc: numpy.ndarray, max_num_points: int) -> numpy.ndarray:
-    indices = numpy.arange(pc.shape[0])
-    return pc[numpy.random.choice(indices, max_num_points)]
+    どの点が選ばれるかは座標のみで決まるので、フレーム間で共通する点は同じように選ばれ続ける。
+    """
+    if xyz.shape[0] <= max_num_points:
+        return numpy.arange(xyz.shape[0])
+    keys = _hash_points(xyz, seed)
+    return numpy.sort(numpy.argpartition(keys, max_num_points - 1)[:max_num_points])
 
 
-def down_sample_voxel(pc: numpy.ndarray, voxel_size: float, max_num_points: int) -> numpy.ndarray:
-    scale = 1.0 / voxel_size
-    voxels: Dict[Tuple[float, float, float], Tuple[numpy.ndarray, float, int]] = {}
-    output = []
+def _hash_points(xyz: numpy.ndarray, seed: Optional[int]) -> numpy.ndarray:
+    bits = numpy.ascontiguousarray(xyz, dtype=numpy.float32).view(numpy.uint32).astype(numpy.uint64)
+    # 0.0 と -0.0 を同じ点として扱う
+    bits[bits == 0x80000000] = 0
+    h = numpy.full((xyz.shape[0],), seed if seed is not None else 0, dtype=numpy.uint64)
+    with numpy.errstate(over="ignore"):
+        for i in range(3):
+            h = _mix(h ^ (bits[:, i] * _HASH_MULTIPLIERS[i]))
+    return h
 
-    for i, _ in enumerate(pc):
-        [x, y, z] = numpy.round(pc[i][:3] * scale).astype(numpy.int32)
-        (p, c, n) = voxels.get((x, y, z), ((0.0, 0.0, 0.0), pc[i][3], 0))
-        voxels[(x, y, z)] = (pc[i][:3] + p, c, n + 1)
 
-    for ((x, y, z), (acc, c, n)) in voxels.items():
-        output.append(numpy.hstack((acc / n, c)))
+def _mix(h: numpy.ndarray) -> numpy.ndarray:
+    h = (h ^ (h >> numpy.uint64(30))) * _HASH_MULTIPLIERS[1]
+    h = (h ^ (h >> numpy.uint64(27))) * _HASH_MULTIPLIERS[2]
+    return h ^ (h >> numpy.uint64(31))
 
-    output_arr = numpy.array(output).astype(numpy.float32)
 
-    if len(output) > max_num_points:
-        return down_sample_random(output_arr, max_num_points)
+def down_sample_farthest_point(pc: numpy.ndarray, max_num_points: int, seed: Optional[int] = None) -> numpy.ndarray:
+    """既に選んだ点から最も遠い点を順に選ぶ。
+
+    点数が多い場合は、格子を粗い方から細かくしていき、まだ点が選ばれていないセルから1点ずつ選ぶことで近似する。
+    """
+    if max_num_points <= 0:
+        return pc[:0]
+    xyz = pc[:, :3].astype(numpy.float64)
+    rng = numpy.random.default_rng(seed)
+    if (pc.shape[0] * max_num_points <= _FARTHEST_POINT_EXACT_MAX_WORK
+            and max_num_points <= _FARTHEST_POINT_EXACT_MAX_NUM_POINTS):
+        return pc[numpy.sort(_farthest_point_exact(xyz, max_num_points, rng))]
+    return pc[numpy.sort(_farthest_point_hierarchical(xyz, max_num_points, rng))]
+
+
+def _farthest_point_exact(xyz: numpy.ndarray, max_num_points: int, rng: numpy.random.Generator) -> numpy.ndarray:
+    if max_num_points <= 0:
+        return numpy.zeros((0,), dtype=numpy.int64)
+    selected = numpy.empty((max_num_points,), dtype=numpy.int64)
+    selected[0] = rng.integers(xyz.shape[0])
+    distances = numpy.sum((xyz - xyz[selected[0]]) ** 2, axis=1)
+    for i in range(1, max_num_points):
+        selected[i] = numpy.argmax(distances)
+        numpy.minimum(distances, numpy.sum((xyz - xyz[selected[i]]) ** 2, axis=1), out=distances)
+    return selected
+
+
+def _farthest_point_hierarchical(
+    xyz: numpy.ndarray, max_num_points: int, rng: numpy.random.Generator
+) -> numpy.ndarray:
+    if max_num_points <= 0:
+        return numpy.zeros((0,), dtype=numpy.int64)
+    priorities = rng.random(xyz.shape[0])
+    origin = xyz.min(axis=0)
+    cell_size = max(float(numpy.max(xyz.max(axis=0) - origin)), float(numpy.finfo(numpy.float32).tiny))
+    taken = numpy.zeros((xyz.shape[0],), dtype=bool)
+    num_taken = 0
+    for _ in range(_FARTHEST_POINT_MAX_LEVELS):
+        keys = _cell_keys(numpy.floor((xyz - origin) / cell_size).astype(numpy.int64))
+        # まだ点が選ばれていないセルごとに、優先度が最も高い点を選ぶ
+        candidates = numpy.flatnonzero(~taken & ~numpy.isin(keys, keys[taken]))
+        candidates = candidates[numpy.lexsort((priorities[candidates], keys[candidates]))]
+        _, first = numpy.unique(keys[candidates], return_index=True)
+        new = candidates[first]
+        if num_taken + new.shape[0] >= max_num_points:
+            # 予算を超える場合は、このレベルで選んだ点から優先度順に選ぶ
+            new = new[numpy.argsort(priorities[new])[:max_num_points - num_taken]]
+            taken[new] = True
+            return numpy.flatnonzero(taken)
+        taken[new] = True
+        num_taken += new.shape[0]
+        cell_size /= 2
+
+    # 格子をこれ以上細かくしても区別できない点は優先度順に選ぶ
+    rest = numpy.flatnonzero(~taken)
+    taken[rest[numpy.argsort(priorities[rest])[:max_num_points - num_taken]]] = True
+    return numpy.flatnonzero(taken)
+
+
+def down_sample_poisson_disk(
+    pc: numpy.ndarray, min_distance: float, max_num_points: int, seed: Optional[int] = None
+) -> numpy.ndarray:
+    """互いの距離が min_distance 以上になるように点を選ぶ。
+
+    一辺が min_distance/√3 のセルに分け、各セルに高々1点を選ぶ。
+    3つおきのセルは互いに min_distance 以上離れているので、27組に分けて組ごとにまとめて選ぶ。
+    """
+    if max_num_points <= 0:
+        return pc[:0]
+    xyz = pc[:, :3].astype(numpy.float64)
+    rng = numpy.random.default_rng(seed)
+    cells = numpy.floor((xyz - xyz.min(axis=0)) / (min_distance / numpy.sqrt(3))).astype(numpy.int64)
+    keys = _cell_keys(cells)
+    order = numpy.lexsort((rng.random(xyz.shape[0]), keys))
+    (cell_keys, starts, counts) = numpy.unique(keys[order], return_index=True, return_counts=True)
+    cell_coords = cells[order[starts]]
+    phases = (cell_coords % 3) @ numpy.array([9, 3, 1])
+    accepted = numpy.full((cell_keys.shape[0],), -1, dtype=numpy.int64)
+    # min_distance 以内の点は前後2つ以内のセルにある
+    offsets = [numpy.array(o) for o in itertools.product(range(-2, 3), repeat=3) if o != (0, 0, 0)]
+
+    for phase in range(27):
+        phase_cells = numpy.flatnonzero(phases == phase)
+        for attempt in range(_POISSON_DISK_ATTEMPTS):
+            candidates = phase_cells[(counts[phase_cells] > attempt) & (accepted[phase_cells] < 0)]
+            if candidates.shape[0] == 0:
+                break
+            points = order[starts[candidates] + attempt]
+            is_far = numpy.ones((candidates.shape[0],), dtype=bool)
+            for offset in offsets:
+                neighbor_keys = _cell_keys(cell_coords[candidates] + offset)
+                pos = numpy.minimum(numpy.searchsorted(cell_keys, neighbor_keys), cell_keys.shape[0] - 1)
+                neighbors = numpy.where(cell_keys[pos] == neighbor_keys, accepted[pos], -1)
+                has_neighbor = numpy.flatnonzero(neighbors >= 0)
+                distances = numpy.sum((xyz[points[has_neighbor]] - xyz[neighbors[has_neighbor]]) ** 2, axis=1)
+                is_far[has_neighbor[distances < min_distance ** 2]] = False
+            accepted[candidates[is_far]] = points[is_far]
+
+    indices = numpy.sort(accepted[accepted >= 0])
+    if indices.shape[0] > max_num_points:
+        indices = indices[random_sample_indices(indices.shape[0], max_num_points, seed)]
+    return pc[indices]
+
+
+def down_sample_density_adaptive(
+    pc: numpy.ndarray, voxel_size: float, max_num_points: int, seed: Optional[int] = None
+) -> numpy.ndarray:
+    """ボクセルごとに点数の平方根に比例する数の点を選ぶ。点が1つでもあるボクセルからは少なくとも1点を選ぶ。
+
+    ボクセル数が max_num_points より多い場合は、点の少ないボクセルを優先して1点ずつ選ぶ。
+    """
+    if max_num_points <= 0:
+        return pc[:0]
+    rng = numpy.random.default_rng(seed)
+    keys = _cell_keys(numpy.floor(pc[:, :3] / voxel_size).astype(numpy.int64))
+    order = numpy.lexsort((rng.random(pc.shape[0]), keys))
+    (_, starts, counts) = numpy.unique(keys[order], return_index=True, return_counts=True)
+
+    if starts.shape[0] >= max_num_points:
+        # 重み 1/√点数 の重み付きサンプリング(Efraimidis-Spirakis)
+        priorities = numpy.log(rng.random(starts.shape[0])) * numpy.sqrt(counts)
+        selected_voxels = numpy.argpartition(-priorities, max_num_points - 1)[:max_num_points]
+        return pc[numpy.sort(order[starts[selected_voxels]])]
+
+    # ボクセルごとの点数 clip(c√n, 1, n) の合計が max_num_points 以下になる最大の c を二分探索する
+    sqrt_counts = numpy.sqrt(counts)
+    (low, high) = (0.0, float(sqrt_counts.max()))
+    for _ in range(50):
+        mid = (low + high) / 2
+        if numpy.sum(numpy.clip(numpy.floor(mid * sqrt_counts), 1, counts)) <= max_num_points:
+            low = mid
+        else:
+            high = mid
+    quotas = numpy.clip(numpy.floor(low * sqrt_counts), 1, counts).astype(numpy.int64)
+
+    ranks = numpy.arange(pc.shape[0]) - numpy.repeat(starts, counts)
+    return pc[numpy.sort(order[ranks < numpy.repeat(quotas, counts)])]
+
+
+def _cell_keys(cells: numpy.ndarray) -> numpy.ndarray:
+    # 各軸21ビットずつ詰めて1つの整数にする。範囲外のセル座標も別のキーになるように下位ビットのみを使う
+    masked = cells & 0x1FFFFF
+    return (masked[:, 0] << 42) | (masked[:, 1] << 21) | masked[:, 2]
+
+
+def down_sample_voxel(
+    pc: numpy.ndarray, voxel_size: float, max_num_points: int, seed: Optional[int] = None
+) -> numpy.ndarray:
+    output_arr = _voxel_average(pc, voxel_size)
+    if output_arr.shape[0] > max_num_points:
+        return down_sample_random(output_arr, max_num_points, seed)
     return output_arr
+
+
+def _voxel_average(pc: numpy.ndarray, voxel_size: float) -> numpy.ndarray:
+    cells = numpy.round(pc[:, :3] * (1.0 / voxel_size)).astype(numpy.int64)
+    (_, first, inverse, counts) = numpy.unique(
+        _exact_cell_keys(cells), return_index=True, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    centroids = numpy.column_stack([
+        numpy.bincount(inverse, weights=pc[:, axis], minlength=counts.shape[0]) / counts for axis in range(3)
+    ])
+    # 座標以外の列(rgbやスカラー値)はボクセル内の最初の点の値を使う。ボクセルは最初の点の順に並べる
+    order = numpy.argsort(first)
+    return numpy.column_stack((centroids[order].astype(numpy.float32), pc[first[order], 3:].astype(numpy.float32)))
+
+
+def _exact_cell_keys(cells: numpy.ndarray) -> numpy.ndarray:
+    # _cell_keys と異なり、セルの範囲が広くても異なるセルが同じキーにならない
+    cells = cells - cells.min(axis=0)
+    dims = [int(d) + 1 for d in cells.max(axis=0)]
+    if dims[0] * dims[1] * dims[2] < 2 ** 63:
+        return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    (_, inverse) = numpy.unique(cells, axis=0, return_inverse=True)
+    return inverse.reshape(-1)
@@ -1,14 +1,19 @@
 from __future__ import annotations  # Postponed Evaluation of Annotations
 import queue
-import base64
 from typing import TYPE_CHECKING, Callable, Optional
 from uuid import UUID
 from google.protobuf.message import DecodeError
 from cumo._internal.protobuf import server_pb2
 from cumo._internal.protobuf import client_pb2
+from cumo.pointcloudviewer import Compression
 from cumo.keyboard_event import KeyboardEvent
 from cumo._internal.members.camera import _EVENT_CAMERA_STATE_CHANGED
+from cumo._internal.members.pick_event_handler import _EVENT_PICKED
+from cumo._internal.members.selection_event_handler import _EVENT_SELECTED, _make_selection_event
+from cumo._internal.members.set_compression import _compress_command
 from cumo.camera_state import CameraState, Vector3f, CameraMode
+from cumo.pick_event import PickEvent, PickEventType
+from cumo.selection_event import SelectionEvent
 if TYPE_CHECKING:
     from cumo import PointCloudViewer
 
@@ -50,6 +55,12 @@ def _handle_message(self: PointCloudViewer, command: client_pb2.ClientCommand) -
         return True
     if command.HasField("cameara_state_changed"):
         _handle_camera_state_changed(self, command)
+    if command.HasField("pick_event_occurred"):
+        _handle_pick_event_occurred(self, command)
+        return True
+    if command.HasField("points_selected"):
+        _handle_points_selected(self, command)
+        return True
     return False
 
 
@@ -149,7 +160,45 @@ def _handle_camera_state_changed(self: PointCloudViewer, ev_pb: client_pb2.Clien
         handler(state, uuid)
 
 
-def _send_data(self: PointCloudViewer, pbobj: server_pb2.ServerCommand, uuid: UUID) -> None:
+def _handle_pick_event_occurred(self: PointCloudViewer, ev_pb: client_pb2.ClientCommand):
+    uuid = UUID(ev_pb.UUID)
+    pb_event = ev_pb.pick_event_occurred
+    event = PickEvent(
+        type=(
+            PickEventType.CLICK
+            if pb_event.type == client_pb2.PickEventOccurred.Type.CLICK
+            else PickEventType.HOVER
+        ),
+        object=UUID(pb_event.object) if pb_event.object != "" else None,
+        index=pb_event.index if pb_event.object != "" and pb_event.index >= 0 else None,
+        position=Vector3f(pb_event.position) if pb_event.HasField("position") else None,
+        x=pb_event.x,
+        y=pb_event.y,
+        shiftKey=pb_event.shiftKey,
+        altKey=pb_event.altKey,
+        ctrlKey=pb_event.ctrlKey,
+        metaKey=pb_event.metaKey,
+    )
+    handler: Callable[[PickEvent, UUID], None] = self._get_custom_handler(uuid, _EVENT_PICKED)
+
+    if handler is not None:
+        handler(event, uuid)
+
+
+def _handle_points_selected(self: PointCloudViewer, ev_pb: client_pb2.ClientCommand):
+    uuid = UUID(ev_pb.UUID)
+    handler: Callable[[SelectionEvent, UUID], None] = self._get_custom_handler(uuid, _EVENT_SELECTED)
+
+    if handler is not None:
+        handler(_make_selection_event(ev_pb.points_selected), uuid)
+
+
+def _send_data(
+    self: PointCloudViewer,
+    pbobj: server_pb2.ServerCommand,
+    uuid: UUID,
+    compression: Optional[Compression] = None,
+) -> None:
     pbobj.UUID = str(uuid)
-    data = base64.b64encode(pbobj.SerializeToString())
-    self._websocket_broadcasting_queue.put(data.decode())
+    data = _compress_command(self, pbobj, compression)
+    self._websocket_broadcasting_queue.put(data)
@@ -1,7 +1,10 @@
 from __future__ import annotations  # Postponed Evaluation of Annotations
 from typing import TYPE_CHECKING
 import multiprocessing
+from cumo.pointcloudviewer import Compression
 from cumo._internal.server import multiprocessing_worker
+from cumo._internal.object_registry import ObjectRegistry
+from cumo._internal.members.set_compression import COMPRESSION_DEFAULT_MIN_SIZE
 if TYPE_CHECKING:
     from cumo import PointCloudViewer
 
@@ -17,6 +20,15 @@ def __init__(
 ) -> None:
     self._custom_handlers = {}
     self._key_event_handlers = {}
+    self._pointcloud_frames = {}
+    self._spatial_indices = {}
+    self._compression = Compression.NONE
+    self._compression_min_size = COMPRESSION_DEFAULT_MIN_SIZE
+    self._pointcloud_cache = None
+    self._pcd_disk_cache = None
+    self._objects = ObjectRegistry()
+    self._memory_budget = None
+    self._evict_handler = None
     self._websocket_broadcasting_queue = multiprocessing.Queue()
     self._websocket_message_queue = multiprocessing.Queue()
     self._server_process = multiprocessing.Process(
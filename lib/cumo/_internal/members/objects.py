@@ -0,0 +1,66 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Callable, List, Optional
+from uuid import UUID
+from cumo.object_info import ObjectInfo
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+
+def objects(self: PointCloudViewer) -> List[ObjectInfo]:
+    """ブラウザに送信して表示中(非表示にしたものを含む)のオブジェクトの情報を取得する。
+
+    Returns:
+        List[ObjectInfo]: オブジェクトの情報。最後に表示した時刻が古い順に並ぶ
+    """
+    return self._objects.objects()
+
+
+def set_memory_budget(
+    self: PointCloudViewer,
+    max_bytes: Optional[int],
+    on_evict: Optional[Callable[[ObjectInfo], None]] = None,
+) -> None:
+    """ブラウザのGPUメモリ使用量の上限を設定する。
+
+    オブジェクトを追加して ObjectInfo.gpu_bytes の合計が上限を超えた場合は、
+    最後に表示した(追加、更新、set_visible で表示した)時刻が最も古いオブジェクトから削除する。
+
+    Args:
+        max_bytes (Optional[int]): GPUメモリ使用量の見積もりの上限。Noneを指定すると上限を設けない。
+        on_evict (Optional[Callable[[ObjectInfo], None]], optional): オブジェクトを削除したときに呼ばれる関数。
+            set_parent で子にしたため一緒に削除されたオブジェクトについても呼ばれる。
+    """
+    if max_bytes is not None and max_bytes < 0:
+        raise ValueError("max_bytes must not be negative")
+    self._memory_budget = max_bytes
+    self._evict_handler = on_evict
+    _enforce_memory_budget(self, None)
+
+
+def _enforce_memory_budget(self: PointCloudViewer, keep: Optional[UUID]) -> None:
+    """GPUメモリ使用量が上限以下になるまで、最後に表示した時刻が古いオブジェクトを削除する。
+
+    keep と、削除すると keep も一緒に削除されるその祖先は削除しない。
+    """
+    if self._memory_budget is None:
+        return
+    protected = set() if keep is None else {keep, *self._objects.ancestors(keep)}
+    # 一緒に削除された子の情報も on_evict に渡せるように、削除する前の情報を保持しておく
+    snapshot = {info.uuid: info for info in self._objects.objects()}
+    for uuid in snapshot:
+        if self._objects.gpu_bytes() <= self._memory_budget:
+            break
+        if uuid in protected or self._objects.get(uuid) is None:
+            continue
+        for removed_uuid in self.remove_objects([uuid]):
+            removed = snapshot.get(removed_uuid)
+            if removed is not None and self._evict_handler is not None:
+                self._evict_handler(removed)
+
+
+def _record_update(self: PointCloudViewer, uuid: UUID, wire_bytes: int, num_points: Optional[int] = None) -> None:
+    """オブジェクトを更新したことを記録する。点群の場合は更新後の点数を num_points に渡す。"""
+    self._objects.update(uuid, wire_bytes, num_points)
+    if num_points is not None:
+        _enforce_memory_budget(self, uuid)
@@ -0,0 +1,83 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from math import isfinite
+from typing import TYPE_CHECKING, Callable, Optional
+from uuid import UUID, uuid4
+from cumo._internal.protobuf import server_pb2
+from cumo.pick_event import PickEvent
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+_EVENT_PICKED = "picked"
+
+
+def add_pick_handler(
+    self: PointCloudViewer,
+    handler: Callable[[PickEvent, UUID], None],
+    click: bool = True,
+    hover: bool = False,
+    hover_interval: float = 0.05,
+) -> UUID:
+    """ブラウザでオブジェクトをクリックしたとき、またはマウスカーソルを重ねたときに呼ばれるハンドラーを登録する。
+
+    オブジェクトと点の番号を書き込んだ画像をGPUで描画して調べるので、点の数が多くても遅くならない。
+    点群、GPUで描画する線分、箱、形状、Mesh、画像が対象になる。Canvas2Dで描画する線分とオーバーレイは対象にならない。
+
+    Args:
+        handler (Callable[[PickEvent, UUID], None]): 呼ばれるハンドラー
+        click (bool, optional): Trueの場合、クリックしたときにハンドラーを呼ぶ。ドラッグしたときは呼ばない。
+        hover (bool, optional): Trueの場合、マウスカーソルの下のオブジェクトか点が変わったときにハンドラーを呼ぶ。
+        hover_interval (float, optional): マウスカーソルの下を調べる最小の間隔(秒)。
+
+    Returns:
+        UUID: ハンドラーに対応するID。後から操作する際に使う
+    """
+    if not click and not hover:
+        raise ValueError("either click or hover must be True")
+    if hover_interval < 0 or not isfinite(hover_interval):
+        raise ValueError("hover_interval must be finite number zero or greater")
+    obj = server_pb2.ServerCommand()
+    c = server_pb2.SetPickEventHandler(
+        add=server_pb2.SetPickEventHandler.Add(click=click, hover=hover, hover_interval=hover_interval)
+    )
+    obj.set_pick_event_handler.CopyFrom(c)
+    uuid = uuid4()
+    self._send_data(obj, uuid)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+
+    self._set_custom_handler(uuid, _EVENT_PICKED, handler)
+    return uuid
+
+
+def remove_pick_handler(
+    self: PointCloudViewer,
+    uuid: Optional[UUID] = None,
+) -> None:
+    """add_pick_handler で登録したハンドラーを削除する。
+
+    Args:
+        uuid (Optional[UUID], optional): 削除するハンドラのUUID、指定しない場合すべて削除する
+    """
+    if uuid is not None:
+        if self._get_custom_handler(uuid, _EVENT_PICKED) is None:
+            raise KeyError(uuid)
+        self._custom_handlers[_EVENT_PICKED].pop(uuid)
+    else:
+        if _EVENT_PICKED in self._custom_handlers:
+            self._custom_handlers[_EVENT_PICKED].clear()
+    obj = server_pb2.ServerCommand()
+    r = server_pb2.SetPickEventHandler()
+    if uuid is not None:
+        r.remove_by_uuid = str(uuid)
+    else:
+        r.remove_all = True
+    obj.set_pick_event_handler.CopyFrom(r)
+    uuid = uuid4()
+    self._send_data(obj, uuid)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
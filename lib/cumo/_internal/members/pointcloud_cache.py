@@ -0,0 +1,99 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+import os
+from typing import TYPE_CHECKING, Optional
+from cumo.cache_stats import CacheStats
+from cumo._internal.disk_cache import DiskCache
+from cumo._internal.payload_cache import PayloadCache
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+POINTCLOUD_CACHE_DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+PCD_DISK_CACHE_DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+
+def set_pointcloud_cache(
+    self: PointCloudViewer,
+    max_bytes: Optional[int] = POINTCLOUD_CACHE_DEFAULT_MAX_BYTES,
+) -> None:
+    """send_pointcloud でダウンサンプルとシリアライズをした結果をキャッシュする。
+
+    同じ配列を同じ引数で送信し直す場合は、ダウンサンプルとpcdデータの作成が省略される。
+    キャッシュのキーは配列の内容のハッシュ値と引数から作るので、配列の中身を書き換えた場合は別のデータとして扱われる。
+    DownSampleStrategy.RANDOM_SAMPLE でシードを指定していない場合も、キャッシュが有効な間は同じ点が送信される。
+
+    Args:
+        max_bytes (Optional[int], optional): キャッシュするデータの合計バイト数の上限。
+            超えた場合は最も長く使われていないものから破棄する。Noneを指定するとキャッシュを無効にする。
+    """
+    if max_bytes is None:
+        self._pointcloud_cache = None
+        return
+    if max_bytes < 0:
+        raise ValueError("max_bytes must not be negative")
+    self._pointcloud_cache = PayloadCache(max_bytes)
+
+
+def get_pointcloud_cache_stats(self: PointCloudViewer) -> Optional[CacheStats]:
+    """send_pointcloud のキャッシュのヒット数、ミス数、使用バイト数などを取得する。
+
+    Returns:
+        Optional[CacheStats]: キャッシュの利用状況。キャッシュが無効な場合はNone。
+    """
+    if self._pointcloud_cache is None:
+        return None
+    return self._pointcloud_cache.stats()
+
+
+def clear_pointcloud_cache(self: PointCloudViewer) -> None:
+    """send_pointcloud のキャッシュを空にする。ヒット数などの統計は保持される。"""
+    if self._pointcloud_cache is not None:
+        self._pointcloud_cache.clear()
+
+
+def default_pcd_disk_cache_directory() -> str:
+    """pcdファイルのディスクキャッシュのデフォルトのディレクトリ。 $XDG_CACHE_HOME/cumo/pcd を使う。"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "cumo", "pcd")
+
+
+def set_pcd_disk_cache(
+    self: PointCloudViewer,
+    directory: Optional[str] = None,
+    max_bytes: int = PCD_DISK_CACHE_DEFAULT_MAX_BYTES,
+    enabled: bool = True,
+) -> None:
+    """send_pointcloud_pcd_file で読み込んでダウンサンプルした結果を、ブラウザに送信できる形でディスクにキャッシュする。
+
+    キャッシュのキーはファイルのパス、更新時刻、サイズと、ダウンサンプルやチャンク分割(chunk_size, progressive)の引数から作る。
+    2回目以降に同じファイルを同じ引数で送信する場合は、ファイルを読まずにキャッシュをそのまま送信する。
+    キャッシュした点群は progressive の指定によらず一度に送信する。
+
+    Args:
+        directory (Optional[str], optional): キャッシュを置くディレクトリ。指定しない場合は $XDG_CACHE_HOME/cumo/pcd を使う。
+        max_bytes (int, optional): キャッシュの合計バイト数の上限。超えた場合は最も長く使われていないものから削除する。
+        enabled (bool, optional): Falseを指定するとキャッシュを無効にする。ディスク上のキャッシュは削除されない。
+    """
+    if not enabled:
+        self._pcd_disk_cache = None
+        return
+    if max_bytes < 0:
+        raise ValueError("max_bytes must not be negative")
+    self._pcd_disk_cache = DiskCache(directory or default_pcd_disk_cache_directory(), max_bytes)
+
+
+def get_pcd_disk_cache_stats(self: PointCloudViewer) -> Optional[CacheStats]:
+    """send_pointcloud_pcd_file のディスクキャッシュのヒット数、ミス数、使用バイト数などを取得する。
+
+    Returns:
+        Optional[CacheStats]: キャッシュの利用状況。キャッシュが無効な場合はNone。
+    """
+    if self._pcd_disk_cache is None:
+        return None
+    return self._pcd_disk_cache.stats()
+
+
+def clear_pcd_disk_cache(self: PointCloudViewer) -> None:
+    """send_pointcloud_pcd_file のディスクキャッシュのファイルを全て削除する。"""
+    if self._pcd_disk_cache is not None:
+        self._pcd_disk_cache.clear()
@@ -1,7 +1,8 @@
 from __future__ import annotations  # Postponed Evaluation of Annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List, Sequence, Union
 from uuid import UUID, uuid4
 from cumo._internal.protobuf import server_pb2
+from cumo._internal.members.set_visible import _make_object_selector
 if TYPE_CHECKING:
     from cumo import PointCloudViewer
 
@@ -24,6 +25,9 @@ def remove_all_objects(
     ret = self._wait_until(uuid)
     if ret.result.HasField("failure"):
         raise RuntimeError(ret.result.failure)
+    self._pointcloud_frames.clear()
+    self._spatial_indices.clear()
+    self._objects.clear()
 
 
 def remove_object(
@@ -37,6 +41,8 @@ def remove_object(
     """
     remove_object_cmd = server_pb2.RemoveObject()
     remove_object_cmd.by_uuid = str(uuid)
+    self._pointcloud_frames.pop(uuid, None)
+    self._spatial_indices.pop(uuid, None)
 
     obj = server_pb2.ServerCommand()
     obj.remove_object.CopyFrom(remove_object_cmd)
@@ -46,3 +52,44 @@ def remove_object(
     ret = self._wait_until(uuid)
     if ret.result.HasField("failure"):
         raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    _forget_removed(self, ret.result.success)
+
+
+def remove_objects(
+    self: PointCloudViewer,
+    target: Union[str, Sequence[UUID]],
+) -> List[UUID]:
+    """複数のオブジェクトをまとめて削除する。
+
+    Args:
+        target (Union[str, Sequence[UUID]]): 削除するオブジェクトのIDのリスト、または send_* の tags で付けたタグ。
+
+    Returns:
+        List[UUID]: 削除したオブジェクトのID。set_parent で子にしたため一緒に削除されたオブジェクトも含む
+    """
+    remove_object_cmd = server_pb2.RemoveObject()
+    remove_object_cmd.objects.CopyFrom(_make_object_selector(target))
+
+    obj = server_pb2.ServerCommand()
+    obj.remove_object.CopyFrom(remove_object_cmd)
+
+    uuid = uuid4()
+    self._send_data(obj, uuid)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    return _forget_removed(self, ret.result.success)
+
+
+def _forget_removed(self: PointCloudViewer, removed_uuids: str) -> List[UUID]:
+    """クライアントが返した削除済みのオブジェクトのUUID(カンマ区切り)を、Python側の管理から取り除く。"""
+    removed = [UUID(hex=removed_hex) for removed_hex in removed_uuids.split(",") if removed_hex != ""]
+    for removed_uuid in removed:
+        self._pointcloud_frames.pop(removed_uuid, None)
+        self._spatial_indices.pop(removed_uuid, None)
+    self._objects.remove(removed)
+    return removed
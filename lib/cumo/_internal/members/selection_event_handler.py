@@ -0,0 +1,116 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Callable, Optional, Sequence, Union
+from uuid import UUID, uuid4
+
+import numpy
+
+from cumo._internal.protobuf import client_pb2, server_pb2
+from cumo._internal.members.set_visible import _make_object_selector
+from cumo.pointcloudviewer import SelectionTool
+from cumo.selection_event import PointSelection, SelectionEvent
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+_EVENT_SELECTED = "selected"
+
+_TOOLS = {
+    SelectionTool.BOX: server_pb2.SetSelectionEventHandler.Add.Tool.BOX,
+    SelectionTool.LASSO: server_pb2.SetSelectionEventHandler.Add.Tool.LASSO,
+    SelectionTool.POLYGON: server_pb2.SetSelectionEventHandler.Add.Tool.POLYGON,
+}
+
+
+def add_selection_handler(
+    self: PointCloudViewer,
+    handler: Callable[[SelectionEvent, UUID], None],
+    tool: SelectionTool = SelectionTool.LASSO,
+    targets: Optional[Union[UUID, str, Sequence[UUID]]] = None,
+) -> UUID:
+    """ブラウザで範囲を選択したときに呼ばれるハンドラーを登録する。
+
+    登録している間は、マウスの左ボタンでカメラを回転する代わりに tool の方法で範囲を描く。
+    Escで描いている範囲を取り消す。登録できるハンドラーは1つまで。
+    範囲の内側に投影される点は、手前の点に隠れているものも含めてブラウザのGPUで求めてビットマスクで受け取るので、
+    点の数が多くても速い。
+
+    Args:
+        handler (Callable[[SelectionEvent, UUID], None]): 範囲を選択したときに呼ばれるハンドラー
+        tool (SelectionTool, optional): 範囲の描き方
+        targets (Optional[Union[UUID, str, Sequence[UUID]]], optional): 選択の対象にする点群のID、そのリスト、
+            または send_* の tags で付けたタグ。指定しない場合は表示中のすべての点群。
+
+    Returns:
+        UUID: ハンドラーに対応するID。後から操作する際に使う
+    """
+    add = server_pb2.SetSelectionEventHandler.Add(tool=_TOOLS[tool])
+    if targets is not None:
+        add.targets.CopyFrom(_make_object_selector(targets))
+    obj = server_pb2.ServerCommand()
+    obj.set_selection_event_handler.CopyFrom(server_pb2.SetSelectionEventHandler(add=add))
+    uuid = uuid4()
+    self._send_data(obj, uuid)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+
+    self._set_custom_handler(uuid, _EVENT_SELECTED, handler)
+    return uuid
+
+
+def remove_selection_handler(
+    self: PointCloudViewer,
+    uuid: Optional[UUID] = None,
+) -> None:
+    """add_selection_handler で登録したハンドラーを削除し、マウスの左ボタンでカメラを回転するように戻す。
+
+    Args:
+        uuid (Optional[UUID], optional): 削除するハンドラのUUID、指定しない場合すべて削除する
+    """
+    if uuid is not None:
+        if self._get_custom_handler(uuid, _EVENT_SELECTED) is None:
+            raise KeyError(uuid)
+        self._custom_handlers[_EVENT_SELECTED].pop(uuid)
+    else:
+        if _EVENT_SELECTED in self._custom_handlers:
+            self._custom_handlers[_EVENT_SELECTED].clear()
+    obj = server_pb2.ServerCommand()
+    r = server_pb2.SetSelectionEventHandler()
+    if uuid is not None:
+        r.remove_by_uuid = str(uuid)
+    else:
+        r.remove_all = True
+    obj.set_selection_event_handler.CopyFrom(r)
+    uuid = uuid4()
+    self._send_data(obj, uuid)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+
+
+def _decode_selection(pb_selection: client_pb2.PointsSelected.Selection) -> PointSelection:
+    """ビットマスクまたは連続する範囲の並びで送られた選択を bool の ndarray にする。"""
+    num_points = pb_selection.num_points
+    if pb_selection.HasField("bitmask"):
+        bits = numpy.frombuffer(pb_selection.bitmask, dtype=numpy.uint8)
+        mask = numpy.unpackbits(bits, count=num_points, bitorder="little").astype(bool)
+    else:
+        runs = numpy.frombuffer(pb_selection.runs, dtype="<u4").reshape(-1, 2).astype(numpy.int64)
+        # 範囲の開始で+1、終了で-1した累積和が正の点が選択されている
+        edges = numpy.zeros(num_points + 1, dtype=numpy.int64)
+        numpy.add.at(edges, runs[:, 0], 1)
+        numpy.add.at(edges, runs[:, 0] + runs[:, 1], -1)
+        mask = numpy.cumsum(edges[:-1]) > 0
+    return PointSelection(object=UUID(pb_selection.object), mask=mask)
+
+
+def _make_selection_event(pb_selected: client_pb2.PointsSelected) -> SelectionEvent:
+    return SelectionEvent(
+        selections=[_decode_selection(s) for s in pb_selected.selections],
+        shiftKey=pb_selected.shiftKey,
+        altKey=pb_selected.altKey,
+        ctrlKey=pb_selected.ctrlKey,
+        metaKey=pb_selected.metaKey,
+    )
@@ -0,0 +1,76 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Optional, Sequence
+from uuid import UUID
+import numpy
+from cumo._internal.protobuf import server_pb2
+from cumo._internal.members.send_object import _send_add_object
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+
+def send_boxes(
+    self: PointCloudViewer,
+    centers: numpy.ndarray,
+    sizes: numpy.ndarray,
+    yaws: Optional[numpy.ndarray] = None,
+    rotations: Optional[numpy.ndarray] = None,
+    colors: Optional[numpy.ndarray] = None,
+    labels: Optional[Sequence[str]] = None,
+    line_width: float = 2.0,
+    tags: Sequence[str] = (),
+) -> UUID:
+    """直方体の枠の集まりをブラウザに送信し、表示させる。全ての箱がまとめて1回の描画命令で描画される。
+
+    Args:
+        centers (numpy.ndarray): shape が (num_boxes,3) で dtype が float32 の ndarray 。各行が箱の中心のx,y,z座標を表す。
+        sizes (numpy.ndarray): shape が (num_boxes,3) で dtype が float32 の ndarray 。各行が箱のx,y,z方向の長さを表す。
+        yaws (Optional[numpy.ndarray], optional): shape が (num_boxes,) で dtype が float32 の ndarray 。
+            各要素が箱のz軸周りの回転角(ラジアン)を表す。
+        rotations (Optional[numpy.ndarray], optional): shape が (num_boxes,4) で dtype が float32 の ndarray 。
+            各行が箱の回転を表すクォータニオンのx,y,z,wを表す。yaws と同時には指定できない。
+        colors (Optional[numpy.ndarray], optional): shape が (num_boxes,3) で dtype が uint8 の ndarray 。各行が箱のr,g,bを表す。
+            指定しない場合は白になる。
+        labels (Optional[Sequence[str]], optional): 各箱の上面に表示する文字列。空文字列の箱には表示しない。
+        line_width (float, optional): 枠の線の太さ(ピクセル)
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
+    Returns:
+        UUID: 表示した箱の集まりに対応するID。後から操作する際に使う
+    """
+    if not (len(centers.shape) == 2 and centers.shape[1] == 3 and centers.dtype == "float32"):
+        raise ValueError("centers must be float32 array of shape (num_boxes,3)")
+    num_boxes = centers.shape[0]
+    if not (sizes.shape == (num_boxes, 3) and sizes.dtype == "float32"):
+        raise ValueError("sizes must be float32 array of shape (num_boxes,3)")
+    if yaws is not None and rotations is not None:
+        raise ValueError("yaws and rotations cannot be specified at the same time")
+    if yaws is not None and not (yaws.shape == (num_boxes,) and yaws.dtype == "float32"):
+        raise ValueError("yaws must be float32 array of shape (num_boxes,)")
+    if rotations is not None and not (rotations.shape == (num_boxes, 4) and rotations.dtype == "float32"):
+        raise ValueError("rotations must be float32 array of shape (num_boxes,4)")
+    if colors is not None and not (colors.shape == (num_boxes, 3) and colors.dtype == "uint8"):
+        raise ValueError("colors must be uint8 array of shape (num_boxes,3)")
+    if labels is not None and len(labels) != num_boxes:
+        raise ValueError("length of labels must be num_boxes")
+
+    if rotations is None:
+        rotations = numpy.zeros((num_boxes, 4), dtype=numpy.float32)
+        rotations[:, 3] = 1
+        if yaws is not None:
+            rotations[:, 2] = numpy.sin(yaws / 2)
+            rotations[:, 3] = numpy.cos(yaws / 2)
+
+    pb_boxes = server_pb2.AddObject.Boxes()
+    pb_boxes.centers = centers.astype("<f4").tobytes()
+    pb_boxes.sizes = sizes.astype("<f4").tobytes()
+    pb_boxes.rotations = rotations.astype("<f4").tobytes()
+    if colors is not None:
+        pb_boxes.colors = colors.tobytes()
+    if labels is not None:
+        pb_boxes.labels.extend(labels)
+    pb_boxes.line_width = line_width
+    add_obj = server_pb2.AddObject()
+    add_obj.boxes.CopyFrom(pb_boxes)
+    return _send_add_object(self, add_obj, tags)
@@ -0,0 +1,91 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Optional, Sequence
+from uuid import UUID
+import numpy
+from cumo.pointcloudviewer import GlyphShape
+from cumo._internal.protobuf import server_pb2
+from cumo._internal.members.send_object import _send_add_object
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+
+def send_glyphs(
+    self: PointCloudViewer,
+    shape: GlyphShape,
+    positions: numpy.ndarray,
+    scales: Optional[numpy.ndarray] = None,
+    rotations: Optional[numpy.ndarray] = None,
+    directions: Optional[numpy.ndarray] = None,
+    colors: Optional[numpy.ndarray] = None,
+    tags: Sequence[str] = (),
+) -> UUID:
+    """同じ形状を位置、大きさ、向き、色を変えて多数表示する。全ての形状がまとめて1回の描画命令で描画される。
+
+    Args:
+        shape (GlyphShape): 表示する形状
+        positions (numpy.ndarray): shape が (num_glyphs,3) で dtype が float32 の ndarray 。各行が形状を置くx,y,z座標を表す。
+        scales (Optional[numpy.ndarray], optional):
+            shape が (num_glyphs,) または (num_glyphs,3) で dtype が float32 の ndarray 。
+            各要素が形状の大きさ、または各行がx,y,z方向の大きさを表す。指定しない場合は1になる。
+        rotations (Optional[numpy.ndarray], optional): shape が (num_glyphs,4) で dtype が float32 の ndarray 。
+            各行が形状の回転を表すクォータニオンのx,y,z,wを表す。
+        directions (Optional[numpy.ndarray], optional): shape が (num_glyphs,3) で dtype が float32 の ndarray 。
+            各行が形状の+x方向を向ける先のベクトルを表し、x方向の大きさにはベクトルの長さが掛けられる。
+            速度ベクトルを矢印で表示する場合などに使う。rotations と同時には指定できない。
+        colors (Optional[numpy.ndarray], optional): shape が (num_glyphs,3) で dtype が uint8 の ndarray 。各行が形状のr,g,bを表す。
+            指定しない場合は白になる。
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
+    Returns:
+        UUID: 表示した形状の集まりに対応するID。後から操作する際に使う
+    """
+    if not (len(positions.shape) == 2 and positions.shape[1] == 3 and positions.dtype == "float32"):
+        raise ValueError("positions must be float32 array of shape (num_glyphs,3)")
+    num_glyphs = positions.shape[0]
+    if scales is not None and not (scales.shape in ((num_glyphs,), (num_glyphs, 3)) and scales.dtype == "float32"):
+        raise ValueError("scales must be float32 array of shape (num_glyphs,) or (num_glyphs,3)")
+    if rotations is not None and directions is not None:
+        raise ValueError("rotations and directions cannot be specified at the same time")
+    if rotations is not None and not (rotations.shape == (num_glyphs, 4) and rotations.dtype == "float32"):
+        raise ValueError("rotations must be float32 array of shape (num_glyphs,4)")
+    if directions is not None and not (directions.shape == (num_glyphs, 3) and directions.dtype == "float32"):
+        raise ValueError("directions must be float32 array of shape (num_glyphs,3)")
+    if colors is not None and not (colors.shape == (num_glyphs, 3) and colors.dtype == "uint8"):
+        raise ValueError("colors must be uint8 array of shape (num_glyphs,3)")
+
+    xyz_scales = numpy.ones((num_glyphs, 3), dtype=numpy.float32)
+    if scales is not None:
+        xyz_scales *= scales.reshape(num_glyphs, -1)
+    if directions is not None:
+        lengths = numpy.linalg.norm(directions, axis=1)
+        xyz_scales[:, 0] *= lengths
+        rotations = _rotations_from_x_axis(directions, lengths)
+    if rotations is None:
+        rotations = numpy.zeros((num_glyphs, 4), dtype=numpy.float32)
+        rotations[:, 3] = 1
+
+    pb_glyphs = server_pb2.AddObject.Glyphs()
+    pb_glyphs.shape = server_pb2.AddObject.Glyphs.Shape.Value(shape.name)
+    pb_glyphs.positions = positions.astype("<f4").tobytes()
+    pb_glyphs.scales = xyz_scales.astype("<f4").tobytes()
+    pb_glyphs.rotations = rotations.astype("<f4").tobytes()
+    if colors is not None:
+        pb_glyphs.colors = colors.tobytes()
+    add_obj = server_pb2.AddObject()
+    add_obj.glyphs.CopyFrom(pb_glyphs)
+    return _send_add_object(self, add_obj, tags)
+
+
+def _rotations_from_x_axis(directions: numpy.ndarray, lengths: numpy.ndarray) -> numpy.ndarray:
+    """+x方向を directions の各行の方向に向ける回転を、クォータニオン(x,y,z,w)で返す。"""
+    d = directions / numpy.maximum(lengths, numpy.finfo(numpy.float32).tiny)[:, None]
+    # (1,0,0) と d の外積を回転軸とし、半角のクォータニオンを正規化して求める
+    q = numpy.column_stack((numpy.zeros_like(d[:, 0]), -d[:, 2], d[:, 1], 1 + d[:, 0]))
+    norm = numpy.linalg.norm(q, axis=1)
+    # -x方向を向く場合は回転軸が定まらないので、z軸周りに半回転する
+    opposite = norm < 1e-6
+    q[opposite] = (0, 0, 1, 0)
+    norm[opposite] = 1
+    return (q / norm[:, None]).astype(numpy.float32)
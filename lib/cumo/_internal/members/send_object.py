@@ -1,6 +1,9 @@
 from __future__ import annotations  # Postponed Evaluation of Annotations
 import io
-from typing import TYPE_CHECKING, Optional, Tuple
+import mmap
+import os
+import struct
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 from uuid import UUID, uuid4
 import html
 import numpy
@@ -8,14 +11,25 @@ from PIL import Image
 from numpy import ndarray
 from cumo._vendor.pypcd import pypcd
 # from pypcd import pypcd
-from cumo.pointcloudviewer import DownSampleStrategy
+from cumo.pointcloudviewer import Colormap, Compression, DownSampleStrategy, LinesetRenderer
 from cumo._internal.protobuf import server_pb2
-from cumo._internal.down_sample import down_sample_pointcloud
+from cumo._internal.down_sample import (
+    down_sample_chunks,
+    down_sample_pointcloud,
+    hash_sample_indices,
+    random_sample_indices,
+)
+from cumo._internal.quantize import dequantize_positions, quantize_positions, spatial_order
+from cumo._internal.spatial_index import SpatialIndex
+from cumo._internal.payload_cache import fingerprint
+from cumo._internal.members.set_compression import _resolve_compression
+from cumo._internal.members.objects import _enforce_memory_budget, _record_update
 
 if TYPE_CHECKING:
     from cumo import PointCloudViewer
 
 DOWNSAMPLING_DEFAULT_MAX_NUM_POINTS = 1_000_000
+PCD_DEFAULT_CHUNK_SIZE = 1_000_000
 
 # pylint: disable=no-member
 
@@ -25,7 +39,10 @@ def send_pointcloud_pcd(
     pcd_bytes: bytes,
     down_sample: DownSampleStrategy = DownSampleStrategy.RANDOM_SAMPLE,
     max_num_points: int = DOWNSAMPLING_DEFAULT_MAX_NUM_POINTS,
-    point_size: float = 1
+    point_size: float = 1,
+    compression: Optional[Compression] = None,
+    chunk_size: Optional[int] = None,
+    tags: Sequence[str] = (),
 ) -> UUID:
     """点群をブラウザに送信し、表示させる。
 
@@ -35,47 +52,277 @@ def send_pointcloud_pcd(
             DownSampleStrategy.NONEを指定すると渡されたデータをそのまま送信する。
         max_num_points (int, optional): ダウンサンプルを行う場合、点数をこの数字以下に削減する。
         point_size (int, optional): 点のサイズ。
+        compression (Optional[Compression], optional): 送信するデータの圧縮方法。指定しない場合は set_compression の設定に従う。
+            ダウンサンプルが行われない場合、Compression.LZF ではpcdデータをそのまま送信する。
+        chunk_size (Optional[int], optional): 指定すると、点群をこの点数ずつに分けてダウンサンプルと送信を行う。
+            ブラウザでは受信した部分から順に表示される。
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
     Returns:
         UUID: 表示した点群に対応するID。後から操作する際に使う
     """
-
-    if down_sample == DownSampleStrategy.NONE:
-        cloud = server_pb2.AddObject.PointCloud()
+    if chunk_size is not None:
+        (uuid, _) = _send_pointcloud_pcd_chunks(
+            self, io.BytesIO(pcd_bytes), down_sample, max_num_points, point_size, compression, tags, chunk_size)
+        return uuid
+
+    # ヘッダのみを見て、ダウンサンプルが不要ならpcdデータをそのまま送信する
+    (metadata, offset) = pypcd.read_header(pcd_bytes)
+    cloud = server_pb2.AddObject.PointCloud()
+    cloud.point_size = point_size
+    if down_sample == DownSampleStrategy.NONE or metadata["points"] <= max_num_points:
         cloud.pcd_data = pcd_bytes
-        cloud.point_size = point_size
+        return _send_pcd(self, cloud, compression, tags)
+
+    if down_sample in (DownSampleStrategy.RANDOM_SAMPLE, DownSampleStrategy.HASH_SAMPLE):
+        # 構造化配列のまま間引くので、コピーされるのは選ばれた点のみ。rgb以外のフィールドもそのまま残る
+        pc_data: numpy.ndarray
+        if metadata["data"] == "binary":
+            pc_data = numpy.frombuffer(
+                pcd_bytes, dtype=pypcd._build_dtype(metadata), count=metadata["points"], offset=offset)
+        else:
+            pc_data = pypcd.point_cloud_from_buffer(pcd_bytes).pc_data
+        if down_sample == DownSampleStrategy.RANDOM_SAMPLE:
+            indices = random_sample_indices(metadata["points"], max_num_points, down_sample.seed)
+        else:
+            xyz = numpy.stack([pc_data["x"], pc_data["y"], pc_data["z"]], axis=1)
+            indices = hash_sample_indices(xyz, max_num_points, down_sample.seed)
+        pc_data = pc_data[indices]
+        if len(pc_data) == 0:
+            cloud = _make_pcd_cloud(self, numpy.zeros((0, 3), dtype=numpy.float32), point_size, compression)
+            return _send_pcd(self, cloud, compression, tags)
+        metadata.update({"points": len(pc_data), "width": len(pc_data), "height": 1, "data": "binary"})
+        pcd = pypcd.PointCloud(metadata, pc_data)
+        cloud.pcd_data = _save_pcd(pcd, _resolve_compression(self, compression, pc_data.nbytes))
+        return _send_pcd(self, cloud, compression, tags)
+
+    # 各フィールドはpcd_bytesを指すビューなので、コピーされるのは下のstackのみ
+    _, fields = pypcd.pc_fields_from_buffer(pcd_bytes)
+    (xyz, rgb) = _pcd_fields_to_xyz_rgb(fields)
+
+    return self.send_pointcloud(
+        xyz=xyz, rgb=rgb, down_sample=down_sample, max_num_points=max_num_points, point_size=point_size,
+        compression=compression, tags=tags)
+
+
+def send_pointcloud_pcd_file(
+    self: PointCloudViewer,
+    path: str,
+    down_sample: DownSampleStrategy = DownSampleStrategy.RANDOM_SAMPLE,
+    max_num_points: int = DOWNSAMPLING_DEFAULT_MAX_NUM_POINTS,
+    point_size: float = 1,
+    compression: Optional[Compression] = None,
+    chunk_size: int = PCD_DEFAULT_CHUNK_SIZE,
+    progressive: bool = True,
+    tags: Sequence[str] = (),
+) -> UUID:
+    """pcdファイルの点群をブラウザに送信し、表示させる。
+
+    ファイルは chunk_size 点ずつ読み込まれるので、メモリに収まらない大きさのファイルも送信できる。
+    ただし binary 以外の形式(binary_compressed と ascii)は分割して読めないので、
+    ファイルはメモリにマップされるものの点群全体が展開され、展開後の点群がメモリに収まる必要がある。
+
+    Args:
+        path (str): pcdファイルのパス。
+        down_sample (DownSampleStrategy, optional): DownSampleStrategy.NONE以外を指定すると一定以上の大きさの点群をダウンサンプルする。
+        max_num_points (int, optional): ダウンサンプルを行う場合、点数をこの数字以下に削減する。
+        point_size (int, optional): 点のサイズ。
+        compression (Optional[Compression], optional): 送信するデータの圧縮方法。指定しない場合は set_compression の設定に従う。
+        chunk_size (int, optional): 一度に読み込み、送信する点数。
+        progressive (bool, optional): Trueの場合、チャンクごとにダウンサンプルして送信し、ブラウザでは受信した部分から順に表示される。
+            Falseの場合、ファイル全体からダウンサンプルした点群を一度に送信する。
+            set_pcd_disk_cache でキャッシュされた点群を使う場合は、ダウンサンプル済みの点群を常に一度に送信する。
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
+    Returns:
+        UUID: 表示した点群に対応するID。後から操作する際に使う
+    """
+    cache_key: Optional[bytes] = None
+    if self._pcd_disk_cache is not None:
+        stat = os.stat(path)
+        cache_key = fingerprint([], [
+            os.path.abspath(path), stat.st_mtime_ns, stat.st_size,
+            down_sample.name, down_sample.voxel_size, down_sample.min_distance, down_sample.seed,
+            down_sample.num_workers, max_num_points, chunk_size, progressive,
+            compression if compression is not None else self._compression, self._compression_min_size,
+        ])
+        payload = self._pcd_disk_cache.get(cache_key)
+        if payload is not None:
+            # point_size とタグは呼び出しごとに異なり、送信した物体の管理にも点群のメッセージを使うので、パースしてから送信する。
+            # パースはpcdデータのバイト列をコピーするのみで、pcdの展開やダウンサンプルは行わない
+            cloud = server_pb2.AddObject.PointCloud.FromString(payload)
+            cloud.point_size = point_size
+            return _send_pcd(self, cloud, compression, tags)
+
+    with open(path, "rb") as f:
+        (uuid, columns) = _send_pointcloud_pcd_chunks(
+            self, f, down_sample, max_num_points, point_size, compression, tags, chunk_size, progressive)
+    if self._pcd_disk_cache is not None and cache_key is not None:
+        self._pcd_disk_cache.put(
+            cache_key, _make_pcd_cloud(self, columns, point_size, compression).SerializeToString())
+    return uuid
+
+
+def _send_pointcloud_pcd_chunks(
+    self: PointCloudViewer,
+    f: BinaryIO,
+    down_sample: DownSampleStrategy,
+    max_num_points: int,
+    point_size: float,
+    compression: Optional[Compression],
+    tags: Sequence[str],
+    chunk_size: int,
+    progressive: bool = True,
+) -> Tuple[UUID, numpy.ndarray]:
+    """pcdデータをチャンクごとに読んで送信する。送信した点群のIDと、送信した点の列(xyzとrgb)を返す。"""
+    if not chunk_size > 0:
+        raise ValueError("chunk_size must be positive")
+
+    metadata = pypcd.read_header_from_fileobj(f)
+    num_points: int = metadata["points"]
+    has_rgb = "rgb" in metadata["fields"]
+    chunks: Iterable[Mapping[str, numpy.ndarray]]
+    if metadata["data"] == "binary":
+        chunks = (
+            {name: chunk[name] for name in chunk.dtype.names}
+            for chunk in pypcd.iter_binary_pc_data_chunks(f, pypcd._build_dtype(metadata), metadata, chunk_size)
+        )
+    else:
+        # 圧縮されたデータは分割して読めないので、全体を展開してから分割する。
+        # ファイルはメモリにマップして、展開前のデータを読み込んだ分のメモリは使わないようにする
+        _, fields = pypcd.pc_fields_from_buffer(_map_file(f))
+        chunks = (
+            {name: values[i:i + chunk_size] for (name, values) in fields.items()}
+            for i in range(0, num_points, chunk_size)
+        )
+    column_chunks = (_pcd_fields_to_columns(chunk, has_rgb) for chunk in chunks)
+
+    if num_points == 0:
+        columns = numpy.zeros((0, 4 if has_rgb else 3), dtype=numpy.float32)
+        cloud = _make_pcd_cloud(self, columns, point_size, compression)
+        return (_send_pcd(self, cloud, compression, tags), columns)
+
+    if not progressive:
+        # チャンクを読みながらリザーバーサンプリングするので、保持されるのは max_num_points 点とチャンク1つ分のみ
+        columns = down_sample_chunks(column_chunks, down_sample, max_num_points)
+        cloud = _make_pcd_cloud(self, columns, point_size, compression)
+        return (_send_pcd(self, cloud, compression, tags), columns)
+
+    uuid: Optional[UUID] = None
+    sent: List[numpy.ndarray] = []
+    num_read = 0
+    for chunk in column_chunks:
+        # 点群全体で max_num_points 点以下になるように、各チャンクの点数に比例して割り当てる。
+        # 割り当ては読み込んだ点数の累積から求めるので、端数は後のチャンクに繰り越される
+        quota = max_num_points * (num_read + chunk.shape[0]) // num_points - max_num_points * num_read // num_points
+        num_read += chunk.shape[0]
+        down_sampled = down_sample_pointcloud(chunk, down_sample, max_num_points=quota)
+        if down_sampled.shape[0] == 0:
+            # 割り当てが0点のチャンクは送らない。最初の点群は点が選ばれたチャンクから作る
+            continue
+        sent.append(down_sampled)
+        if uuid is None:
+            uuid = _send_pcd(self, _make_pcd_cloud(self, down_sampled, point_size, compression), compression, tags)
+            continue
+        if has_rgb:
+            rgb = _unpack_rgb(down_sampled[:, 3])
+        else:
+            rgb = numpy.full((down_sampled.shape[0], 3), 255, dtype=numpy.uint8)
+        _append_pointcloud(self, uuid, down_sampled[:, :3], rgb, compression)
+
+    if uuid is None:
+        # どのチャンクからも点が選ばれなかった場合は空の点群を送る
+        columns = numpy.zeros((0, 4 if has_rgb else 3), dtype=numpy.float32)
+        cloud = _make_pcd_cloud(self, columns, point_size, compression)
+        return (_send_pcd(self, cloud, compression, tags), columns)
+    return (uuid, numpy.concatenate(sent))
+
+
+def _map_file(f: BinaryIO) -> Union[bytes, mmap.mmap]:
+    """ファイルの内容を読み込まずに参照できるバッファを返す。"""
+    if isinstance(f, io.BytesIO):
+        # 既にメモリ上にあるので、そのまま使う
+        return f.getvalue()
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _make_pcd_cloud(
+    self: PointCloudViewer, columns: numpy.ndarray, point_size: float, compression: Optional[Compression]
+) -> server_pb2.AddObject.PointCloud:
+    """xyz(とrgb)の列からpcdデータの点群を作る。"""
+    cloud = server_pb2.AddObject.PointCloud()
+    cloud.point_size = point_size
+    if columns.shape[0] == 0:
+        # pcdは0点の点群を表せないので、空の量子化された座標として送る
+        cloud.quantized_positions.CopyFrom(quantize_positions(columns[:, :3], 1.0))
+        return cloud
+    pcd: pypcd.PointCloud
+    if columns.shape[1] == 4:
+        pcd = pypcd.make_xyz_rgb_point_cloud(columns)
+    else:
+        pcd = pypcd.make_xyz_point_cloud(columns)
+    cloud.pcd_data = _save_pcd(pcd, _resolve_compression(self, compression, pcd.pc_data.nbytes))
+    return cloud
+
+
+def _unpack_rgb(rgb_f32: numpy.ndarray) -> numpy.ndarray:
+    packed = numpy.ascontiguousarray(rgb_f32).view("uint32")
+    return numpy.column_stack((packed >> 16, packed >> 8, packed)).astype("uint8")
+
+
+def _append_pointcloud(
+    self: PointCloudViewer,
+    uuid: UUID,
+    xyz: numpy.ndarray,
+    rgb: numpy.ndarray,
+    compression: Optional[Compression],
+) -> None:
+    cloud = server_pb2.UpdateObject.PointCloud()
+    cloud.add_positions = xyz.astype("<f4").tobytes()
+    cloud.add_colors = rgb.tobytes()
 
-        add_obj = server_pb2.AddObject()
-        add_obj.point_cloud.CopyFrom(cloud)
+    update_obj = server_pb2.UpdateObject()
+    update_obj.target = str(uuid)
+    update_obj.point_cloud.CopyFrom(cloud)
 
-        obj = server_pb2.ServerCommand()
-        obj.add_object.CopyFrom(add_obj)
+    obj = server_pb2.ServerCommand()
+    obj.update_object.CopyFrom(update_obj)
 
-        uuid = uuid4()
-        self._send_data(obj, uuid)
-        ret = self._wait_until(uuid)
-        if ret.result.HasField("failure"):
-            raise RuntimeError(ret.result.failure)
-        if not ret.result.HasField("success"):
-            raise RuntimeError("unexpected response")
-        return UUID(hex=ret.result.success)
+    command_uuid = uuid4()
+    self._send_data(obj, command_uuid, compression)
+    ret = self._wait_until(command_uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    info = self._objects.get(uuid)
+    if info is not None:
+        _record_update(self, uuid, obj.ByteSize(), num_points=info.num_elements + xyz.shape[0])
 
-    pypcd_pc = pypcd.point_cloud_from_buffer(pcd_bytes)
-    pc_data: numpy.ndarray = pypcd_pc.pc_data
 
-    xyz = numpy.stack([pc_data["x"], pc_data["y"], pc_data["z"]], axis=1)
+def _pcd_fields_to_columns(fields: Mapping[str, numpy.ndarray], has_rgb: bool) -> numpy.ndarray:
+    xyz = numpy.stack([fields["x"], fields["y"], fields["z"]], axis=1).astype(numpy.float32, copy=False)
+    if not has_rgb:
+        return xyz
+    # rgbはビット列をそのままfloat32として扱う
+    return numpy.column_stack((xyz, fields["rgb"].view(numpy.float32)))
 
-    rgb_u32: numpy.ndarray = pc_data["rgb"]
+
+def _pcd_fields_to_xyz_rgb(
+    fields: Mapping[str, numpy.ndarray]
+) -> Tuple[numpy.ndarray, Optional[numpy.ndarray]]:
+    xyz = numpy.stack([fields["x"], fields["y"], fields["z"]], axis=1).astype(numpy.float32, copy=False)
+    if "rgb" not in fields:
+        return (xyz, None)
+
+    rgb_u32: numpy.ndarray = fields["rgb"]
     rgb_u32 = rgb_u32.view("uint32")
     r_u8: numpy.ndarray = ((rgb_u32 & 0xff0000) >> 16).astype("uint8")
     g_u8: numpy.ndarray = ((rgb_u32 & 0x00ff00) >> 8).astype("uint8")
     b_u8: numpy.ndarray = (rgb_u32 & 0x0000ff).astype("uint8")
 
-    rgb = numpy.stack([r_u8, g_u8, b_u8], axis=1)
-
-    return self.send_pointcloud(
-        xyz=xyz, rgb=rgb, down_sample=down_sample, max_num_points=max_num_points, point_size=point_size)
+    return (xyz, numpy.stack([r_u8, g_u8, b_u8], axis=1))
 
 
+# pylint: disable=too-many-branches,too-many-statements
 def send_pointcloud(
     self: PointCloudViewer,
     xyz: Optional[numpy.ndarray] = None,
@@ -83,7 +330,17 @@ def send_pointcloud(
     xyzrgb: Optional[numpy.ndarray] = None,
     down_sample: DownSampleStrategy = DownSampleStrategy.RANDOM_SAMPLE,
     max_num_points: int = DOWNSAMPLING_DEFAULT_MAX_NUM_POINTS,
-    point_size: float = 1
+    point_size: float = 1,
+    scalars: Optional[Dict[str, numpy.ndarray]] = None,
+    color_by: Optional[str] = None,
+    colormap: Colormap = Colormap.VIRIDIS,
+    scalar_range: Optional[Tuple[float, float]] = None,
+    labels: Optional[numpy.ndarray] = None,
+    palette: Optional[numpy.ndarray] = None,
+    position_precision: Optional[float] = None,
+    compression: Optional[Compression] = None,
+    tags: Sequence[str] = (),
+    spatial_index: bool = False,
 ) -> UUID:
     """点群をブラウザに送信し、表示させる。
 
@@ -95,6 +352,25 @@ def send_pointcloud(
         down_sample (DownSampleStrategy, optional): DownSampleStrategy.NONE以外を指定すると一定以上の大きさの点群をダウンサンプルする。
         max_num_points (int, optional): ダウンサンプルを行う場合、点数をこの数字以下に削減する。
         point_size (int, optional): 点のサイズ。
+        scalars (Optional[Dict[str, numpy.ndarray]], optional): 名前から点ごとのスカラー値への辞書。
+            各値は shape が (num_points,) で dtype が float32 または uint16 の ndarray 。
+            ブラウザ側でカラーマップを通して色付けするのに使う。
+        color_by (Optional[str], optional): 色付けに使うスカラー値の名前。指定しない場合はrgbで色付けする。
+        colormap (Colormap, optional): color_by を指定した場合に使うカラーマップ。
+        scalar_range (Optional[Tuple[float, float]], optional): カラーマップの両端に対応するスカラー値。
+            指定しない場合はスカラー値の最小値と最大値を使う。
+        labels (Optional[numpy.ndarray], optional): shape が (num_points,) で dtype が uint8 または uint16 の ndarray 。
+            各要素が点のラベルを表す。
+        palette (Optional[numpy.ndarray], optional): shape が (num_labels,3) か (num_labels,4) で dtype が uint8 の ndarray 。
+            各行がラベルに対応するr,g,b(,a)を表す。指定するとrgbの代わりにラベルに対応する色で色付けする。
+            アルファ値が0のラベルの点は表示されない。
+        position_precision (Optional[float], optional): 指定すると、点の座標をこの幅(メートル)で16ビットに量子化して送信する。
+            点の順番は並べ替えられる。
+        compression (Optional[Compression], optional): 送信するデータの圧縮方法。指定しない場合は set_compression の設定に従う。
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
+        spatial_index (bool, optional): Trueの場合、送信した点の空間索引を作り、
+            query_radius 、 nearest 、 query_box で点を検索できるようにする。
+            update_pointcloud で更新した場合は索引も作り直される。
 
     Returns:
         UUID: 表示した点群に対応するID。後から操作する際に使う
@@ -121,10 +397,10 @@ def send_pointcloud(
         raise ValueError(
             "xyzrgb must be float32 array of shape (num_points, 4)"
         )
-
     # pcdデータ作成
-    pcd: pypcd.PointCloud
+    columns: List[numpy.ndarray]
     if xyz is not None:
+        columns = [xyz]
         if rgb is not None:
             rgb_u32 = rgb.astype("uint32")
             rgb_f32: numpy.ndarray = (
@@ -133,40 +409,200 @@ def send_pointcloud(
                 + rgb_u32[:, 2]
             )
             rgb_f32 = rgb_f32.view("float32")
-
-            concatenated: numpy.ndarray = numpy.column_stack((
-                xyz,
-                rgb_f32,
-            ))
-            pcd = pypcd.make_xyz_rgb_point_cloud(
-                down_sample_pointcloud(
-                    concatenated, down_sample, max_num_points=max_num_points)
-            )
-        else:
-            pcd = pypcd.make_xyz_point_cloud(
-                down_sample_pointcloud(
-                    xyz, down_sample, max_num_points=max_num_points)
-            )
+            columns.append(rgb_f32)
     else:
         assert xyzrgb is not None
-        pcd = pypcd.make_xyz_rgb_point_cloud(
-            down_sample_pointcloud(xyzrgb, down_sample,
-                                   max_num_points=max_num_points)
-        )
-
-    pcd_bytes = pcd.save_pcd_to_buffer()
+        columns = [xyzrgb]
+    num_columns = sum(1 if len(c.shape) == 1 else c.shape[1] for c in columns)
+
+    if scalars is None:
+        scalars = {}
+    for (name, values) in scalars.items():
+        if not (values.shape == (columns[0].shape[0],) and values.dtype in ("float32", "uint16")):
+            raise ValueError(f"scalar {name} must be float32 or uint16 array of shape (num_points,)")
+    if color_by is not None and color_by not in scalars:
+        raise ValueError(f"scalar {color_by} not found")
+    if labels is not None and not (labels.shape == (columns[0].shape[0],) and labels.dtype in ("uint8", "uint16")):
+        raise ValueError("labels must be uint8 or uint16 array of shape (num_points,)")
+    if palette is not None:
+        if labels is None:
+            raise ValueError("labels is required with palette")
+        if color_by is not None:
+            raise ValueError("color_by and palette cannot be specified at the same time")
+        pb_palette = _make_palette(palette)
+    if position_precision is not None and not position_precision > 0:
+        raise ValueError("position_precision must be positive")
+
+    cache_key: Optional[bytes] = None
+    if self._pointcloud_cache is not None:
+        cache_key = fingerprint(
+            [xyz, rgb, xyzrgb, labels, palette, *scalars.values()],
+            [
+                down_sample.name, down_sample.voxel_size, down_sample.min_distance, down_sample.seed,
+                down_sample.num_workers,
+                max_num_points, point_size, list(scalars.keys()), color_by, colormap.name, scalar_range,
+                position_precision, compression if compression is not None else self._compression,
+                self._compression_min_size,
+            ])
+        payload = self._pointcloud_cache.get(cache_key)
+        if payload is not None:
+            cached = server_pb2.AddObject.PointCloud.FromString(payload)
+            return _send_indexed_pcd(self, cached, compression, tags, spatial_index)
+
+    # スカラー値やラベルも点と一緒にダウンサンプルする。uint16はfloat32で正確に表せる
+    columns.extend(values.astype("float32") for values in scalars.values())
+    if labels is not None:
+        columns.append(labels.astype("float32"))
+    down_sampled = down_sample_pointcloud(
+        numpy.column_stack(columns), down_sample, max_num_points=max_num_points)
+
+    cloud = server_pb2.AddObject.PointCloud()
+    if position_precision is not None or down_sampled.shape[0] == 0:
+        # pcdは0点の点群を表せないので、空の点群は量子化された座標として送る
+        down_sampled = down_sampled[spatial_order(down_sampled[:, :3])]
+        cloud.quantized_positions.CopyFrom(quantize_positions(down_sampled[:, :3], position_precision or 1.0))
+        if num_columns == 4:
+            cloud.colors = _unpack_rgb(down_sampled[:, 3]).tobytes()
+    else:
+        pcd: pypcd.PointCloud
+        if num_columns == 4:
+            pcd = pypcd.make_xyz_rgb_point_cloud(down_sampled[:, :4])
+        else:
+            pcd = pypcd.make_xyz_point_cloud(down_sampled[:, :3])
+        cloud.pcd_data = _save_pcd(pcd, _resolve_compression(self, compression, pcd.pc_data.nbytes))
+
+    scalar_fields = [
+        _make_scalar_field(name, down_sampled[:, num_columns + i].astype(values.dtype))
+        for (i, (name, values)) in enumerate(scalars.items())
+    ]
+    cloud.point_size = point_size
+    cloud.scalar_fields.extend(scalar_fields)
+    if color_by is not None:
+        cloud.color_map.CopyFrom(_make_color_map(color_by, colormap, scalar_range))
+    if labels is not None:
+        label_values = down_sampled[:, -1].astype(labels.dtype)
+        if labels.dtype == "uint8":
+            cloud.labels.uint8 = label_values.tobytes()
+        else:
+            cloud.labels.uint16 = label_values.astype("<u2").tobytes()
+    if palette is not None:
+        cloud.palette.CopyFrom(pb_palette)
+    if self._pointcloud_cache is not None and cache_key is not None:
+        self._pointcloud_cache.put(cache_key, cloud.SerializeToString())
 
     # 送信
-    return self.send_pointcloud_pcd(pcd_bytes, down_sample=DownSampleStrategy.NONE, point_size=point_size)
+    return _send_indexed_pcd(self, cloud, compression, tags, spatial_index)
+
+
+def _send_indexed_pcd(
+    self: PointCloudViewer,
+    cloud: server_pb2.AddObject.PointCloud,
+    compression: Optional[Compression],
+    tags: Sequence[str],
+    spatial_index: bool,
+) -> UUID:
+    uuid = _send_pcd(self, cloud, compression, tags)
+    if spatial_index:
+        self._spatial_indices[uuid] = SpatialIndex(_pointcloud_positions(cloud))
+    return uuid
+
+
+def _pointcloud_positions(cloud: server_pb2.AddObject.PointCloud) -> numpy.ndarray:
+    """クライアントが表示する点の座標を、表示される順に取り出す。"""
+    if cloud.HasField("quantized_positions"):
+        return dequantize_positions(cloud.quantized_positions)
+    _, fields = pypcd.pc_fields_from_buffer(cloud.pcd_data)
+    return numpy.stack([fields["x"], fields["y"], fields["z"]], axis=1)
+
+
+def _save_pcd(pcd: pypcd.PointCloud, compression: Compression) -> bytes:
+    if compression == Compression.LZF:
+        pcd_bytes = pcd.save_pcd_to_buffer("binary_compressed")
+        # 圧縮しても小さくならない場合は圧縮されずに格納されるが、クライアントはその形式を読めない
+        _, offset = pypcd.read_header(pcd_bytes)
+        (compressed_size, uncompressed_size) = struct.unpack_from("II", pcd_bytes, offset)
+        if compressed_size < uncompressed_size:
+            return pcd_bytes
+    return pcd.save_pcd_to_buffer()
+
+
+def _send_pcd(
+    self: PointCloudViewer,
+    cloud: server_pb2.AddObject.PointCloud,
+    compression: Optional[Compression],
+    tags: Sequence[str],
+) -> UUID:
+    add_obj = server_pb2.AddObject()
+    add_obj.point_cloud.CopyFrom(cloud)
+    return _send_add_object(self, add_obj, tags, compression)
+
+
+def _send_add_object(
+    self: PointCloudViewer,
+    add_obj: server_pb2.AddObject,
+    tags: Sequence[str],
+    compression: Optional[Compression] = None,
+) -> UUID:
+    add_obj.tags.extend(tags)
+    obj = server_pb2.ServerCommand()
+    obj.add_object.CopyFrom(add_obj)
+
+    uuid = uuid4()
+    self._send_data(obj, uuid, compression)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    object_uuid = UUID(hex=ret.result.success)
+    self._objects.add(object_uuid, add_obj, obj.ByteSize())
+    _enforce_memory_budget(self, object_uuid)
+    return object_uuid
+
+
+def _make_scalar_field(name: str, values: numpy.ndarray) -> server_pb2.ScalarField:
+    field = server_pb2.ScalarField()
+    field.name = name
+    if values.dtype == "uint16":
+        field.uint16 = values.astype("<u2").tobytes()
+    else:
+        field.float32 = values.astype("<f4").tobytes()
+    if values.shape[0] > 0:
+        field.min = float(values.min())
+        field.max = float(values.max())
+    return field
+
+
+def _make_color_map(
+    color_by: str, colormap: Colormap, scalar_range: Optional[Tuple[float, float]]
+) -> server_pb2.ColorMap:
+    color_map = server_pb2.ColorMap()
+    color_map.scalar_field = color_by
+    color_map.type = server_pb2.ColorMap.Type.Value(colormap.name)
+    if scalar_range is not None:
+        color_map.min = scalar_range[0]
+        color_map.max = scalar_range[1]
+    return color_map
+
+
+def _make_palette(palette: numpy.ndarray) -> server_pb2.Palette:
+    if not (len(palette.shape) == 2 and palette.shape[1] in (3, 4) and palette.dtype == "uint8"):
+        raise ValueError("palette must be uint8 array of shape (num_labels, 3) or (num_labels, 4)")
+    if palette.shape[1] == 3:
+        palette = numpy.column_stack((palette, numpy.full((palette.shape[0],), 255, dtype=numpy.uint8)))
+    pb_palette = server_pb2.Palette()
+    pb_palette.colors = palette.tobytes()
+    return pb_palette
 
 
-# pylint: disable=too-many-branches
 def send_lineset(
     self: PointCloudViewer,
     xyz: numpy.ndarray,
     from_to: numpy.ndarray,
     rgb: Optional[numpy.ndarray] = None,
-    width: Optional[numpy.ndarray] = None
+    width: Optional[numpy.ndarray] = None,
+    renderer: LinesetRenderer = LinesetRenderer.AUTO,
+    tags: Sequence[str] = (),
 ) -> UUID:
     """Linesetをブラウザに送信し、表示させる。
 
@@ -175,6 +611,8 @@ def send_lineset(
         from_to (numpy.ndarray): shape が (num_lines,2) で dtype が uint32 の ndarray 。各行が線分の端点のインデックスによって1本の線分を表す。
         rgb (Optional[numpy.ndarray], optional): shape が (num_lines,3) で dtype が uint8 の ndarray 。各行が線分のr,g,bを表す。
         width (Optional[numpy.ndarray], optional): shape が (num_lines,) で dtypeが float32 の ndarray 。各要素が線分の太さを表す。
+        renderer (LinesetRenderer, optional): 描画方法。デフォルトでは線分の数が多い場合にGPUで描画する。
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
     Returns:
         UUID: 表示したLinesetに対応するID。後から操作する際に使う
     """
@@ -202,52 +640,29 @@ def send_lineset(
                 "whidth must be float32 array of shape (num_lines,)"
             )
 
-    num_points = xyz.shape[0]
+    if from_to.size > 0 and from_to.max() >= xyz.shape[0]:
+        raise ValueError(
+            "value of from_to element must be 0 <= and < num_points")
 
     pb_lineset = server_pb2.AddObject.LineSet()
-    for v in xyz:
-        p = server_pb2.VecXYZf()
-        p.x = v[0]
-        p.y = v[1]
-        p.z = v[2]
-        pb_lineset.points.append(p)
-    for l in from_to:
-        if not (0 <= l[0] and l[0] < num_points and 0 <= l[1] and l[1] < num_points):
-            raise ValueError(
-                "value of from_to element must be 0 <= and < num_points")
-        pb_lineset.from_index.append(l[0])
-        pb_lineset.to_index.append(l[1])
-
+    pb_lineset.packed_positions = xyz.astype("<f4").tobytes()
+    pb_lineset.packed_indices = from_to.astype("<u4").tobytes()
     if rgb is not None:
-        for l in rgb:
-            c = server_pb2.VecRGBf()
-            c.r = l[0]
-            c.g = l[1]
-            c.b = l[2]
-            pb_lineset.colors.append(c)
+        pb_lineset.packed_colors = rgb.tobytes()
     if width is not None:
-        for w in width:
-            pb_lineset.widths.append(w)
+        pb_lineset.packed_widths = width.astype("<f4").tobytes()
+    pb_lineset.renderer = server_pb2.AddObject.LineSet.Renderer.Value(renderer.name)
     add_obj = server_pb2.AddObject()
     add_obj.line_set.CopyFrom(pb_lineset)
-    obj = server_pb2.ServerCommand()
-    obj.add_object.CopyFrom(add_obj)
-
-    uuid = uuid4()
-    self._send_data(obj, uuid)
-    ret = self._wait_until(uuid)
-    if ret.result.HasField("failure"):
-        raise RuntimeError(ret.result.failure)
-    if not ret.result.HasField("success"):
-        raise RuntimeError("unexpected response")
-    return UUID(hex=ret.result.success)
+    return _send_add_object(self, add_obj, tags)
 
 
 def send_mesh(
     self: PointCloudViewer,
     xyz: numpy.ndarray,
     indices: numpy.ndarray,
-    rgb: Optional[numpy.ndarray] = None
+    rgb: Optional[numpy.ndarray] = None,
+    tags: Sequence[str] = (),
 ) -> UUID:
     """Meshをブラウザに送信し、表示させる。
 
@@ -255,6 +670,7 @@ def send_mesh(
         xyz (numpy.ndarray): shape が (num_points,3) で dtype が float32 の ndarray 。各行が頂点のx,y,z座標を表す。
         indices (numpy.ndarray): shape が (num_triangles,3) で dtype が uint32 の ndarray 。各行が頂点のインデックスによって1枚の三角形を表す。
         rgb (Optional[numpy.ndarray], optional): shape が (num_points,3) で dtype が uint8 の ndarray 。各行が頂点のr,g,bを表す。
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
 
     Returns:
         UUID: 表示したMeshに対応するID。後から操作する際に使う
@@ -274,45 +690,18 @@ def send_mesh(
                 "rgb must be uint8 array of shape (num_triangles, 3)"
             )
 
-    num_points = xyz.shape[0]
+    if indices.size > 0 and indices.max() >= xyz.shape[0]:
+        raise ValueError(
+            "value of indices element must be 0 <= and < num_points")
 
     pb_mesh = server_pb2.AddObject.Mesh()
-    for v in xyz:
-        p = server_pb2.VecXYZf()
-        p.x = v[0]
-        p.y = v[1]
-        p.z = v[2]
-        pb_mesh.points.append(p)
-    for l in indices:
-        for i in range(3):
-            if not (0 <= l[i] and l[i] < num_points):
-                raise ValueError(
-                    "value of indices element must be 0 <= and < num_points")
-        pb_mesh.vertex_a_index.append(l[0])
-        pb_mesh.vertex_b_index.append(l[1])
-        pb_mesh.vertex_c_index.append(l[2])
+    pb_mesh.packed_positions = xyz.astype("<f4").tobytes()
+    pb_mesh.packed_indices = indices.astype("<u4").tobytes()
     if rgb is not None:
-        rgb_f = rgb.astype("float32")
-        rgb_f /= 255
-        for l in rgb_f:
-            c = server_pb2.VecRGBf()
-            c.r = l[0]
-            c.g = l[1]
-            c.b = l[2]
-            pb_mesh.colors.append(c)
+        pb_mesh.packed_colors = rgb.tobytes()
     add_obj = server_pb2.AddObject()
     add_obj.mesh.CopyFrom(pb_mesh)
-    obj = server_pb2.ServerCommand()
-    obj.add_object.CopyFrom(add_obj)
-
-    uuid = uuid4()
-    self._send_data(obj, uuid)
-    ret = self._wait_until(uuid)
-    if ret.result.HasField("failure"):
-        raise RuntimeError(ret.result.failure)
-    if not ret.result.HasField("success"):
-        raise RuntimeError("unexpected response")
-    return UUID(hex=ret.result.success)
+    return _send_add_object(self, add_obj, tags)
 
 
 def send_overlay_text(
@@ -323,6 +712,7 @@ def send_overlay_text(
     z: float = 0,
     screen_coordinate: bool = False,
     style: str = "",
+    tags: Sequence[str] = (),
 ) -> UUID:
     """特定の座標を左上として文字列をオーバーレイさせる。
 
@@ -338,6 +728,8 @@ def send_overlay_text(
     :type screen_coordinate: bool, optional
     :param style: style属性に渡される文字列
     :type style: str, optional
+    :param tags: set_visible や remove_objects でまとめて操作するためのタグ
+    :type tags: Sequence[str], optional
 
     Returns:
         UUID: オーバーレイに対応するID。後から操作する際に使う
@@ -359,17 +751,7 @@ def send_overlay_text(
         overlay.type = server_pb2.AddObject.Overlay.CoordinateType.WORLD_COORDINATE
     add_obj = server_pb2.AddObject()
     add_obj.overlay.CopyFrom(overlay)
-    obj = server_pb2.ServerCommand()
-    obj.add_object.CopyFrom(add_obj)
-
-    uuid = uuid4()
-    self._send_data(obj, uuid)
-    ret = self._wait_until(uuid)
-    if ret.result.HasField("failure"):
-        raise RuntimeError(ret.result.failure)
-    if not ret.result.HasField("success"):
-        raise RuntimeError("unexpected response")
-    return UUID(hex=ret.result.success)
+    return _send_add_object(self, add_obj, tags)
 
 
 def send_overlay_image_from_ndarray(
@@ -380,6 +762,7 @@ def send_overlay_image_from_ndarray(
     y: float = 0,
     z: float = 0,
     screen_coordinate: bool = False,
+    tags: Sequence[str] = (),
 ) -> UUID:
     """特定の座標を左上として画像をオーバーレイさせる。
 
@@ -390,6 +773,7 @@ def send_overlay_image_from_ndarray(
         y (float, optional): オーバーレイが追従する点のy座標
         z (float, optional): オーバーレイが追従する点のz座標
         screen_coordinate (bool, optional) Trueにするとオーバーレイが画面の指定の位置に固定される。このときzは無視される
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
 
     Returns:
         UUID: オーバーレイに対応するID。後から操作する際に使う
@@ -405,7 +789,8 @@ def send_overlay_image_from_ndarray(
         x,
         y,
         z,
-        screen_coordinate
+        screen_coordinate,
+        tags,
     )
 
 
@@ -417,6 +802,7 @@ def send_overlay_image(
     y: float = 0,
     z: float = 0,
     screen_coordinate: bool = False,
+    tags: Sequence[str] = (),
 ) -> UUID:
     """特定の座標を左上として画像をオーバーレイさせる。
 
@@ -427,6 +813,7 @@ def send_overlay_image(
         y (float, optional): オーバーレイが追従する点のy座標
         z (float, optional): オーバーレイが追従する点のz座標
         screen_coordinate (bool, optional) Trueにするとオーバーレイが画面の指定の位置に固定される。このときzは無視される
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
 
     Returns:
         UUID: オーバーレイに対応するID。後から操作する際に使う
@@ -451,17 +838,7 @@ def send_overlay_image(
 
     add_obj = server_pb2.AddObject()
     add_obj.overlay.CopyFrom(overlay)
-    obj = server_pb2.ServerCommand()
-    obj.add_object.CopyFrom(add_obj)
-
-    uuid = uuid4()
-    self._send_data(obj, uuid)
-    ret = self._wait_until(uuid)
-    if ret.result.HasField("failure"):
-        raise RuntimeError(ret.result.failure)
-    if not ret.result.HasField("success"):
-        raise RuntimeError("unexpected response")
-    return UUID(hex=ret.result.success)
+    return _send_add_object(self, add_obj, tags)
 
 
 def send_image(
@@ -471,6 +848,7 @@ def send_image(
     lower_left: Tuple[float, float, float],
     lower_right: Tuple[float, float, float],
     double_side: bool = False,
+    tags: Sequence[str] = (),
 ) -> UUID:
     """画像を平面に貼り付けたものをブラウザに送信し、表示する。
 
@@ -480,6 +858,7 @@ def send_image(
         lower_left (Tuple[float, float, float]): 画像の左下の座標
         lower_right (Tuple[float, float, float]): 画像の右下の座標
         double_side (bool, optional): Trueにすると裏から見たときに描画される
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
 
     Returns:
         UUID: UUID: 画像に対応するID。後から操作する際に使う
@@ -526,14 +905,4 @@ def send_image(
 
     add_obj = server_pb2.AddObject()
     add_obj.image.CopyFrom(image)
-    obj = server_pb2.ServerCommand()
-    obj.add_object.CopyFrom(add_obj)
-
-    uuid = uuid4()
-    self._send_data(obj, uuid)
-    ret = self._wait_until(uuid)
-    if ret.result.HasField("failure"):
-        raise RuntimeError(ret.result.failure)
-    if not ret.result.HasField("success"):
-        raise RuntimeError("unexpected response")
-    return UUID(hex=ret.result.success)
+    return _send_add_object(self, add_obj, tags)
@@ -0,0 +1,69 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Dict, Sequence, Union
+from uuid import UUID
+import numpy
+from cumo.overlay_text_style import OverlayTextStyle
+from cumo._internal.protobuf import server_pb2
+from cumo._internal.members.send_object import _send_add_object
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+
+def send_overlay_texts(
+    self: PointCloudViewer,
+    texts: Sequence[str],
+    xyz: numpy.ndarray,
+    styles: Union[OverlayTextStyle, Sequence[OverlayTextStyle], None] = None,
+    declutter: bool = True,
+    tags: Sequence[str] = (),
+) -> UUID:
+    """多数の文字列を、それぞれの座標を左上としてまとめてオーバーレイさせる。
+
+    send_overlay_text と異なり文字列ごとにDOM要素を作らず、1枚のCanvasに描画するので数千個の文字列を表示できる。
+    視錐台の外にある文字列は描画されない。
+
+    Args:
+        texts (Sequence[str]): 表示させる文字列
+        xyz (numpy.ndarray): shape が (num_texts,3) で dtype が float32 の ndarray 。各行が文字列が追従する点のx,y,z座標を表す。
+        styles (Union[OverlayTextStyle, Sequence[OverlayTextStyle], None], optional): 全ての文字列に共通の見た目、
+            または文字列ごとの見た目。指定しない場合は OverlayTextStyle() になる。
+        declutter (bool, optional): Trueの場合、手前にある文字列と画面上で重なる文字列を描画しない。
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
+    Returns:
+        UUID: オーバーレイに対応するID。後から操作する際に使う
+    """
+    if not (len(xyz.shape) == 2 and xyz.shape[1] == 3 and xyz.dtype == "float32"):
+        raise ValueError("xyz must be float32 array of shape (num_texts,3)")
+    if len(texts) != xyz.shape[0]:
+        raise ValueError("length of texts must be num_texts")
+
+    pb_texts = server_pb2.AddObject.OverlayTexts()
+    pb_texts.texts.extend(texts)
+    pb_texts.positions = xyz.astype("<f4").tobytes()
+    pb_texts.declutter = declutter
+    if styles is None or isinstance(styles, OverlayTextStyle):
+        unique_styles = [styles or OverlayTextStyle()]
+    else:
+        if len(styles) != xyz.shape[0]:
+            raise ValueError("length of styles must be num_texts")
+        # 同じ見た目は1つにまとめ、文字列ごとにはインデックスのみを送信する
+        style_indices: Dict[OverlayTextStyle, int] = {}
+        indices = [style_indices.setdefault(style, len(style_indices)) for style in styles]
+        if len(style_indices) > numpy.iinfo(numpy.uint16).max + 1:
+            raise ValueError("too many distinct styles")
+        unique_styles = list(style_indices)
+        pb_texts.style_indices = numpy.array(indices, dtype="<u2").tobytes()
+    for style in unique_styles:
+        pb_style = server_pb2.OverlayTextStyle()
+        pb_style.color = style.color
+        pb_style.font_size = style.font_size
+        if style.background is not None:
+            pb_style.background = style.background
+        pb_texts.styles.append(pb_style)
+
+    add_obj = server_pb2.AddObject()
+    add_obj.overlay_texts.CopyFrom(pb_texts)
+    return _send_add_object(self, add_obj, tags)
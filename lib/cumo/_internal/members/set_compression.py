@@ -0,0 +1,58 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Optional
+import zlib
+from cumo.pointcloudviewer import Compression
+from cumo._internal.protobuf import server_pb2
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+COMPRESSION_DEFAULT_MIN_SIZE = 64 * 1024
+
+# pylint: disable=no-member
+
+
+def set_compression(
+    self: PointCloudViewer,
+    compression: Compression,
+    min_size: int = COMPRESSION_DEFAULT_MIN_SIZE,
+) -> None:
+    """ブラウザに送信するデータの圧縮方法を設定する。個別のメソッドで compression を指定した場合はそちらが優先される。
+
+    WebSocketの通信は、この設定によらず permessage-deflate で圧縮される。
+    ここで設定する圧縮はその前にデータ自体に対して行うもので、Compression.NONE の場合は通信時の圧縮のみになる。
+
+    Args:
+        compression (Compression): 圧縮方法。
+            Compression.LZF は点群のpcdデータのみを圧縮し、Compression.DEFLATE はコマンド全体を圧縮する。
+        min_size (int, optional): 圧縮するデータの最小バイト数。これより小さいデータは圧縮せずに送信する。
+    """
+    if min_size < 0:
+        raise ValueError("min_size must not be negative")
+    self._compression = compression
+    self._compression_min_size = min_size
+
+
+def _resolve_compression(self: PointCloudViewer, compression: Optional[Compression], size: int) -> Compression:
+    """個別に指定された圧縮方法と全体の設定から、size バイトのデータに使う圧縮方法を決める。"""
+    if compression is None:
+        compression = self._compression
+    if size < self._compression_min_size:
+        return Compression.NONE
+    return compression
+
+
+def _compress_command(
+    self: PointCloudViewer, pbobj: server_pb2.ServerCommand, compression: Optional[Compression]
+) -> bytes:
+    """コマンドをシリアライズし、必要に応じて圧縮したコマンドで包む。"""
+    data = pbobj.SerializeToString()
+    if _resolve_compression(self, compression, len(data)) != Compression.DEFLATE:
+        return data
+    compressed = zlib.compress(data)
+    if len(compressed) >= len(data):
+        return data
+    envelope = server_pb2.ServerCommand()
+    # 展開に失敗した場合にクライアントが失敗を返せるように同じIDを付ける
+    envelope.UUID = pbobj.UUID
+    envelope.compressed = compressed
+    return envelope.SerializeToString()
@@ -0,0 +1,66 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Optional, Tuple
+from uuid import UUID, uuid4
+import numpy
+from cumo.pointcloudviewer import Colormap
+from cumo._internal.protobuf import server_pb2
+from cumo._internal.members.send_object import _make_color_map, _make_palette
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+
+def set_pointcloud_colormap(
+    self: PointCloudViewer,
+    uuid: UUID,
+    color_by: Optional[str],
+    colormap: Colormap = Colormap.VIRIDIS,
+    scalar_range: Optional[Tuple[float, float]] = None,
+) -> None:
+    """表示中の点群の色付けの方法を変更する。点群を送信し直す必要はない。
+
+    Args:
+        uuid (UUID): 対象の点群のID
+        color_by (Optional[str]): 色付けに使うスカラー値の名前。 ``send_pointcloud`` の ``scalars`` で送信したものを指定する。
+            None を指定するとrgbによる色付けに戻す。
+        colormap (Colormap, optional): 使用するカラーマップ。
+        scalar_range (Optional[Tuple[float, float]], optional): カラーマップの両端に対応するスカラー値。
+            指定しない場合はスカラー値の最小値と最大値を使う。
+    """
+    set_color = server_pb2.SetPointCloudColor()
+    set_color.target = str(uuid)
+    if color_by is None:
+        set_color.vertex_color = True
+    else:
+        set_color.color_map.CopyFrom(_make_color_map(color_by, colormap, scalar_range))
+
+    _set_pointcloud_color(self, set_color)
+
+
+def set_palette(self: PointCloudViewer, uuid: UUID, palette: numpy.ndarray) -> None:
+    """表示中の点群をラベルに対応する色で色付けする。点群を送信し直す必要はない。
+
+    Args:
+        uuid (UUID): 対象の点群のID。 ``send_pointcloud`` の ``labels`` を指定して送信したものである必要がある。
+        palette (numpy.ndarray): shape が (num_labels,3) または (num_labels,4) で dtype が uint8 の ndarray 。
+            各行がラベルに対応するr,g,b(,a)を表す。アルファ値を0にしたラベルの点は表示されなくなる。
+    """
+    set_color = server_pb2.SetPointCloudColor()
+    set_color.target = str(uuid)
+    set_color.palette.CopyFrom(_make_palette(palette))
+    _set_pointcloud_color(self, set_color)
+
+
+def _set_pointcloud_color(self: PointCloudViewer, set_color: server_pb2.SetPointCloudColor) -> None:
+    obj = server_pb2.ServerCommand()
+    obj.set_point_cloud_color.CopyFrom(set_color)
+
+    command_uuid = uuid4()
+    self._send_data(obj, command_uuid)
+    ret = self._wait_until(command_uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
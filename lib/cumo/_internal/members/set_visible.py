@@ -0,0 +1,53 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Sequence, Union
+from uuid import UUID, uuid4
+from cumo._internal.protobuf import server_pb2
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+
+def set_visible(
+    self: PointCloudViewer,
+    target: Union[UUID, str, Sequence[UUID]],
+    visible: bool,
+) -> None:
+    """オブジェクトの表示、非表示を切り替える。
+
+    非表示にしたオブジェクトはブラウザに残るので、再度表示するときに送信し直す必要がない。
+    グループを非表示にすると、set_parent で子にしたオブジェクトも表示されなくなる。
+
+    Args:
+        target (Union[UUID, str, Sequence[UUID]]): 切り替えるオブジェクトのID、そのリスト、
+            または send_* の tags で付けたタグ。
+        visible (bool): Trueの場合は表示し、Falseの場合は非表示にする。
+    """
+    set_visible_cmd = server_pb2.SetVisible()
+    set_visible_cmd.objects.CopyFrom(_make_object_selector(target))
+    set_visible_cmd.visible = visible
+    obj = server_pb2.ServerCommand()
+    obj.set_visible.CopyFrom(set_visible_cmd)
+
+    uuid = uuid4()
+    self._send_data(obj, uuid)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    self._objects.set_visible(self._objects.resolve(target), visible)
+
+
+def _make_object_selector(target: Union[UUID, str, Sequence[UUID]]) -> server_pb2.ObjectSelector:
+    selector = server_pb2.ObjectSelector()
+    if isinstance(target, UUID):
+        selector.uuids.append(str(target))
+    elif isinstance(target, str):
+        if target == "":
+            raise ValueError("tag must not be empty")
+        selector.tag = target
+    else:
+        selector.uuids.extend(str(uuid) for uuid in target)
+    return selector
@@ -0,0 +1,102 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Tuple
+from uuid import UUID
+import numpy
+from cumo._internal.spatial_index import SpatialIndex
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+
+def query_radius(
+    self: PointCloudViewer,
+    uuid: UUID,
+    point: numpy.ndarray,
+    r: float,
+) -> numpy.ndarray:
+    """点群のうち point からの距離が r 以下の点を探す。
+
+    send_pointcloud に spatial_index=True を指定して送信した点群が対象になる。
+    座標は点群のローカル座標(set_transform で変換する前の座標)で指定する。
+
+    Args:
+        uuid (UUID): 点群のID
+        point (numpy.ndarray): shape が (3,) の ndarray 。中心のx,y,z座標を表す。
+        r (float): 半径
+
+    Returns:
+        numpy.ndarray: 見つかった点の番号を昇順に並べた ndarray 。
+            番号はブラウザに表示している点の順番で、PickEvent や PointSelection の番号と同じ。
+    """
+    index = _get_spatial_index(self, uuid)
+    point = _as_point(point, "point")
+    if not r >= 0:
+        raise ValueError("r must not be negative")
+    return index.query_radius(point, r)
+
+
+def nearest(
+    self: PointCloudViewer,
+    uuid: UUID,
+    points: numpy.ndarray,
+    k: int = 1,
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """points の各点に近い順に、点群の点を k 個ずつ探す。
+
+    send_pointcloud に spatial_index=True を指定して送信した点群が対象になる。
+    座標は点群のローカル座標(set_transform で変換する前の座標)で指定する。
+
+    Args:
+        uuid (UUID): 点群のID
+        points (numpy.ndarray): shape が (num_queries,3) の ndarray 。各行が探す点のx,y,z座標を表す。
+        k (int, optional): 各点について探す点の数
+
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray]: 距離と点の番号。どちらも shape が (num_queries,k) で、各行は近い順に並ぶ。
+            番号はブラウザに表示している点の順番で、PickEvent や PointSelection の番号と同じ。
+    """
+    index = _get_spatial_index(self, uuid)
+    points = numpy.asarray(points, dtype=numpy.float64)
+    if not (len(points.shape) == 2 and points.shape[1] == 3):
+        raise ValueError("points must be array of shape (num_queries, 3)")
+    if not 1 <= k <= index.num_points:
+        raise ValueError(f"k must be between 1 and the number of points ({index.num_points})")
+    return index.nearest(points, k)
+
+
+def query_box(
+    self: PointCloudViewer,
+    uuid: UUID,
+    lower: numpy.ndarray,
+    upper: numpy.ndarray,
+) -> numpy.ndarray:
+    """点群のうち、各軸の座標が lower 以上 upper 以下の点を探す。
+
+    send_pointcloud に spatial_index=True を指定して送信した点群が対象になる。
+    座標は点群のローカル座標(set_transform で変換する前の座標)で指定する。
+
+    Args:
+        uuid (UUID): 点群のID
+        lower (numpy.ndarray): shape が (3,) の ndarray 。範囲の最小のx,y,z座標を表す。
+        upper (numpy.ndarray): shape が (3,) の ndarray 。範囲の最大のx,y,z座標を表す。
+
+    Returns:
+        numpy.ndarray: 見つかった点の番号を昇順に並べた ndarray 。
+            番号はブラウザに表示している点の順番で、PickEvent や PointSelection の番号と同じ。
+    """
+    index = _get_spatial_index(self, uuid)
+    return index.query_box(_as_point(lower, "lower"), _as_point(upper, "upper"))
+
+
+def _get_spatial_index(self: PointCloudViewer, uuid: UUID) -> SpatialIndex:
+    index = self._spatial_indices.get(uuid)
+    if index is None:
+        raise KeyError(uuid)
+    return index
+
+
+def _as_point(point: numpy.ndarray, name: str) -> numpy.ndarray:
+    point = numpy.asarray(point, dtype=numpy.float64)
+    if point.shape != (3,):
+        raise ValueError(f"{name} must be array of shape (3,)")
+    return point
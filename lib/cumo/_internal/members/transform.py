@@ -0,0 +1,146 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Optional, Sequence
+from uuid import UUID, uuid4
+import numpy
+from cumo._internal.protobuf import server_pb2
+from cumo._internal.members.send_object import _send_add_object
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+
+def add_group(self: PointCloudViewer, tags: Sequence[str] = ()) -> UUID:
+    """何も表示しないオブジェクトを追加する。set_parent で子にしたオブジェクトをまとめて set_transform で動かすために使う。
+
+    グループを remove_object で削除すると、子のオブジェクトも削除される。
+
+    Args:
+        tags (Sequence[str], optional): set_visible や remove_objects でまとめて操作するためのタグ。
+
+    Returns:
+        UUID: 追加したグループに対応するID
+    """
+    add_obj = server_pb2.AddObject()
+    add_obj.group.CopyFrom(server_pb2.AddObject.Group())
+    return _send_add_object(self, add_obj, tags)
+
+
+def set_transform(
+    self: PointCloudViewer,
+    uuid: UUID,
+    matrix: Optional[numpy.ndarray] = None,
+    position: Optional[numpy.ndarray] = None,
+    rotation: Optional[numpy.ndarray] = None,
+) -> None:
+    """オブジェクトを送信し直さずに、移動、回転、拡大縮小する。
+
+    変換は送信したときの座標に対して適用される。親がある場合は親の座標系での変換になる。
+    matrix を指定するか、position と rotation の一方または両方を指定する。
+
+    Args:
+        uuid (UUID): 動かすオブジェクトのID
+        matrix (Optional[numpy.ndarray], optional): shape が (4,4) の ndarray 。列ベクトルに左から掛ける同次変換行列を表す。
+        position (Optional[numpy.ndarray], optional): shape が (3,) の ndarray 。平行移動のx,y,zを表す。
+        rotation (Optional[numpy.ndarray], optional): shape が (4,) の ndarray 。回転を表すクォータニオンのx,y,z,wを表す。
+    """
+    set_transforms(
+        self,
+        [uuid],
+        matrices=None if matrix is None else matrix[None],
+        positions=None if position is None else position[None],
+        rotations=None if rotation is None else rotation[None],
+    )
+
+
+def set_transforms(
+    self: PointCloudViewer,
+    uuids: Sequence[UUID],
+    matrices: Optional[numpy.ndarray] = None,
+    positions: Optional[numpy.ndarray] = None,
+    rotations: Optional[numpy.ndarray] = None,
+) -> None:
+    """複数のオブジェクトの変換を1回の通信でまとめて変更する。自車の移動の再生など、毎フレーム多数のオブジェクトを動かす場合に使う。
+
+    Args:
+        uuids (Sequence[UUID]): 動かすオブジェクトのID
+        matrices (Optional[numpy.ndarray], optional): shape が (num_objects,4,4) の ndarray 。各オブジェクトの同次変換行列を表す。
+        positions (Optional[numpy.ndarray], optional): shape が (num_objects,3) の ndarray 。各行が平行移動のx,y,zを表す。
+        rotations (Optional[numpy.ndarray], optional): shape が (num_objects,4) の ndarray 。
+            各行が回転を表すクォータニオンのx,y,z,wを表す。
+    """
+    num_objects = len(uuids)
+    if matrices is not None and (positions is not None or rotations is not None):
+        raise ValueError("matrices cannot be specified with positions or rotations")
+    if matrices is not None and not (matrices.shape == (num_objects, 4, 4) and matrices.dtype.kind == "f"):
+        raise ValueError("matrices must be float array of shape (num_objects,4,4)")
+    if positions is not None and not (positions.shape == (num_objects, 3) and positions.dtype.kind == "f"):
+        raise ValueError("positions must be float array of shape (num_objects,3)")
+    if rotations is not None and not (rotations.shape == (num_objects, 4) and rotations.dtype.kind == "f"):
+        raise ValueError("rotations must be float array of shape (num_objects,4)")
+
+    if matrices is None:
+        matrices = _compose_matrices(num_objects, positions, rotations)
+
+    set_transform_cmd = server_pb2.SetTransform()
+    set_transform_cmd.targets.extend(str(uuid) for uuid in uuids)
+    # Babylon.jsは行ベクトルに右から行列を掛けるので、転置して送る
+    set_transform_cmd.matrices = numpy.ascontiguousarray(matrices.transpose(0, 2, 1)).astype("<f4").tobytes()
+    obj = server_pb2.ServerCommand()
+    obj.set_transform.CopyFrom(set_transform_cmd)
+
+    command_uuid = uuid4()
+    self._send_data(obj, command_uuid)
+    ret = self._wait_until(command_uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+
+
+def set_parent(
+    self: PointCloudViewer,
+    uuid: UUID,
+    parent: Optional[UUID],
+) -> None:
+    """オブジェクトの親を設定する。子のオブジェクトは親の変換に追従して動く。
+
+    Args:
+        uuid (UUID): 子にするオブジェクトのID
+        parent (Optional[UUID]): 親にするオブジェクトやグループのID。Noneの場合は親子関係を解除する。
+    """
+    set_parent_cmd = server_pb2.SetParent()
+    set_parent_cmd.target = str(uuid)
+    if parent is not None:
+        set_parent_cmd.parent = str(parent)
+    obj = server_pb2.ServerCommand()
+    obj.set_parent.CopyFrom(set_parent_cmd)
+
+    command_uuid = uuid4()
+    self._send_data(obj, command_uuid)
+    ret = self._wait_until(command_uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    # メモリの上限を超えたときに、追加や更新をしたオブジェクトの祖先を削除しないように覚えておく
+    self._objects.set_parent(uuid, parent)
+
+
+def _compose_matrices(
+    num_objects: int, positions: Optional[numpy.ndarray], rotations: Optional[numpy.ndarray]
+) -> numpy.ndarray:
+    """平行移動とクォータニオン(x,y,z,w)から同次変換行列を作る。"""
+    matrices = numpy.tile(numpy.eye(4), (num_objects, 1, 1))
+    if rotations is not None:
+        q = rotations / numpy.linalg.norm(rotations, axis=1, keepdims=True)
+        x, y, z, w = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+        matrices[:, :3, :3] = numpy.stack((
+            numpy.stack((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)), axis=1),
+            numpy.stack((2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)), axis=1),
+            numpy.stack((2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)), axis=1),
+        ), axis=1)
+    if positions is not None:
+        matrices[:, :3, 3] = positions
+    return matrices
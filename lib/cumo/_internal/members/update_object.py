@@ -0,0 +1,271 @@
+from __future__ import annotations  # Postponed Evaluation of Annotations
+from typing import TYPE_CHECKING, Optional, Tuple
+from uuid import UUID, uuid4
+import html
+import numpy
+from cumo.pointcloudviewer import Compression, DownSampleStrategy
+from cumo._internal.protobuf import server_pb2
+from cumo._internal.down_sample import down_sample_pointcloud
+from cumo._internal.quantize import dequantize_positions, quantize_positions, spatial_order
+from cumo._internal.point_cloud_delta import PointCloudDelta, compute_point_cloud_delta, full_point_cloud_delta
+from cumo._internal.spatial_index import SpatialIndex
+from cumo._internal.members.send_object import DOWNSAMPLING_DEFAULT_MAX_NUM_POINTS
+from cumo._internal.members.objects import _record_update
+
+if TYPE_CHECKING:
+    from cumo import PointCloudViewer
+
+# pylint: disable=no-member
+
+
+def update_pointcloud(
+    self: PointCloudViewer,
+    uuid: UUID,
+    xyz: numpy.ndarray,
+    rgb: Optional[numpy.ndarray] = None,
+    voxel_size: Optional[float] = None,
+    down_sample: DownSampleStrategy = DownSampleStrategy.HASH_SAMPLE,
+    max_num_points: int = DOWNSAMPLING_DEFAULT_MAX_NUM_POINTS,
+    position_precision: Optional[float] = None,
+    compression: Optional[Compression] = None,
+) -> None:
+    """表示中の点群を新しいフレームで置き換える。前回このメソッドで送信したフレームとの差分のみを送信する。
+
+    前回のフレームから消えた点の削除、色が変わった点の色の変更、新しく現れた点の追加がクライアントに送信される。
+    その点群に対して初めて呼び出した場合は全点が送信される。
+
+    Args:
+        uuid (UUID): 更新する点群のID
+        xyz (numpy.ndarray): shape が (num_points,3) で dtype が float32 の ndarray 。各行が点のx,y,z座標を表す。
+        rgb (Optional[numpy.ndarray], optional): shape が (num_points,3) で dtype が uint8 の ndarray 。各行が点のr,g,bを表す。
+            指定しない場合は白になる。
+        voxel_size (Optional[float], optional): 指定すると、同じ大きさのボクセルに入る点を同一の点とみなして差分を求める。
+            指定しない場合は座標が完全に一致する点のみを同一の点とみなす。
+        down_sample (DownSampleStrategy, optional): DownSampleStrategy.NONE以外を指定すると一定以上の大きさの点群をダウンサンプルする。
+            デフォルトの DownSampleStrategy.HASH_SAMPLE ではフレーム間で共通する点が選ばれ続けるので、差分が小さくなる。
+        max_num_points (int, optional): ダウンサンプルを行う場合、点数をこの数字以下に削減する。
+        position_precision (Optional[float], optional): 指定すると、追加する点の座標をこの幅(メートル)で16ビットに量子化して送信する。
+        compression (Optional[Compression], optional): 送信するデータの圧縮方法。指定しない場合は set_compression の設定に従う。
+            Compression.LZF はpcdデータにのみ使われるので、差分の送信では圧縮されない。
+    """
+    if not (len(xyz.shape) == 2 and xyz.shape[1] == 3 and xyz.dtype == "float32"):
+        raise ValueError("xyz must be float32 array of shape (num_points, 3)")
+    if rgb is not None and not (len(rgb.shape) == 2 and rgb.shape == xyz.shape and rgb.dtype == "uint8"):
+        raise ValueError("rgb must be uint8 array of shape (num_points, 3)")
+    if voxel_size is not None and not voxel_size > 0:
+        raise ValueError("voxel_size must be positive")
+    if position_precision is not None and not position_precision > 0:
+        raise ValueError("position_precision must be positive")
+
+    if rgb is None:
+        rgb = numpy.full(xyz.shape, 255, dtype=numpy.uint8)
+
+    rgb_u32 = rgb.astype("uint32")
+    rgb_f32: numpy.ndarray = ((rgb_u32[:, 0] << 16) + (rgb_u32[:, 1] << 8) + rgb_u32[:, 2]).view("float32")
+    xyzrgb = down_sample_pointcloud(
+        numpy.column_stack((xyz, rgb_f32)), down_sample, max_num_points=max_num_points
+    )
+    xyz = numpy.ascontiguousarray(xyzrgb[:, :3], dtype=numpy.float32)
+    packed = numpy.ascontiguousarray(xyzrgb[:, 3]).view("uint32")
+    rgb = numpy.column_stack((packed >> 16, packed >> 8, packed)).astype("uint8")
+    if position_precision is not None:
+        # 追加される点が空間的にまとまるように並べ替えておく
+        order = spatial_order(xyz)
+        xyz = xyz[order]
+        rgb = rgb[order]
+
+    if uuid in self._pointcloud_frames:
+        (prev_xyz, prev_rgb) = self._pointcloud_frames[uuid]
+        delta = compute_point_cloud_delta(prev_xyz, prev_rgb, xyz, rgb, voxel_size)
+    else:
+        delta = full_point_cloud_delta(xyz, rgb)
+
+    cloud = server_pb2.UpdateObject.PointCloud()
+    cloud.clear = delta.clear
+    cloud.remove_indices = delta.remove_indices.astype("<u4").tobytes()
+    cloud.change_indices = delta.change_indices.astype("<u4").tobytes()
+    cloud.change_colors = delta.change_colors.tobytes()
+    if position_precision is not None:
+        cloud.add_quantized_positions.CopyFrom(quantize_positions(delta.add_xyz, position_precision))
+    else:
+        cloud.add_positions = delta.add_xyz.astype("<f4").tobytes()
+    cloud.add_colors = delta.add_rgb.tobytes()
+
+    update_obj = server_pb2.UpdateObject()
+    update_obj.target = str(uuid)
+    update_obj.point_cloud.CopyFrom(cloud)
+
+    obj = server_pb2.ServerCommand()
+    obj.update_object.CopyFrom(update_obj)
+
+    command_uuid = uuid4()
+    self._send_data(obj, command_uuid, compression)
+    ret = self._wait_until(command_uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+
+    # クライアントが差分を適用できた場合のみ、次回の差分の基準にする
+    _applied_point_cloud_delta(self, uuid, delta, cloud, obj.ByteSize())
+
+
+def _applied_point_cloud_delta(
+    self: PointCloudViewer,
+    uuid: UUID,
+    delta: PointCloudDelta,
+    cloud: server_pb2.UpdateObject.PointCloud,
+    wire_bytes: int,
+) -> None:
+    """クライアントが適用した差分を、次回の差分の基準と空間索引に反映する。"""
+    self._pointcloud_frames[uuid] = (delta.xyz, delta.rgb)
+    index = self._spatial_indices.get(uuid)
+    if index is not None:
+        # 量子化して送った点は、クライアントと同じように復元した座標で索引を作る
+        if cloud.HasField("add_quantized_positions"):
+            added = dequantize_positions(cloud.add_quantized_positions)
+        else:
+            added = delta.add_xyz
+        if delta.clear:
+            positions = added
+        else:
+            kept = numpy.ones((index.num_points,), dtype=bool)
+            kept[delta.remove_indices] = False
+            positions = numpy.concatenate((index.positions[kept], added))
+        self._spatial_indices[uuid] = SpatialIndex(positions)
+    _record_update(self, uuid, wire_bytes, num_points=delta.xyz.shape[0])
+
+
+def update_boxes(
+    self: PointCloudViewer,
+    uuid: UUID,
+    indices: numpy.ndarray,
+    colors: Optional[numpy.ndarray] = None,
+    visible: Optional[numpy.ndarray] = None,
+) -> None:
+    """send_boxes で表示した箱のうち、指定した箱の色や表示、非表示を変更する。
+
+    Args:
+        uuid (UUID): 変更する箱の集まりのID
+        indices (numpy.ndarray): shape が (num_indices,) で dtype が uint32 の ndarray 。各要素が変更する箱のインデックスを表す。
+        colors (Optional[numpy.ndarray], optional): shape が (num_indices,3) で dtype が uint8 の ndarray 。各行が箱の新しいr,g,bを表す。
+            指定しない場合は色を変更しない。
+        visible (Optional[numpy.ndarray], optional): shape が (num_indices,) で dtype が bool の ndarray 。各要素が箱を表示するかどうかを表す。
+            指定しない場合は表示、非表示を変更しない。
+    """
+    if not (len(indices.shape) == 1 and indices.dtype == "uint32"):
+        raise ValueError("indices must be uint32 array of shape (num_indices,)")
+    if colors is not None and not (colors.shape == (indices.shape[0], 3) and colors.dtype == "uint8"):
+        raise ValueError("colors must be uint8 array of shape (num_indices,3)")
+    if visible is not None and not (visible.shape == indices.shape and visible.dtype == "bool"):
+        raise ValueError("visible must be bool array of shape (num_indices,)")
+
+    boxes = server_pb2.UpdateObject.Boxes()
+    boxes.indices = indices.astype("<u4").tobytes()
+    if colors is not None:
+        boxes.colors = colors.tobytes()
+    if visible is not None:
+        boxes.visible = visible.astype("uint8").tobytes()
+
+    update_obj = server_pb2.UpdateObject()
+    update_obj.target = str(uuid)
+    update_obj.boxes.CopyFrom(boxes)
+    _send_update(self, update_obj)
+
+
+def update_overlay(
+    self: PointCloudViewer,
+    uuid: UUID,
+    position: Optional[Tuple[float, float, float]] = None,
+    text: Optional[str] = None,
+) -> None:
+    """表示中のオーバーレイの位置や文字列を変更する。オーバーレイを作り直さないので、毎フレーム呼び出せる。
+
+    Args:
+        uuid (UUID): 変更するオーバーレイのID
+        position (Optional[Tuple[float, float, float]], optional): オーバーレイが追従する点の新しいx,y,z座標。
+            画面に固定されたオーバーレイではzは無視される。指定しない場合は変更しない。
+        text (Optional[str], optional): send_overlay_text で表示した文字列の新しい内容。スタイルは変更されない。
+            指定しない場合は変更しない。
+    """
+    overlay = server_pb2.UpdateObject.Overlay()
+    if position is not None:
+        if not (len(position) == 3 and all(isinstance(m, (int, float)) for m in position)):
+            raise ValueError("position must be tuple of type (x: float, y: float, z: float)")
+        overlay.position.x = position[0]
+        overlay.position.y = position[1]
+        overlay.position.z = position[2]
+    if text is not None:
+        overlay.text_html = html.escape(text).replace("\n", "<br />\n")
+
+    update_obj = server_pb2.UpdateObject()
+    update_obj.target = str(uuid)
+    update_obj.overlay.CopyFrom(overlay)
+    _send_update(self, update_obj)
+
+
+def update_image(
+    self: PointCloudViewer,
+    uuid: UUID,
+    data: bytes,
+) -> None:
+    """send_image で表示中の画像を差し替える。平面やマテリアルは作り直さず、テクスチャのみを置き換える。
+
+    Args:
+        uuid (UUID): 変更する画像のID
+        data (bytes): 新しい画像データ。jpg,pngに対応
+    """
+    image = server_pb2.UpdateObject.Image()
+    image.data = data
+
+    update_obj = server_pb2.UpdateObject()
+    update_obj.target = str(uuid)
+    update_obj.image.CopyFrom(image)
+    _send_update(self, update_obj)
+
+
+def update_mesh(
+    self: PointCloudViewer,
+    uuid: UUID,
+    xyz: Optional[numpy.ndarray] = None,
+    rgb: Optional[numpy.ndarray] = None,
+) -> None:
+    """send_mesh で表示中のMeshの頂点の座標や色を書き換える。三角形の構成は変更できない。
+
+    Args:
+        uuid (UUID): 変更するMeshのID
+        xyz (Optional[numpy.ndarray], optional): shape が (num_points,3) で dtype が float32 の ndarray 。
+            各行が頂点の新しいx,y,z座標を表す。頂点数は send_mesh で送信したものと同じでなければならない。
+        rgb (Optional[numpy.ndarray], optional): shape が (num_points,3) で dtype が uint8 の ndarray 。各行が頂点の新しいr,g,bを表す。
+    """
+    if xyz is not None and not (len(xyz.shape) == 2 and xyz.shape[1] == 3 and xyz.dtype == "float32"):
+        raise ValueError("xyz must be float32 array of shape (num_points,3)")
+    if rgb is not None and not (len(rgb.shape) == 2 and rgb.shape[1] == 3 and rgb.dtype == "uint8"):
+        raise ValueError("rgb must be uint8 array of shape (num_points,3)")
+    if xyz is not None and rgb is not None and xyz.shape != rgb.shape:
+        raise ValueError("xyz and rgb must have the same number of points")
+
+    mesh = server_pb2.UpdateObject.Mesh()
+    if xyz is not None:
+        mesh.positions = xyz.astype("<f4").tobytes()
+    if rgb is not None:
+        mesh.colors = rgb.tobytes()
+
+    update_obj = server_pb2.UpdateObject()
+    update_obj.target = str(uuid)
+    update_obj.mesh.CopyFrom(mesh)
+    _send_update(self, update_obj)
+
+
+def _send_update(self: PointCloudViewer, update_obj: server_pb2.UpdateObject) -> None:
+    obj = server_pb2.ServerCommand()
+    obj.update_object.CopyFrom(update_obj)
+
+    command_uuid = uuid4()
+    self._send_data(obj, command_uuid)
+    ret = self._wait_until(command_uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    _record_update(self, UUID(update_obj.target), obj.ByteSize())
@@ -33,6 +33,31 @@ def console_log(
         raise RuntimeError(ret.result.failure)
 
 
+def measure_frame_time(
+    self: PointCloudViewer,
+    num_frames: int = 60,
+) -> float:
+    """ブラウザ上で描画を繰り返し、1フレームの描画にかかる平均時間を計測する。
+
+    :param num_frames: 描画する回数
+    :type num_frames: int, optional
+    :return: 1フレームあたりの描画時間(ミリ秒)
+    :rtype: float
+    """
+    if num_frames <= 0:
+        raise ValueError("num_frames must be positive")
+    obj = server_pb2.ServerCommand()
+    obj.measure_frame_time = num_frames
+    uuid = uuid4()
+    self._send_data(obj, uuid)
+    ret = self._wait_until(uuid)
+    if ret.result.HasField("failure"):
+        raise RuntimeError(ret.result.failure)
+    if not ret.result.HasField("success"):
+        raise RuntimeError("unexpected response")
+    return float(ret.result.success)
+
+
 def start(self: PointCloudViewer) -> None:
     """
     サーバープロセスを起動する。
@@ -0,0 +1,207 @@
+import io
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+from PIL import Image
+
+from cumo.object_info import ObjectInfo
+from cumo._vendor.pypcd import pypcd
+from cumo._internal.protobuf import server_pb2
+
+# pylint: disable=no-member
+
+# クライアントの GPU_LINESET_MIN_NUM_LINES と同じ値
+GPU_LINESET_MIN_NUM_LINES = 1000
+# 線分1本あたり4頂点分の位置、反対側の端点、辺、色(rgba)、幅と6個のインデックス
+GPU_LINE_BYTES = 4 * (12 + 12 + 4 + 16 + 4) + 6 * 4
+# 頂点あたりの位置、法線、色(rgba)
+MESH_VERTEX_BYTES = 12 + 12 + 16
+# インスタンスあたりの変換行列と色(rgba)
+INSTANCE_BYTES = 64 + 16
+
+
+class ObjectRegistry:
+    """送信したオブジェクトの情報を、最後に表示した時刻が古い順に保持する。"""
+
+    def __init__(self) -> None:
+        self._objects: "OrderedDict[UUID, ObjectInfo]" = OrderedDict()
+        # 点群の1点あたりのGPUメモリ。点数が変わったときに gpu_bytes を求め直すのに使う
+        self._point_bytes: Dict[UUID, int] = {}
+        # set_parent で設定した子から親への対応
+        self._parents: Dict[UUID, UUID] = {}
+
+    def add(self, uuid: UUID, add_obj: server_pb2.AddObject, wire_bytes: int) -> ObjectInfo:
+        (num_elements, gpu_bytes, point_bytes) = _estimate(add_obj)
+        info = ObjectInfo(
+            uuid=uuid,
+            type=str(add_obj.WhichOneof("Object")),
+            num_elements=num_elements,
+            wire_bytes=wire_bytes,
+            gpu_bytes=gpu_bytes,
+            tags=tuple(add_obj.tags),
+            visible=True,
+        )
+        self._objects[uuid] = info
+        if point_bytes is not None:
+            self._point_bytes[uuid] = point_bytes
+        return info
+
+    def update(self, uuid: UUID, wire_bytes: int, num_points: Optional[int] = None) -> None:
+        """更新したオブジェクトを最後に表示したものとして扱う。点群の場合は更新後の点数を num_points に渡す。"""
+        info = self._objects.get(uuid)
+        if info is None:
+            return
+        info = replace(info, wire_bytes=info.wire_bytes + wire_bytes)
+        point_bytes = self._point_bytes.get(uuid)
+        if num_points is not None and point_bytes is not None:
+            info = replace(info, num_elements=num_points, gpu_bytes=num_points * point_bytes)
+        self._objects[uuid] = info
+        if info.visible:
+            self._objects.move_to_end(uuid)
+
+    def set_visible(self, uuids: Iterable[UUID], visible: bool) -> None:
+        for uuid in uuids:
+            info = self._objects.get(uuid)
+            if info is None:
+                continue
+            self._objects[uuid] = replace(info, visible=visible)
+            if visible:
+                self._objects.move_to_end(uuid)
+
+    def resolve(self, target: Union[UUID, str, Sequence[UUID]]) -> List[UUID]:
+        """set_visible などの対象の指定を、オブジェクトのIDのリストにする。文字列はタグとして扱う。"""
+        if isinstance(target, UUID):
+            return [target]
+        if isinstance(target, str):
+            return [uuid for (uuid, info) in self._objects.items() if target in info.tags]
+        return list(target)
+
+    def set_parent(self, uuid: UUID, parent: Optional[UUID]) -> None:
+        if parent is None:
+            self._parents.pop(uuid, None)
+        else:
+            self._parents[uuid] = parent
+
+    def ancestors(self, uuid: UUID) -> List[UUID]:
+        """親、親の親、…のIDを近い順に返す。"""
+        ancestors: List[UUID] = []
+        parent = self._parents.get(uuid)
+        while parent is not None and parent not in ancestors:
+            ancestors.append(parent)
+            parent = self._parents.get(parent)
+        return ancestors
+
+    def get(self, uuid: UUID) -> Optional[ObjectInfo]:
+        return self._objects.get(uuid)
+
+    def remove(self, uuids: Iterable[UUID]) -> None:
+        for uuid in uuids:
+            self._objects.pop(uuid, None)
+            self._point_bytes.pop(uuid, None)
+            self._parents.pop(uuid, None)
+
+    def clear(self) -> None:
+        self._objects.clear()
+        self._point_bytes.clear()
+        self._parents.clear()
+
+    def objects(self) -> List[ObjectInfo]:
+        return list(self._objects.values())
+
+    def gpu_bytes(self) -> int:
+        return sum(info.gpu_bytes for info in self._objects.values())
+
+
+# 要素数、GPUメモリの見積もり、点群の場合は1点あたりのGPUメモリ
+_Estimate = Tuple[int, int, Optional[int]]
+
+
+def _estimate(add_obj: server_pb2.AddObject) -> _Estimate:
+    """オブジェクトの要素数、GPUメモリの見積もり、点群の場合は1点あたりのGPUメモリを求める。"""
+    kind = add_obj.WhichOneof("Object")
+    estimator = _ESTIMATORS.get(str(kind))
+    if estimator is None:
+        # DOMのオーバーレイとグループはGPUメモリを使わない
+        return (1 if kind == "overlay" else 0, 0, None)
+    return estimator(add_obj)
+
+
+def _estimate_point_cloud(add_obj: server_pb2.AddObject) -> _Estimate:
+    cloud = add_obj.point_cloud
+    if cloud.HasField("quantized_positions"):
+        num_points = len(cloud.quantized_positions.positions) // 6
+        point_bytes = 6
+        has_rgb = len(cloud.colors) > 0
+    else:
+        (metadata, _) = pypcd.read_header(cloud.pcd_data)
+        num_points = metadata["points"]
+        point_bytes = 12
+        has_rgb = "rgb" in metadata["fields"]
+    # rgb は持っている場合のみ。スカラー値とラベルは float32 で保持される
+    point_bytes += (3 if has_rgb else 0) + 4 * len(cloud.scalar_fields) + (4 if cloud.HasField("labels") else 0)
+    return (num_points, num_points * point_bytes, point_bytes)
+
+
+def _estimate_line_set(add_obj: server_pb2.AddObject) -> _Estimate:
+    lineset = add_obj.line_set
+    if lineset.packed_positions:
+        num_vertices = len(lineset.packed_positions) // 12
+        num_lines = len(lineset.packed_indices) // 8
+    else:
+        num_vertices = len(lineset.points)
+        num_lines = len(lineset.from_index)
+    renderer = lineset.renderer
+    on_gpu = renderer == server_pb2.AddObject.LineSet.Renderer.GPU or (
+        renderer == server_pb2.AddObject.LineSet.Renderer.AUTO and num_lines >= GPU_LINESET_MIN_NUM_LINES)
+    return (num_vertices, num_lines * GPU_LINE_BYTES if on_gpu else 0, None)
+
+
+def _estimate_mesh(add_obj: server_pb2.AddObject) -> _Estimate:
+    mesh = add_obj.mesh
+    if mesh.packed_positions:
+        num_vertices = len(mesh.packed_positions) // 12
+        num_indices = len(mesh.packed_indices) // 4
+    else:
+        num_vertices = len(mesh.points)
+        num_indices = len(mesh.vertex_a_index) * 3
+    return (num_vertices, num_vertices * MESH_VERTEX_BYTES + num_indices * 4, None)
+
+
+def _estimate_image(add_obj: server_pb2.AddObject) -> _Estimate:
+    (width, height) = _image_size(add_obj.image.data)
+    return (width * height, width * height * 4, None)
+
+
+def _estimate_boxes(add_obj: server_pb2.AddObject) -> _Estimate:
+    num_boxes = len(add_obj.boxes.centers) // 12
+    return (num_boxes, num_boxes * INSTANCE_BYTES, None)
+
+
+def _estimate_glyphs(add_obj: server_pb2.AddObject) -> _Estimate:
+    num_glyphs = len(add_obj.glyphs.positions) // 12
+    return (num_glyphs, num_glyphs * INSTANCE_BYTES, None)
+
+
+def _estimate_overlay_texts(add_obj: server_pb2.AddObject) -> _Estimate:
+    return (len(add_obj.overlay_texts.texts), 0, None)
+
+
+_ESTIMATORS: Dict[str, Callable[[server_pb2.AddObject], _Estimate]] = {
+    "point_cloud": _estimate_point_cloud,
+    "line_set": _estimate_line_set,
+    "mesh": _estimate_mesh,
+    "image": _estimate_image,
+    "boxes": _estimate_boxes,
+    "glyphs": _estimate_glyphs,
+    "overlay_texts": _estimate_overlay_texts,
+}
+
+
+def _image_size(data: bytes) -> Tuple[int, int]:
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+    except OSError:
+        return (0, 0)
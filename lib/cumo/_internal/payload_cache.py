@@ -0,0 +1,70 @@
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import numpy
+
+from cumo.cache_stats import CacheStats
+
+
+class PayloadCache:
+    """シリアライズ済みのデータを、合計バイト数に上限を設けてLRUで保持するキャッシュ。"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self._entries: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._max_bytes = max_bytes
+        self._num_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: bytes, value: bytes) -> None:
+        # 上限より大きいデータは、他のエントリを全て追い出すことになるので保持しない
+        if len(value) > self._max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._num_bytes -= len(old)
+        self._entries[key] = value
+        self._num_bytes += len(value)
+        while self._num_bytes > self._max_bytes:
+            (_, evicted) = self._entries.popitem(last=False)
+            self._num_bytes -= len(evicted)
+            self._evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._num_bytes = 0
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            num_entries=len(self._entries),
+            num_bytes=self._num_bytes,
+            max_bytes=self._max_bytes,
+        )
+
+
+def fingerprint(arrays: Iterable[Optional[numpy.ndarray]], params: Iterable[object]) -> bytes:
+    """配列の内容とパラメータから、キャッシュのキーにするハッシュ値を求める。"""
+    # ハードウェア支援のあるCPUではsha256が最も速い
+    h = hashlib.sha256()
+    for array in arrays:
+        if array is None:
+            h.update(b"None")
+            continue
+        h.update(repr((array.dtype.str, array.shape)).encode())
+        h.update(numpy.ascontiguousarray(array).data)
+    h.update(repr(tuple(params)).encode())
+    return h.digest()
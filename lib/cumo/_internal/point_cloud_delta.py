@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy
+
+
+@dataclass
+class PointCloudDelta:
+    """前回のフレームから次のフレームへの差分。インデックスはすべて前回のフレームの点を指す。"""
+    clear: bool
+    remove_indices: numpy.ndarray  # uint32
+    change_indices: numpy.ndarray  # uint32
+    change_colors: numpy.ndarray  # shape (num_changes,3), uint8
+    add_xyz: numpy.ndarray  # shape (num_adds,3), float32
+    add_rgb: numpy.ndarray  # shape (num_adds,3), uint8
+    # 差分を適用した後にクライアントが保持している点群
+    xyz: numpy.ndarray
+    rgb: numpy.ndarray
+
+
+def full_point_cloud_delta(xyz: numpy.ndarray, rgb: numpy.ndarray) -> PointCloudDelta:
+    empty = numpy.empty((0,), dtype=numpy.uint32)
+    return PointCloudDelta(
+        clear=True,
+        remove_indices=empty,
+        change_indices=empty,
+        change_colors=numpy.empty((0, 3), dtype=numpy.uint8),
+        add_xyz=xyz,
+        add_rgb=rgb,
+        xyz=xyz,
+        rgb=rgb,
+    )
+
+
+def compute_point_cloud_delta(
+    prev_xyz: numpy.ndarray,
+    prev_rgb: numpy.ndarray,
+    xyz: numpy.ndarray,
+    rgb: numpy.ndarray,
+    voxel_size: Optional[float],
+) -> PointCloudDelta:
+    """2つのフレームの差分を求める。
+
+    voxel_size が None の場合は座標が完全に一致する点を、そうでない場合は同じボクセルに入る点を同一の点とみなす。
+    同じボクセルに複数の点がある場合は、ボクセル内での出現順によって対応付ける。
+    同一とみなされた点は前回のフレームの座標のまま残り、色が異なる場合のみ色の変更として扱われる。
+    """
+    num_prev = prev_xyz.shape[0]
+    num_next = xyz.shape[0]
+    if num_prev == 0 or num_next == 0:
+        return full_point_cloud_delta(xyz, rgb)
+
+    keys = numpy.concatenate((_point_keys(prev_xyz, voxel_size), _point_keys(xyz, voxel_size)))
+    _, ids = numpy.unique(keys, axis=0, return_inverse=True)
+    ids = ids.reshape(-1).astype(numpy.int64)
+
+    multiplier = max(num_prev, num_next) + 1
+    prev_keys = ids[:num_prev] * multiplier + _occurrence_rank(ids[:num_prev])
+    next_keys = ids[num_prev:] * multiplier + _occurrence_rank(ids[num_prev:])
+    _, prev_matched, next_matched = numpy.intersect1d(
+        prev_keys, next_keys, assume_unique=True, return_indices=True
+    )
+
+    removed = numpy.ones((num_prev,), dtype=bool)
+    removed[prev_matched] = False
+    added = numpy.ones((num_next,), dtype=bool)
+    added[next_matched] = False
+
+    changed = numpy.any(prev_rgb[prev_matched] != rgb[next_matched], axis=1)
+    change_indices = prev_matched[changed]
+    change_colors = rgb[next_matched[changed]]
+
+    add_xyz = xyz[added]
+    add_rgb = rgb[added]
+
+    # 差分の方が大きくなる場合は全点を送り直す
+    delta_bytes = 4 * int(numpy.count_nonzero(removed)) + 7 * change_indices.shape[0] + 15 * add_xyz.shape[0]
+    if delta_bytes >= 15 * num_next:
+        return full_point_cloud_delta(xyz, rgb)
+
+    next_rgb = prev_rgb.copy()
+    next_rgb[change_indices] = change_colors
+    return PointCloudDelta(
+        clear=False,
+        remove_indices=numpy.flatnonzero(removed).astype(numpy.uint32),
+        change_indices=change_indices.astype(numpy.uint32),
+        change_colors=change_colors,
+        add_xyz=add_xyz,
+        add_rgb=add_rgb,
+        xyz=numpy.concatenate((prev_xyz[~removed], add_xyz)),
+        rgb=numpy.concatenate((next_rgb[~removed], add_rgb)),
+    )
+
+
+def _point_keys(xyz: numpy.ndarray, voxel_size: Optional[float]) -> numpy.ndarray:
+    if voxel_size is None:
+        return numpy.ascontiguousarray(xyz, dtype=numpy.float32).view(numpy.uint32)
+    return numpy.floor(xyz / voxel_size).astype(numpy.int64)
+
+
+def _occurrence_rank(ids: numpy.ndarray) -> numpy.ndarray:
+    """各要素が、同じ値を持つ要素の中で何番目に現れたかを返す。"""
+    order = numpy.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    is_start = numpy.empty(sorted_ids.shape, dtype=bool)
+    is_start[:1] = True
+    is_start[1:] = sorted_ids[1:] != sorted_ids[:-1]
+    starts = numpy.flatnonzero(is_start)
+    counts = numpy.diff(numpy.append(starts, sorted_ids.shape[0]))
+    rank = numpy.empty(ids.shape, dtype=numpy.int64)
+    rank[order] = numpy.arange(ids.shape[0]) - numpy.repeat(starts, counts)
+    return rank
@@ -0,0 +1,70 @@
+import numpy
+
+from cumo._internal.protobuf import server_pb2
+
+QUANTIZATION_CHUNK_SIZE = 4096
+_QUANTIZATION_LEVELS = 65535
+_MORTON_BITS = 21
+
+# pylint: disable=no-member
+
+
+def spatial_order(xyz: numpy.ndarray) -> numpy.ndarray:
+    """近い点が近くに並ぶような点の順番をモートン順序で求める。
+
+    量子化の前にこの順番に並べ替えておくと、各チャンクの範囲が小さくなり精度を保ちやすくなる。
+    """
+    if xyz.shape[0] == 0:
+        return numpy.empty((0,), dtype=numpy.int64)
+    lower = xyz.min(axis=0)
+    extent = numpy.maximum(xyz.max(axis=0) - lower, 1e-20)
+    cells = ((xyz - lower) / extent * ((1 << _MORTON_BITS) - 1)).astype(numpy.uint64)
+    code = _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << numpy.uint64(1)) \
+        | (_spread_bits(cells[:, 2]) << numpy.uint64(2))
+    return numpy.argsort(code, kind="stable")
+
+
+def quantize_positions(xyz: numpy.ndarray, precision: float) -> server_pb2.QuantizedPositions:
+    """点の座標をチャンクごとに uint16 に量子化する。
+
+    各チャンクの量子化の幅は precision だが、チャンクの範囲が 65535 * precision を超える軸ではそれより粗くなる。
+    """
+    num_points = xyz.shape[0]
+    num_chunks = -(-num_points // QUANTIZATION_CHUNK_SIZE)
+    padded = numpy.empty((num_chunks * QUANTIZATION_CHUNK_SIZE, 3), dtype=numpy.float64)
+    padded[:num_points] = xyz
+    # 端数のチャンクは最後の点で埋めて範囲に影響しないようにする
+    padded[num_points:] = xyz[-1] if num_points > 0 else 0
+    chunked = padded.reshape((num_chunks, QUANTIZATION_CHUNK_SIZE, 3))
+
+    # クライアントではfloat32で復元するので、丸めた後の値で量子化する
+    origins = chunked.min(axis=1).astype(numpy.float32).astype(numpy.float64)
+    scales = numpy.maximum((chunked.max(axis=1) - origins) / _QUANTIZATION_LEVELS, precision)
+    scales = scales.astype(numpy.float32).astype(numpy.float64)
+    quantized = numpy.rint((chunked - origins[:, None, :]) / scales[:, None, :])
+    quantized = numpy.clip(quantized, 0, _QUANTIZATION_LEVELS).reshape(-1, 3)[:num_points]
+
+    message = server_pb2.QuantizedPositions()
+    message.chunk_size = QUANTIZATION_CHUNK_SIZE
+    message.chunks = numpy.column_stack((origins, scales)).astype("<f4").tobytes()
+    message.positions = quantized.astype("<u2").tobytes()
+    return message
+
+
+def dequantize_positions(message: server_pb2.QuantizedPositions) -> numpy.ndarray:
+    """quantize_positions で量子化した座標を、クライアントと同じようにfloat32で復元する。"""
+    quantized = numpy.frombuffer(message.positions, dtype="<u2").reshape(-1, 3).astype(numpy.float32)
+    chunks = numpy.frombuffer(message.chunks, dtype="<f4").reshape(-1, 6)
+    chunk_indices = numpy.arange(quantized.shape[0]) // message.chunk_size
+    return chunks[chunk_indices, :3] + quantized * chunks[chunk_indices, 3:]
+
+
+def _spread_bits(v: numpy.ndarray) -> numpy.ndarray:
+    """下位21ビットを3ビットおきに配置する。"""
+    v = v & numpy.uint64(0x1fffff)
+    v = (v | (v << numpy.uint64(32))) & numpy.uint64(0x1f00000000ffff)
+    v = (v | (v << numpy.uint64(16))) & numpy.uint64(0x1f0000ff0000ff)
+    v = (v | (v << numpy.uint64(8))) & numpy.uint64(0x100f00f00f00f00f)
+    v = (v | (v << numpy.uint64(4))) & numpy.uint64(0x10c30c30c30c30c3)
+    v = (v | (v << numpy.uint64(2))) & numpy.uint64(0x1249249249249249)
+    return v
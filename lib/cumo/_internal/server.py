@@ -66,7 +66,7 @@ def multiprocessing_worker(
     host: str,
     websocket_port: int,
     http_port: int,
-    websocket_broadcasting_queue: "multiprocessing.Queue[str]",
+    websocket_broadcasting_queue: "multiprocessing.Queue[bytes]",
     websocket_message_queue: "multiprocessing.Queue[bytes]",
 ):
     websocket_connection: Optional[websockets.server.WebSocketServerProtocol] = None
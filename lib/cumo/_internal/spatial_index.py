@@ -0,0 +1,137 @@
+from typing import Optional, Tuple
+
+import numpy
+
+# セルの大きさを指定しない場合、1セルあたりの平均点数がこのくらいになるようにする
+_POINTS_PER_CELL = 8
+# セルの座標を1つの整数にまとめたときに int64 に収まるようにする
+_MAX_NUM_CELLS = 1 << 62
+
+
+class SpatialIndex:
+    """点群の点を一様なボクセルのセルに分けて、セルの番号順に並べた索引。
+
+    セルの番号を整列した配列と各セルの点の範囲を持つので、numpyのベクトル演算だけで構築と検索ができる。
+    """
+
+    def __init__(self, xyz: numpy.ndarray, cell_size: Optional[float] = None) -> None:
+        self.positions = numpy.ascontiguousarray(xyz, dtype=numpy.float64)
+        num_points = self.positions.shape[0]
+        if num_points == 0:
+            self._lower = numpy.zeros(3)
+        else:
+            self._lower = self.positions.min(axis=0)
+        extent = self.positions.max(axis=0) - self._lower if num_points > 0 else numpy.zeros(3)
+        if cell_size is None:
+            cell_size = _default_cell_size(extent, num_points)
+        elif not cell_size > 0:
+            raise ValueError("cell_size must be positive")
+        # 点の範囲が広すぎてセルの番号が int64 に収まらない場合はセルを大きくする
+        while numpy.prod(numpy.floor(extent / cell_size) + 1) >= _MAX_NUM_CELLS:
+            cell_size *= 2
+        self.cell_size = float(cell_size)
+        self._dims = (numpy.floor(extent / self.cell_size) + 1).astype(numpy.int64)
+
+        keys = self._keys(self._cells_of(self.positions))
+        self._order = numpy.argsort(keys, kind="stable")
+        sorted_keys = keys[self._order]
+        # 点のあるセルの番号と、そのセルの点が _order の starts[i]:starts[i+1] にあること
+        (self._cell_keys, starts) = numpy.unique(sorted_keys, return_index=True)
+        self._starts = numpy.append(starts, num_points)
+
+    @property
+    def num_points(self) -> int:
+        return self.positions.shape[0]
+
+    def query_radius(self, center: numpy.ndarray, radius: float) -> numpy.ndarray:
+        """center からの距離が radius 以下の点の番号を昇順に返す。"""
+        center = numpy.asarray(center, dtype=numpy.float64)
+        candidates = self._candidates(center - radius, center + radius)
+        distances = numpy.sum((self.positions[candidates] - center) ** 2, axis=1)
+        return numpy.sort(candidates[distances <= radius * radius])
+
+    def query_box(self, lower: numpy.ndarray, upper: numpy.ndarray) -> numpy.ndarray:
+        """lower 以上 upper 以下の範囲にある点の番号を昇順に返す。"""
+        lower = numpy.asarray(lower, dtype=numpy.float64)
+        upper = numpy.asarray(upper, dtype=numpy.float64)
+        candidates = self._candidates(lower, upper)
+        p = self.positions[candidates]
+        inside = numpy.all((p >= lower) & (p <= upper), axis=1)
+        return numpy.sort(candidates[inside])
+
+    def nearest(self, points: numpy.ndarray, k: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """points の各点から近い順に k 点の距離と番号を返す。どちらも shape は (num_queries, k) 。"""
+        num_queries = points.shape[0]
+        distances = numpy.empty((num_queries, k), dtype=numpy.float64)
+        indices = numpy.empty((num_queries, k), dtype=numpy.int64)
+        for (i, point) in enumerate(numpy.asarray(points, dtype=numpy.float64)):
+            (distances[i], indices[i]) = self._nearest_one(point, k)
+        return (distances, indices)
+
+    def _nearest_one(self, point: numpy.ndarray, k: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        # k 点以上見つかるまで探すセルの範囲を広げ、見つかった k 番目の距離の球に含まれる点から選び直す
+        half_width = self.cell_size
+        while True:
+            candidates = self._candidates(point - half_width, point + half_width)
+            if candidates.shape[0] >= k or self._covers_all(point, half_width):
+                break
+            half_width *= 2
+        squared = numpy.sum((self.positions[candidates] - point) ** 2, axis=1)
+        radius = numpy.sqrt(numpy.partition(squared, k - 1)[k - 1])
+        if radius > half_width:
+            candidates = self._candidates(point - radius, point + radius)
+            squared = numpy.sum((self.positions[candidates] - point) ** 2, axis=1)
+        nearest = numpy.argpartition(squared, k - 1)[:k]
+        nearest = nearest[numpy.lexsort((candidates[nearest], squared[nearest]))]
+        return (numpy.sqrt(squared[nearest]), candidates[nearest])
+
+    def _covers_all(self, point: numpy.ndarray, half_width: float) -> bool:
+        upper = self._lower + self._dims * self.cell_size
+        return bool(numpy.all(point - half_width <= self._lower) and numpy.all(point + half_width >= upper))
+
+    def _cells_of(self, xyz: numpy.ndarray) -> numpy.ndarray:
+        return numpy.floor((xyz - self._lower) / self.cell_size).astype(numpy.int64)
+
+    def _keys(self, cells: numpy.ndarray) -> numpy.ndarray:
+        return (cells[..., 0] * self._dims[1] + cells[..., 1]) * self._dims[2] + cells[..., 2]
+
+    def _candidates(self, lower: numpy.ndarray, upper: numpy.ndarray) -> numpy.ndarray:
+        """lower から upper の範囲と重なるセルにある点の番号を返す。"""
+        if self.num_points == 0:
+            return numpy.zeros((0,), dtype=numpy.int64)
+        low = numpy.maximum(self._cells_of(lower), 0)
+        high = numpy.minimum(self._cells_of(upper), self._dims - 1)
+        if numpy.any(high < low):
+            return numpy.zeros((0,), dtype=numpy.int64)
+        num_cells = int(numpy.prod(high - low + 1))
+        if num_cells <= self._cell_keys.shape[0]:
+            # 範囲内のセルの番号を列挙して、点のあるセルを二分探索する
+            axes = [numpy.arange(low[d], high[d] + 1) for d in range(3)]
+            cells = numpy.stack(numpy.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+            keys = self._keys(cells)
+            found = numpy.searchsorted(self._cell_keys, keys)
+            in_range = found < self._cell_keys.shape[0]
+            found = found[in_range]
+            found = found[self._cell_keys[found] == keys[in_range]]
+        else:
+            # 範囲が広い場合は、点のあるセルのうち範囲内のものを選ぶ
+            cells = numpy.stack(numpy.unravel_index(self._cell_keys, tuple(self._dims)), axis=-1)
+            found = numpy.flatnonzero(numpy.all((cells >= low) & (cells <= high), axis=1))
+        return self._order[_concatenate_ranges(self._starts[found], self._starts[found + 1])]
+
+
+def _default_cell_size(extent: numpy.ndarray, num_points: int) -> float:
+    # 平面的な点群でもセルが細かくなりすぎないように、薄い軸の幅は最も広い軸の 1/1000 とみなす
+    widest = float(extent.max()) if extent.size > 0 else 0.0
+    if widest <= 0 or num_points == 0:
+        return 1.0
+    volume = float(numpy.prod(numpy.maximum(extent, widest * 1e-3)))
+    return (volume * _POINTS_PER_CELL / num_points) ** (1 / 3)
+
+
+def _concatenate_ranges(starts: numpy.ndarray, ends: numpy.ndarray) -> numpy.ndarray:
+    """starts[i]:ends[i] の範囲の整数を連結した配列を作る。"""
+    lengths = ends - starts
+    # 連結した配列での各範囲の先頭の位置を引いておき、通し番号を足す
+    heads = numpy.cumsum(lengths) - lengths
+    return numpy.repeat(starts - heads, lengths) + numpy.arange(int(lengths.sum()), dtype=numpy.int64)
@@ -10,6 +10,7 @@ dimatura@cmu.edu, 2013-2018
 """
 
 import re
+import mmap
 import struct
 import copy
 import numpy as np
@@ -35,6 +36,11 @@ __all__ = ['PointCloud',
            'point_cloud_from_path',
            'point_cloud_from_buffer',
            'point_cloud_from_fileobj',
+           'read_header',
+           'read_header_from_fileobj',
+           'iter_binary_pc_data_chunks',
+           'pc_fields_from_buffer',
+           'pc_fields_from_path',
            'make_xyz_point_cloud',
            'make_xyz_rgb_point_cloud',
            'make_xyz_label_point_cloud',
@@ -243,8 +249,11 @@ def parse_ascii_pc_data(f, dtype, metadata):
 def parse_binary_pc_data(f, dtype, metadata):
     rowstep = metadata['points']*dtype.itemsize
     # for some reason pcl adds empty space at the end of files
-    buf = f.read(rowstep)
-    return np.fromstring(buf, dtype=dtype)
+    # read directly into a writable buffer to avoid an extra copy
+    buf = bytearray(rowstep)
+    if f.readinto(buf) != rowstep:
+        raise IOError('Error reading data')
+    return np.frombuffer(buf, dtype=dtype)
 
 
 def parse_binary_compressed_pc_data(f, dtype, metadata):
@@ -259,10 +268,12 @@ def parse_binary_compressed_pc_data(f, dtype, metadata):
     compressed_size, uncompressed_size =\
         struct.unpack(fmt, f.read(struct.calcsize(fmt)))
     compressed_data = f.read(compressed_size)
-    # TODO what to use as second argument? if buf is None
-    # (compressed > uncompressed)
-    # should we read buf as raw binary?
-    buf = lzf.decompress(compressed_data, uncompressed_size)
+    if compressed_size == uncompressed_size:
+        # point_cloud_to_fileobj stores the data as is when
+        # compression didn't shrink it
+        buf = compressed_data
+    else:
+        buf = lzf.decompress(compressed_data, uncompressed_size)
     if len(buf) != uncompressed_size:
         raise IOError('Error decompressing data')
     # the data is stored field-by-field
@@ -271,28 +282,49 @@ def parse_binary_compressed_pc_data(f, dtype, metadata):
     for dti in range(len(dtype)):
         dt = dtype[dti]
         bytes = dt.itemsize * metadata['width']
-        column = np.fromstring(buf[ix:(ix+bytes)], dt)
+        column = np.frombuffer(buf, dt, count=metadata['width'], offset=ix)
         pc_data[dtype.names[dti]] = column
         ix += bytes
     return pc_data
 
 
+def read_header_from_fileobj(f):
+    """ Read and parse the header of PCD data in file object f.
+    Afterwards f is positioned at the beginning of the data.
+    """
+    header = []
+    while True:
+        ln = f.readline()
+        if len(ln) == 0:
+            raise ValueError("Could not parse header")
+        ln = ln.strip()
+        if not isinstance(ln, str):
+            ln = ln.decode('utf-8')
+        header.append(ln)
+        if ln.startswith('DATA'):
+            return parse_header(header)
+
+
+def iter_binary_pc_data_chunks(f, dtype, metadata, chunk_size):
+    """ Yield structured arrays of at most chunk_size points from binary
+    data in file object f, so that the whole point cloud is never held in
+    memory at once.
+    """
+    remaining = metadata['points']
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        buf = bytearray(n*dtype.itemsize)
+        if f.readinto(buf) != len(buf):
+            raise IOError('Error reading data')
+        yield np.frombuffer(buf, dtype=dtype)
+        remaining -= n
+
+
 def point_cloud_from_fileobj(f):
     """ Parse pointcloud coming from file object f
     """
-    header = []
-    try:
-        while True:
-            ln = f.readline().strip()
-            if not isinstance(ln, str):
-                ln = ln.decode('utf-8')
-            header.append(ln)
-            if ln.startswith('DATA'):
-                metadata = parse_header(header)
-                dtype = _build_dtype(metadata)
-                break
-    except StopIteration:
-        raise ValueError("Could not parse header")
+    metadata = read_header_from_fileobj(f)
+    dtype = _build_dtype(metadata)
     if metadata['data'] == 'ascii':
         pc_data = parse_ascii_pc_data(f, dtype, metadata)
     elif metadata['data'] == 'binary':
@@ -326,6 +358,73 @@ def point_cloud_from_string(string):
     return pc
 
 
+def read_header(buf):
+    """ Parse header of PCD data in buf.
+    buf must support find(), e.g. bytes, bytearray or mmap.
+    Returns metadata and the offset where the data begins.
+    """
+    header = []
+    offset = 0
+    while True:
+        end = buf.find(b'\n', offset)
+        if end < 0:
+            raise ValueError("Could not parse header")
+        ln = bytes(buf[offset:end]).decode('utf-8').strip()
+        offset = end + 1
+        header.append(ln)
+        if ln.startswith('DATA'):
+            return parse_header(header), offset
+
+
+def pc_fields_from_buffer(buf):
+    """ Parse PCD data in buf without copying it.
+    Returns metadata and a dict from field name to numpy array.
+    For binary data the arrays are read-only views into buf. For
+    binary_compressed data they are views into a single decompressed buffer.
+    """
+    metadata, offset = read_header(buf)
+    dtype = _build_dtype(metadata)
+    points = metadata['points']
+    if metadata['data'] == 'binary':
+        pc_data = np.frombuffer(buf, dtype=dtype, count=points, offset=offset)
+        return metadata, dict((name, pc_data[name]) for name in dtype.names)
+    if metadata['data'] == 'binary_compressed':
+        fmt = 'II'
+        compressed_size, uncompressed_size = struct.unpack_from(fmt, buf, offset)
+        offset += struct.calcsize(fmt)
+        # lzf only accepts bytes, so the compressed data is copied once
+        compressed_data = bytes(buf[offset:(offset+compressed_size)])
+        if compressed_size == uncompressed_size:
+            # point_cloud_to_fileobj stores the data as is when
+            # compression didn't shrink it
+            decompressed = compressed_data
+        else:
+            decompressed = lzf.decompress(compressed_data, uncompressed_size)
+        if decompressed is None or len(decompressed) != uncompressed_size:
+            raise IOError('Error decompressing data')
+        # the data is stored field-by-field
+        fields = {}
+        ix = 0
+        for name in dtype.names:
+            dt = dtype.fields[name][0]
+            fields[name] = np.frombuffer(decompressed, dt, count=points, offset=ix)
+            ix += dt.itemsize * points
+        return metadata, fields
+    if metadata['data'] == 'ascii':
+        pc_data = parse_ascii_pc_data(BytesIO(buf[offset:]), dtype, metadata)
+        return metadata, dict((name, pc_data[name]) for name in dtype.names)
+    raise ValueError('unknown data type: %s' % metadata['data'])
+
+
+def pc_fields_from_path(fname):
+    """ Same as pc_fields_from_buffer, but maps the file into memory
+    instead of reading it. Pages are loaded only when they are accessed.
+    """
+    with open(fname, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return pc_fields_from_buffer(buf)
+
+
 def point_cloud_to_fileobj(pc, fileobj, data_compression=None):
     """ Write pointcloud as .pcd to fileobj.
     If data_compression is not None it overrides pc.data.
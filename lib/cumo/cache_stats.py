@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class CacheStats:
+    """キャッシュの利用状況。"""
+    hits: int
+    misses: int
+    evictions: int
+    num_entries: int
+    num_bytes: int
+    max_bytes: int
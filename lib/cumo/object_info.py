@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+from typing import Tuple
+from uuid import UUID
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """ブラウザに送信したオブジェクトの情報。"""
+    uuid: UUID
+    # "point_cloud", "line_set", "mesh", "image", "overlay", "boxes", "glyphs", "overlay_texts", "group" のいずれか
+    type: str
+    # 点群は点数、線分とMeshは頂点数、箱と形状と文字列は個数
+    num_elements: int
+    # 追加と更新で送信したコマンドの合計バイト数(圧縮前)
+    wire_bytes: int
+    # ブラウザで使われるGPUメモリの見積もり
+    gpu_bytes: int
+    tags: Tuple[str, ...]
+    visible: bool
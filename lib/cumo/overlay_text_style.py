@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class OverlayTextStyle:
+    """send_overlay_texts で描画する文字列の見た目。色はCSSの色の文字列で指定する。"""
+    color: str = "white"
+    font_size: float = 12
+    background: Optional[str] = None
@@ -0,0 +1,30 @@
+from enum import Enum
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+from cumo.camera_state import Vector3f
+
+
+class PickEventType(Enum):
+    CLICK = 1
+    HOVER = 2
+
+
+@dataclass
+class PickEvent:
+    """ブラウザでクリック、またはマウスカーソルを重ねたオブジェクトの情報。"""
+    type: PickEventType
+    # オブジェクトのID。何もない位置の場合はNone
+    object: Optional[UUID]
+    # 点群の点、線分、箱、形状の番号。ダウンサンプルした場合は表示している点の中での番号。
+    # Meshと画像、何もない位置の場合はNone
+    index: Optional[int]
+    # 点群の点のワールド座標。点群以外の場合はNone
+    position: Optional[Vector3f]
+    # canvas上の位置(CSSピクセル)
+    x: float
+    y: float
+    shiftKey: bool
+    altKey: bool
+    ctrlKey: bool
+    metaKey: bool
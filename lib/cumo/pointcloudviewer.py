@@ -2,24 +2,117 @@ __all__ = ["PointCloudViewer"]
 
 import multiprocessing
 from enum import Enum, auto
-from typing import Optional, Dict, Callable
+from typing import TYPE_CHECKING, Optional, Dict, Callable, Tuple
 from uuid import UUID
 
+import numpy
+
+if TYPE_CHECKING:
+    from cumo._internal.disk_cache import DiskCache
+    from cumo._internal.payload_cache import PayloadCache
+    from cumo._internal.spatial_index import SpatialIndex
+    from cumo._internal.object_registry import ObjectRegistry
+    from cumo.object_info import ObjectInfo
+
 # pylint: disable=import-outside-toplevel
 # mypy: disable-error-code=misc
 
 
 class DownSampleStrategy(Enum):
     NONE = auto()
+    # 重複なしにランダムに点を選ぶ
     RANDOM_SAMPLE = auto()
     VOXEL_GRID = auto()
+    # 座標のハッシュ値で点を選ぶ。フレーム間で共通する点は選ばれ続けるので、更新時に表示がちらつかない
+    HASH_SAMPLE = auto()
+    # 既に選んだ点から遠い点を順に選ぶ。点の密度によらず空間全体に点が行き渡る
+    FARTHEST_POINT = auto()
+    # 互いの距離が min_distance 以上になるように点を選ぶ
+    POISSON_DISK = auto()
+    # voxel_size のボクセルごとに、点数の平方根に比例する数の点を選ぶ。点の少ないボクセルは必ず残るので、ポールや電線のような細い構造が消えない
+    DENSITY_ADAPTIVE = auto()
 
     voxel_size: Optional[float]
+    min_distance: Optional[float]
+    seed: Optional[int]
+    num_workers: Optional[int]
+
+    def __init__(self, _value):
+        self.voxel_size = None
+        self.min_distance = None
+        self.seed = None
+        self.num_workers = None
 
     def set_voxel_size(self, voxel_size):
         self.voxel_size = voxel_size
         return self
 
+    def set_min_distance(self, min_distance):
+        self.min_distance = min_distance
+        return self
+
+    def set_seed(self, seed):
+        """乱数生成器(HASH_SAMPLE ではハッシュ関数)のシードを設定する。
+        Noneの場合、RANDOM_SAMPLE では呼び出しごとに異なる点が選ばれる。"""
+        self.seed = seed
+        return self
+
+    def set_num_workers(self, num_workers):
+        """ダウンサンプルに使うスレッド数を設定する。
+        RANDOM_SAMPLE, HASH_SAMPLE, VOXEL_GRID では点群を分割して並列に処理する。Noneまたは1の場合は並列化しない。
+        RANDOM_SAMPLE では分割した範囲ごとに点数に比例した数の点を選ぶので、同じシードでも並列化しない場合とは異なる点が選ばれる。"""
+        self.num_workers = num_workers
+        return self
+
+
+class Colormap(Enum):
+    """スカラー値を色に変換する際に使うカラーマップ。"""
+    VIRIDIS = auto()
+    TURBO = auto()
+    JET = auto()
+    GRAY = auto()
+
+
+class Compression(Enum):
+    """ブラウザに送信するデータの圧縮方法。"""
+    NONE = auto()
+    # 点群のpcdデータを binary_compressed 形式(LZF)にする
+    LZF = auto()
+    # コマンド全体をzlibで圧縮する
+    DEFLATE = auto()
+
+
+class LinesetRenderer(Enum):
+    """Linesetの描画方法。"""
+    # 線分の数が多い場合はGPU、少ない場合はCanvas2Dで描画する
+    AUTO = auto()
+    # 毎フレームCPUで投影してCanvas2Dに描画する。常に他の物体の手前に表示される
+    CANVAS = auto()
+    # 線分を画面上の四角形に展開してGPUで描画する。他の物体との前後関係が反映される
+    GPU = auto()
+
+
+class GlyphShape(Enum):
+    """send_glyphs で表示する形状。"""
+    # 直径1の球
+    SPHERE = auto()
+    # 原点から+x方向に伸びる長さ1の矢印
+    ARROW = auto()
+    # 原点から+x方向に伸びる長さ1の円錐
+    CONE = auto()
+    # 1辺の長さが1の立方体
+    CUBE = auto()
+
+
+class SelectionTool(Enum):
+    """add_selection_handler で点群の点を選択する範囲の描き方。"""
+    # ドラッグした範囲の長方形
+    BOX = auto()
+    # ドラッグした軌跡で囲んだ範囲
+    LASSO = auto()
+    # クリックした点を頂点とする多角形。最初の頂点のクリック、ダブルクリック、Enterで確定する
+    POLYGON = auto()
+
 
 class PointCloudViewer:
     """点群をブラウザで表示するためのサーバーを立ち上げるビューア。
@@ -38,8 +131,17 @@ class PointCloudViewer:
     _server_process: multiprocessing.Process
     _custom_handlers: Dict[str, Dict[UUID, Callable]]
     _key_event_handlers: Dict[str, Dict[UUID, Callable]]
-    _websocket_broadcasting_queue: "multiprocessing.Queue[str]"
+    _websocket_broadcasting_queue: "multiprocessing.Queue[bytes]"
     _websocket_message_queue: "multiprocessing.Queue[bytes]"
+    _pointcloud_frames: Dict[UUID, Tuple[numpy.ndarray, numpy.ndarray]]
+    _spatial_indices: Dict[UUID, "SpatialIndex"]
+    _compression: Compression
+    _compression_min_size: int
+    _pointcloud_cache: Optional["PayloadCache"]
+    _pcd_disk_cache: Optional["DiskCache"]
+    _objects: "ObjectRegistry"
+    _memory_budget: Optional[int]
+    _evict_handler: Optional[Callable[["ObjectInfo"], None]]
 
     from cumo._internal.members.capture_screen import (
         capture_screen,
@@ -75,12 +177,23 @@ class PointCloudViewer:
         send_overlay_image_from_ndarray,
         send_pointcloud,
         send_pointcloud_pcd,
+        send_pointcloud_pcd_file,
         send_mesh,
         send_image,
     )
+    from cumo._internal.members.send_boxes import (
+        send_boxes,
+    )
+    from cumo._internal.members.send_glyphs import (
+        send_glyphs,
+    )
+    from cumo._internal.members.send_overlay_texts import (
+        send_overlay_texts,
+    )
     from cumo._internal.members.utils import (
         wait_forever,
         console_log,
+        measure_frame_time,
         start,
     )
     from cumo._internal.members.event_handler import (
@@ -98,9 +211,47 @@ class PointCloudViewer:
         add_keypress_handler,
         remove_keypress_handler,
     )
+    from cumo._internal.members.pick_event_handler import (
+        add_pick_handler,
+        remove_pick_handler,
+    )
+    from cumo._internal.members.selection_event_handler import (
+        add_selection_handler,
+        remove_selection_handler,
+    )
+    from cumo._internal.members.update_object import (
+        update_pointcloud,
+        update_boxes,
+        update_overlay,
+        update_image,
+        update_mesh,
+    )
+    from cumo._internal.members.spatial_query import (
+        query_radius,
+        nearest,
+        query_box,
+    )
+    from cumo._internal.members.set_pointcloud_color import (
+        set_pointcloud_colormap,
+        set_palette,
+    )
     from cumo._internal.members.remove_object import (
         remove_all_objects,
         remove_object,
+        remove_objects,
+    )
+    from cumo._internal.members.set_visible import (
+        set_visible,
+    )
+    from cumo._internal.members.objects import (
+        objects,
+        set_memory_budget,
+    )
+    from cumo._internal.members.transform import (
+        add_group,
+        set_transform,
+        set_transforms,
+        set_parent,
     )
     from cumo._internal.members.set_custom_control import (
         set_custom_slider,
@@ -114,6 +265,17 @@ class PointCloudViewer:
         stop_render,
         resume_render,
     )
+    from cumo._internal.members.set_compression import (
+        set_compression,
+    )
+    from cumo._internal.members.pointcloud_cache import (
+        set_pointcloud_cache,
+        get_pointcloud_cache_stats,
+        clear_pointcloud_cache,
+        set_pcd_disk_cache,
+        get_pcd_disk_cache_stats,
+        clear_pcd_disk_cache,
+    )
     from cumo._internal.members.set_config import (
         set_pan_speed,
         set_zoom_speed,
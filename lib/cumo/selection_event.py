@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from typing import List
+from uuid import UUID
+
+import numpy
+
+
+@dataclass
+class PointSelection:
+    """範囲選択で選ばれた点群の点。"""
+    # 点群のID
+    object: UUID
+    # shape が (num_points,) で dtype が bool の ndarray 。
+    # ダウンサンプルした場合は表示している点の並びで、position_precision を指定した場合は並べ替えた後の並びになる
+    mask: numpy.ndarray
+
+    @property
+    def indices(self) -> numpy.ndarray:
+        """選ばれた点の番号を昇順に並べた ndarray 。"""
+        return numpy.flatnonzero(self.mask)
+
+
+@dataclass
+class SelectionEvent:
+    """ブラウザで範囲を選択したときのイベント。"""
+    # 選択の対象になった点群ごとの選ばれた点
+    selections: List[PointSelection]
+    shiftKey: bool
+    altKey: bool
+    ctrlKey: bool
+    metaKey: bool
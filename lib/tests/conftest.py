@@ -0,0 +1,46 @@
+from typing import Dict, List
+from uuid import UUID, uuid4
+
+import pytest
+
+from cumo import PointCloudViewer
+from cumo._internal.protobuf import client_pb2, server_pb2
+
+# pylint: disable=no-member
+
+
+class FakeClient:
+    """ブラウザの代わりに送信されたコマンドを記録し、成功を返す。"""
+
+    def __init__(self) -> None:
+        self.commands: List[server_pb2.ServerCommand] = []
+        # 削除したときに一緒に削除される子
+        self.children: Dict[UUID, List[UUID]] = {}
+
+    def send_data(self, obj: server_pb2.ServerCommand, _uuid: UUID, _compression=None) -> None:
+        self.commands.append(obj)
+
+    def wait_until(self, _uuid: UUID) -> client_pb2.ClientCommand:
+        ret = client_pb2.ClientCommand()
+        obj = self.commands[-1]
+        if obj.HasField("remove_object"):
+            removed = [UUID(hex=uuid) for uuid in obj.remove_object.objects.uuids]
+            removed += [child for uuid in removed for child in self.children.get(uuid, [])]
+            ret.result.success = ",".join(str(uuid) for uuid in removed)
+        else:
+            ret.result.success = str(uuid4())
+        return ret
+
+
+@pytest.fixture
+def client() -> FakeClient:
+    return FakeClient()
+
+
+@pytest.fixture
+def viewer(client: FakeClient, monkeypatch: pytest.MonkeyPatch) -> PointCloudViewer:
+    """サーバーを起動せず、コマンドを client に送る PointCloudViewer 。"""
+    viewer = PointCloudViewer()
+    monkeypatch.setattr(viewer, "_send_data", client.send_data)
+    monkeypatch.setattr(viewer, "_wait_until", client.wait_until)
+    return viewer
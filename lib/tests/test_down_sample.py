@@ -0,0 +1,94 @@
+from typing import Optional
+
+import numpy
+import pytest
+
+from cumo import DownSampleStrategy
+from cumo._internal.down_sample import down_sample_chunks, down_sample_pointcloud
+
+STRATEGIES = [
+    (DownSampleStrategy.RANDOM_SAMPLE, None, None),
+    (DownSampleStrategy.HASH_SAMPLE, None, None),
+    (DownSampleStrategy.VOXEL_GRID, 0.05, None),
+    (DownSampleStrategy.FARTHEST_POINT, None, None),
+    (DownSampleStrategy.POISSON_DISK, None, 0.01),
+    (DownSampleStrategy.DENSITY_ADAPTIVE, 0.1, None),
+]
+
+
+def _strategy(
+    strategy: DownSampleStrategy,
+    voxel_size: Optional[float] = None,
+    min_distance: Optional[float] = None,
+    num_workers: Optional[int] = None,
+) -> DownSampleStrategy:
+    # 列挙子は共有されるので、他のテストで設定された値が残らないように全て設定し直す
+    return strategy.set_voxel_size(voxel_size).set_min_distance(min_distance).set_seed(0).set_num_workers(num_workers)
+
+
+def _cloud(num_points: int) -> numpy.ndarray:
+    rng = numpy.random.default_rng(0)
+    xyz = rng.random((num_points, 3)).astype(numpy.float32)
+    rgb = rng.integers(0, 1 << 24, num_points, dtype=numpy.uint32).view(numpy.float32)
+    return numpy.column_stack((xyz, rgb))
+
+
+@pytest.mark.parametrize(("strategy", "voxel_size", "min_distance"), STRATEGIES)
+@pytest.mark.parametrize("max_num_points", [0, 1, 2, 1000])
+def test_budget(strategy, voxel_size, min_distance, max_num_points):
+    pc = _cloud(5000)
+    down_sampled = down_sample_pointcloud(pc, _strategy(strategy, voxel_size, min_distance), max_num_points)
+    assert down_sampled.shape[0] <= max_num_points
+    assert down_sampled.shape[1] == pc.shape[1]
+    if max_num_points > 0:
+        assert down_sampled.shape[0] > 0
+
+
+@pytest.mark.parametrize(("strategy", "voxel_size", "min_distance"), STRATEGIES)
+def test_small_cloud_is_not_down_sampled(strategy, voxel_size, min_distance):
+    pc = _cloud(10)
+    assert down_sample_pointcloud(pc, _strategy(strategy, voxel_size, min_distance), 10) is pc
+
+
+@pytest.mark.parametrize("strategy", [
+    DownSampleStrategy.RANDOM_SAMPLE, DownSampleStrategy.HASH_SAMPLE, DownSampleStrategy.FARTHEST_POINT,
+])
+def test_selects_input_points(strategy):
+    pc = _cloud(5000)
+    down_sampled = down_sample_pointcloud(pc, _strategy(strategy), 100)
+    rows = {row.tobytes() for row in pc}
+    assert all(row.tobytes() in rows for row in down_sampled)
+    assert numpy.unique(down_sampled, axis=0).shape[0] == 100
+
+
+@pytest.mark.parametrize("strategy", [DownSampleStrategy.RANDOM_SAMPLE, DownSampleStrategy.HASH_SAMPLE])
+@pytest.mark.parametrize("max_num_points", [0, 1, 1000])
+def test_parallel_budget(strategy, max_num_points):
+    pc = _cloud(400_000)
+    down_sampled = down_sample_pointcloud(pc, _strategy(strategy, num_workers=4), max_num_points)
+    assert down_sampled.shape[0] == max_num_points
+
+
+def test_parallel_hash_matches_serial():
+    pc = _cloud(400_000)
+    serial = down_sample_pointcloud(pc, _strategy(DownSampleStrategy.HASH_SAMPLE), 1000)
+    parallel = down_sample_pointcloud(pc, _strategy(DownSampleStrategy.HASH_SAMPLE, num_workers=4), 1000)
+    numpy.testing.assert_array_equal(serial, parallel)
+
+
+def test_parallel_voxel_grid_matches_serial():
+    pc = _cloud(400_000)
+    serial = down_sample_pointcloud(pc, _strategy(DownSampleStrategy.VOXEL_GRID, 0.1), 10_000)
+    parallel = down_sample_pointcloud(pc, _strategy(DownSampleStrategy.VOXEL_GRID, 0.1, num_workers=4), 10_000)
+    # 分割ごとに結果を連結するのでボクセルの順番は異なる
+    numpy.testing.assert_array_equal(
+        serial[numpy.lexsort(serial[:, :3].T)], parallel[numpy.lexsort(parallel[:, :3].T)])
+
+
+@pytest.mark.parametrize(("strategy", "voxel_size", "min_distance"), STRATEGIES)
+@pytest.mark.parametrize("max_num_points", [0, 1, 1000])
+def test_chunks_budget(strategy, voxel_size, min_distance, max_num_points):
+    pc = _cloud(5000)
+    chunks = (pc[i:i + 1500] for i in range(0, pc.shape[0], 1500))
+    down_sampled = down_sample_chunks(chunks, _strategy(strategy, voxel_size, min_distance), max_num_points)
+    assert down_sampled.shape[0] <= max_num_points
@@ -0,0 +1,68 @@
+from uuid import uuid4
+
+import numpy
+
+from cumo._internal.object_registry import ObjectRegistry
+from cumo._internal.protobuf import server_pb2
+
+# pylint: disable=no-member
+
+
+def _group() -> server_pb2.AddObject:
+    add_obj = server_pb2.AddObject()
+    add_obj.group.SetInParent()
+    return add_obj
+
+
+def _xyz(num_points: int, seed: int = 0) -> numpy.ndarray:
+    return numpy.random.default_rng(seed).random((num_points, 3)).astype(numpy.float32)
+
+
+def test_order_follows_last_shown():
+    registry = ObjectRegistry()
+    (a, b, c) = (uuid4(), uuid4(), uuid4())
+    for uuid in (a, b, c):
+        registry.add(uuid, _group(), 0)
+    registry.update(a, 0)
+    assert [info.uuid for info in registry.objects()] == [b, c, a]
+    registry.set_visible([b], True)
+    assert [info.uuid for info in registry.objects()] == [c, a, b]
+    # 非表示にしても順番は変わらず、非表示のまま更新しても後ろに移動しない
+    registry.set_visible([c], False)
+    registry.update(c, 0)
+    assert [info.uuid for info in registry.objects()] == [c, a, b]
+
+
+def test_ancestors():
+    registry = ObjectRegistry()
+    (root, group, child) = (uuid4(), uuid4(), uuid4())
+    registry.set_parent(group, root)
+    registry.set_parent(child, group)
+    assert registry.ancestors(child) == [group, root]
+    registry.set_parent(group, None)
+    assert registry.ancestors(child) == [group]
+
+
+def test_evicts_least_recently_shown(viewer):
+    evicted = []
+    (a, b, c) = (viewer.send_pointcloud(xyz=_xyz(1000, seed)) for seed in range(3))
+    viewer.update_pointcloud(a, _xyz(1000, 3))
+    viewer.set_memory_budget(2 * 1000 * 12, on_evict=evicted.append)
+    assert [info.uuid for info in evicted] == [b]
+    assert viewer._objects.get(b) is None
+    assert viewer._objects.get(a) is not None and viewer._objects.get(c) is not None
+
+
+def test_does_not_evict_ancestors_of_updated_object(viewer, client):
+    group = viewer.add_group()
+    child = viewer.send_pointcloud(xyz=_xyz(1000))
+    viewer.set_parent(child, group)
+    client.children[group] = [child]
+    other = viewer.send_pointcloud(xyz=_xyz(1000, 1))
+    viewer.set_memory_budget(25000)
+
+    # group が最も古いが、削除すると更新した child も削除されるので other を削除する
+    viewer.update_pointcloud(child, _xyz(1500, 2))
+    assert viewer._objects.get(other) is None
+    assert viewer._objects.get(group) is not None
+    assert viewer._objects.get(child) is not None
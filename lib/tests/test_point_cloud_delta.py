@@ -0,0 +1,81 @@
+import numpy
+
+from cumo._internal.point_cloud_delta import compute_point_cloud_delta
+
+
+def _frame(num_points: int, seed: int = 0):
+    rng = numpy.random.default_rng(seed)
+    xyz = rng.random((num_points, 3)).astype(numpy.float32)
+    rgb = rng.integers(0, 256, (num_points, 3), dtype=numpy.uint8)
+    return (xyz, rgb)
+
+
+def _apply(prev_xyz, prev_rgb, delta):
+    """クライアントと同じ順番(change, remove, add)で差分を適用する。"""
+    rgb = prev_rgb.copy()
+    rgb[delta.change_indices] = delta.change_colors
+    kept = numpy.ones((prev_xyz.shape[0],), dtype=bool)
+    kept[delta.remove_indices] = False
+    return (numpy.concatenate((prev_xyz[kept], delta.add_xyz)), numpy.concatenate((rgb[kept], delta.add_rgb)))
+
+
+def test_same_frame():
+    (xyz, rgb) = _frame(1000)
+    delta = compute_point_cloud_delta(xyz, rgb, xyz.copy(), rgb.copy(), None)
+    assert not delta.clear
+    assert delta.remove_indices.shape[0] == 0
+    assert delta.change_indices.shape[0] == 0
+    assert delta.add_xyz.shape[0] == 0
+
+
+def test_exact_matching():
+    (prev_xyz, prev_rgb) = _frame(1000)
+    xyz = prev_xyz.copy()
+    rgb = prev_rgb.copy()
+    xyz[10] += 0.5
+    rgb[20] = 255 - rgb[20]
+    delta = compute_point_cloud_delta(prev_xyz, prev_rgb, xyz, rgb, None)
+    assert not delta.clear
+    numpy.testing.assert_array_equal(delta.remove_indices, [10])
+    numpy.testing.assert_array_equal(delta.change_indices, [20])
+    numpy.testing.assert_array_equal(delta.add_xyz, xyz[10:11])
+
+    (applied_xyz, applied_rgb) = _apply(prev_xyz, prev_rgb, delta)
+    numpy.testing.assert_array_equal(applied_xyz, delta.xyz)
+    numpy.testing.assert_array_equal(applied_rgb, delta.rgb)
+    # 並び順は変わるが、点の集合は次のフレームと同じになる
+    assert sorted(map(tuple, numpy.column_stack((xyz, rgb)).tolist())) == \
+        sorted(map(tuple, numpy.column_stack((applied_xyz, applied_rgb)).tolist()))
+
+
+def test_voxel_matching_keeps_previous_positions():
+    (prev_xyz, prev_rgb) = _frame(1000)
+    voxel_size = 0.01
+    # 同じボクセルに留まるように、ボクセルの中心に寄せてから少しずらす
+    prev_xyz = ((numpy.floor(prev_xyz / voxel_size) + 0.5) * voxel_size).astype(numpy.float32)
+    xyz = prev_xyz + numpy.float32(voxel_size * 0.1)
+    delta = compute_point_cloud_delta(prev_xyz, prev_rgb, xyz, prev_rgb.copy(), voxel_size)
+    assert not delta.clear
+    assert delta.remove_indices.shape[0] == 0
+    assert delta.add_xyz.shape[0] == 0
+    numpy.testing.assert_array_equal(delta.xyz, prev_xyz)
+
+
+def test_duplicates_are_matched_by_occurrence():
+    (prev_xyz, prev_rgb) = _frame(1000)
+    prev_xyz[1] = prev_xyz[0]
+    xyz = prev_xyz[1:].copy()
+    rgb = prev_rgb[1:].copy()
+    delta = compute_point_cloud_delta(prev_xyz, prev_rgb, xyz, rgb, None)
+    # 重複した2点のうち後に出現した点が消えたものとして扱われ、残った点の色が変わる
+    numpy.testing.assert_array_equal(delta.remove_indices, [1])
+    numpy.testing.assert_array_equal(delta.change_indices, [0] if (prev_rgb[0] != prev_rgb[1]).any() else [])
+
+
+def test_falls_back_to_full_delta():
+    (prev_xyz, prev_rgb) = _frame(1000, seed=0)
+    (xyz, rgb) = _frame(1000, seed=1)
+    delta = compute_point_cloud_delta(prev_xyz, prev_rgb, xyz, rgb, None)
+    assert delta.clear
+    numpy.testing.assert_array_equal(delta.add_xyz, xyz)
+    numpy.testing.assert_array_equal(delta.xyz, xyz)
@@ -0,0 +1,27 @@
+import numpy
+import pytest
+
+from cumo._internal.quantize import QUANTIZATION_CHUNK_SIZE, dequantize_positions, quantize_positions, spatial_order
+
+
+@pytest.mark.parametrize("precision", [0.001, 0.01, 0.1])
+def test_round_trip_error(precision):
+    rng = numpy.random.default_rng(0)
+    xyz = (rng.random((3 * QUANTIZATION_CHUNK_SIZE + 5, 3)) * 20 - 10).astype(numpy.float32)
+    xyz = xyz[spatial_order(xyz)]
+    restored = dequantize_positions(quantize_positions(xyz, precision))
+    assert restored.shape == xyz.shape
+    # 量子化の幅の半分に、float32で復元する際の丸め誤差を加えたものが上限
+    assert numpy.abs(restored - xyz).max() <= precision / 2 + 1e-5
+
+
+def test_coarse_chunk_error():
+    # チャンクの範囲が 65535 * precision を超える場合は、範囲を 65535 等分した幅の半分が上限
+    xyz = numpy.array([[0, 0, 0], [1000, 0, 0], [123.456, 0, 0]], dtype=numpy.float32)
+    restored = dequantize_positions(quantize_positions(xyz, 0.001))
+    assert numpy.abs(restored - xyz).max() <= 1000 / 65535 / 2 + 1e-4
+
+
+def test_empty():
+    message = quantize_positions(numpy.zeros((0, 3), dtype=numpy.float32), 0.01)
+    assert dequantize_positions(message).shape == (0, 3)
@@ -0,0 +1,69 @@
+import numpy
+import pytest
+
+from cumo import DownSampleStrategy
+from cumo._vendor.pypcd import pypcd
+from cumo._internal.quantize import dequantize_positions
+
+# pylint: disable=no-member
+
+NUM_POINTS = 25000
+
+
+@pytest.fixture(name="pcd_path")
+def fixture_pcd_path(tmp_path):
+    rng = numpy.random.default_rng(0)
+    xyz = rng.random((NUM_POINTS, 3)).astype(numpy.float32)
+    rgb = rng.integers(0, 1 << 24, NUM_POINTS, dtype=numpy.uint32).view(numpy.float32)
+    path = tmp_path / "cloud.pcd"
+    pypcd.make_xyz_rgb_point_cloud(numpy.column_stack((xyz, rgb))).save_pcd(str(path), compression="binary")
+    return str(path)
+
+
+def _num_points(command) -> int:
+    if command.HasField("update_object"):
+        return len(command.update_object.point_cloud.add_positions) // 12
+    cloud = command.add_object.point_cloud
+    if cloud.HasField("quantized_positions"):
+        return dequantize_positions(cloud.quantized_positions).shape[0]
+    return pypcd.point_cloud_from_buffer(cloud.pcd_data).points
+
+
+def _random_sample() -> DownSampleStrategy:
+    return DownSampleStrategy.RANDOM_SAMPLE.set_seed(0).set_num_workers(None)
+
+
+@pytest.mark.parametrize("max_num_points", [0, 1, 3, 100, NUM_POINTS])
+def test_progressive_quota_split(viewer, client, pcd_path, max_num_points):
+    viewer.send_pointcloud_pcd_file(pcd_path, _random_sample(), max_num_points=max_num_points, chunk_size=1000)
+    counts = [_num_points(command) for command in client.commands]
+    assert client.commands[0].HasField("add_object")
+    assert all(command.HasField("update_object") for command in client.commands[1:])
+    assert sum(counts) == max_num_points
+    # 点が選ばれなかったチャンクは送らない。全体で0点の場合のみ空の点群を送る
+    assert all(count > 0 for count in counts) or counts == [0]
+
+
+def test_progressive_quota_is_proportional(viewer, client, pcd_path):
+    viewer.send_pointcloud_pcd_file(pcd_path, _random_sample(), max_num_points=2500, chunk_size=1000)
+    assert [_num_points(command) for command in client.commands] == [100] * 25
+
+
+@pytest.mark.parametrize("max_num_points", [0, 1, 100])
+def test_non_progressive(viewer, client, pcd_path, max_num_points):
+    viewer.send_pointcloud_pcd_file(
+        pcd_path, _random_sample(), max_num_points=max_num_points, chunk_size=1000, progressive=False)
+    assert [_num_points(command) for command in client.commands] == [max_num_points]
+
+
+@pytest.mark.parametrize("max_num_points", [0, 3])
+def test_chunked_bytes(viewer, client, pcd_path, max_num_points):
+    with open(pcd_path, "rb") as f:
+        pcd_bytes = f.read()
+    viewer.send_pointcloud_pcd(pcd_bytes, _random_sample(), max_num_points=max_num_points, chunk_size=10000)
+    assert sum(_num_points(command) for command in client.commands) == max_num_points
+
+
+def test_no_down_sampling_sends_all_points(viewer, client, pcd_path):
+    viewer.send_pointcloud_pcd_file(pcd_path, DownSampleStrategy.NONE, chunk_size=1000)
+    assert sum(_num_points(command) for command in client.commands) == NUM_POINTS